@@ -0,0 +1,173 @@
+"""
+Benchmark offline da extração de indicadores do Investidor10.
+
+Compara, sobre páginas HTML salvas em disco, a extração antiga (html.parser e
+uma varredura de todos os <span> por indicador, mantida aqui como referência)
+com a atual (parser lxml + filtro de conteúdo + índice rótulo → valor montado
+em uma única passada), e lista os campos em que as duas divergem.
+
+Sem fixtures salvas, usa uma página sintética com a mesma estrutura
+(div.cell / div.value) e ~500 KB de conteúdo irrelevante.
+
+Exemplos:
+    python scripts/benchmark_investidor10.py --baixar PETR4 VALE3 ITUB4   # salva fixtures (rede)
+    python scripts/benchmark_investidor10.py                              # .cache/investidor10_html/*.html
+    python scripts/benchmark_investidor10.py --html pagina.html --repeticoes 20
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+from bs4 import BeautifulSoup
+
+import src.data.scraper_investidor10 as inv10
+
+DIR_FIXTURES = _PROJECT_ROOT / ".cache" / "investidor10_html"
+
+
+# ── Referência: extração anterior ────────────────────────────────────────────
+
+def _valor_legado(soup, nome_indicador):
+    spans = soup.find_all('span')
+    for span in spans:
+        if nome_indicador.upper() in span.get_text(strip=True).upper():
+            parent = span.find_parent('div', class_='cell')
+            if parent:
+                valor_span = parent.find('div', class_='value').find('span')
+                if valor_span:
+                    texto = valor_span.text.strip().replace('%', '').replace('.', '').replace(',', '.')
+                    try:
+                        return float(texto)
+                    except ValueError:
+                        return None
+    return None
+
+
+def extrair_legado(html, acao):
+    soup = BeautifulSoup(html, "html.parser")
+    dados = {"acao": acao}
+    for nome_site, nome_coluna in inv10.INDICADORES_MAP.items():
+        dados[nome_coluna] = _valor_legado(soup, nome_site)
+    dados["cotacao"] = inv10.get_cotacao(soup)
+    dados["variacao_12m"] = inv10.get_variacao_12m(soup)
+    return dados
+
+
+# ── Fixtures ──────────────────────────────────────────────────────────────────
+
+def pagina_sintetica(seed=0):
+    """HTML com a estrutura da página de ações do Investidor10 e muito ruído."""
+    rng = random.Random(seed)
+    ruido = "".join(
+        f'<div class="news-item"><span class="tag">Notícia {i}</span>'
+        f'<p>{"Lorem ipsum dolor sit amet. " * 8}</p><span>{rng.random():.4f}</span></div>'
+        for i in range(1200)
+    )
+    script = "<script>var dados = [" + ",".join(f"{rng.random():.6f}" for _ in range(20000)) + "];</script>"
+    cells = "".join(
+        f'<div class="cell"><span class="d-flex justify-content-center">{nome}'
+        f'<i data-content="Descrição de {nome}"></i></span>'
+        f'<div class="value d-flex justify-content-center align-items-center">'
+        f'<span>{rng.uniform(-50, 150):.2f}{"%" if "MARGEM" in nome or nome in ("ROE", "ROIC", "ROA") else ""}'
+        .replace(".", ",") + '</span></div></div>'
+        for nome in inv10.INDICADORES_MAP
+    )
+    return (
+        "<html><head><meta charset='utf-8'>" + script + "</head><body>"
+        + ruido[: len(ruido) // 2]
+        + '<div class="_card cotacao"><div class="_card-body"><span class="value">R$ 38,47</span></div></div>'
+        + '<div class="_card pl"><div class="_card-body"><span>12,35%</span></div></div>'
+        + f'<div id="table-indicators">{cells}</div>'
+        + ruido[len(ruido) // 2:]
+        + "</body></html>"
+    )
+
+
+def baixar_fixtures(tickers, destino):
+    destino.mkdir(parents=True, exist_ok=True)
+    for ticker in tickers:
+        resp = inv10._sessao().get(inv10.URL_ACAO.format(ticker.lower()), timeout=inv10.TIMEOUT)
+        if resp.status_code != 200:
+            print(f"❌ {ticker}: status {resp.status_code}")
+            continue
+        arquivo = destino / f"{ticker.upper()}.html"
+        arquivo.write_text(resp.text, encoding="utf-8")
+        print(f"✅ {arquivo} ({len(resp.text) / 1024:.0f} KB)")
+
+
+def carregar_fixtures(caminhos):
+    if caminhos:
+        arquivos = [Path(c) for c in caminhos]
+    else:
+        arquivos = sorted(DIR_FIXTURES.glob("*.html"))
+    if not arquivos:
+        print("⚠️ Nenhuma fixture salva; usando página sintética.")
+        return {"SINTETICA": pagina_sintetica()}
+    return {a.stem.upper(): a.read_text(encoding="utf-8") for a in arquivos}
+
+
+# ── Benchmark ─────────────────────────────────────────────────────────────────
+
+def medir(funcao, paginas, repeticoes):
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        for acao, html in paginas.items():
+            funcao(html, acao)
+        melhor = min(melhor, time.perf_counter() - t0)
+    return melhor / len(paginas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--html", nargs="*", help="arquivos HTML salvos (padrão: .cache/investidor10_html/*.html)")
+    parser.add_argument("--baixar", nargs="*", metavar="TICKER", help="baixa as páginas e salva como fixtures")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.baixar:
+        baixar_fixtures(args.baixar, DIR_FIXTURES)
+        return
+
+    paginas = carregar_fixtures(args.html)
+    tamanho = sum(len(h) for h in paginas.values()) / len(paginas) / 1024
+    print(f"📄 {len(paginas)} página(s), {tamanho:.0f} KB em média; melhor de {args.repeticoes} repetição(ões).\n")
+
+    # Equivalência campo a campo
+    divergencias = 0
+    for acao, html in paginas.items():
+        antigo, novo = extrair_legado(html, acao), inv10.extrair_dados(html, acao)
+        for campo in antigo:
+            if antigo[campo] != novo[campo]:
+                divergencias += 1
+                print(f"  ⚠️ {acao}.{campo}: legado={antigo[campo]} atual={novo[campo]}")
+    if divergencias:
+        print("  (o legado casa por substring na ordem da página — ex.: 'EV/EBIT' pega a "
+              "célula de EV/EBITDA se ela vier antes; o atual prioriza o rótulo exato)\n")
+    else:
+        print("✅ Extração atual idêntica à anterior em todos os campos.\n")
+
+    parser_atual = inv10.PARSER_HTML
+    tempos = [("legado (html.parser, varredura por indicador)", medir(extrair_legado, paginas, args.repeticoes))]
+    inv10.PARSER_HTML = "html.parser"
+    tempos.append(("índice + filtro (html.parser)", medir(inv10.extrair_dados, paginas, args.repeticoes)))
+    inv10.PARSER_HTML = parser_atual
+    if parser_atual != "html.parser":
+        tempos.append((f"índice + filtro ({parser_atual})", medir(inv10.extrair_dados, paginas, args.repeticoes)))
+    else:
+        print("⚠️ lxml não instalado; o caminho rápido usa html.parser.")
+
+    base = tempos[0][1]
+    for nome, t in tempos:
+        print(f"  {nome:<48} {t * 1000:8.1f} ms/página  ({base / t:5.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Benchmark e verificação de calcular_rotulos_desempenho_futuro.
+
+Gera históricos sintéticos (dias úteis x tickers, com lacunas de coleta e
+empates de cotação), mede a versão vetorizada e compara os rótulos com a
+implementação antiga (loop por data), mantida aqui como referência.
+
+Exemplos:
+    python scripts/benchmark_rotulos.py                     # 5 e 10 anos, 500 tickers
+    python scripts/benchmark_rotulos.py --anos 1 --legado   # inclui o loop antigo
+    python scripts/benchmark_rotulos.py --verificar         # só a checagem de equivalência
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+import numpy as np
+import pandas as pd
+from pandas.tseries.offsets import BDay
+
+from src.models.classificador import calcular_rotulos_desempenho_futuro
+
+
+def _rotulos_legado(df_input, n_dias=10, q_inferior=0.25, q_superior=0.75):
+    """Implementação anterior (loop por data), usada como referência."""
+    df = df_input.copy()
+    df['data_coleta'] = pd.to_datetime(df['data_coleta'])
+    df = df.sort_values(by='data_coleta')
+    df['data_futura_alvo'] = df['data_coleta'] + BDay(n_dias)
+    df_futuro = pd.merge_asof(
+        left=df[['acao', 'data_futura_alvo']],
+        right=df[['acao', 'data_coleta', 'cotacao']],
+        left_on='data_futura_alvo',
+        right_on='data_coleta',
+        by='acao',
+        direction='forward'
+    )
+    df_futuro.rename(columns={'cotacao': 'preco_futuro_N_dias'}, inplace=True)
+    _too_far = (df_futuro['data_coleta'] - df_futuro['data_futura_alvo']) > pd.Timedelta(days=30)
+    df_futuro.loc[_too_far, 'preco_futuro_N_dias'] = np.nan
+    df['preco_futuro_N_dias'] = df_futuro['preco_futuro_N_dias'].values
+    df['retorno_futuro_N_dias'] = np.where(
+        df['cotacao'] > 0,
+        (df['preco_futuro_N_dias'] - df['cotacao']) / df['cotacao'],
+        np.nan
+    )
+
+    df['rotulo_desempenho_futuro'] = np.nan
+    datas_com_retorno_valido = df.dropna(subset=['retorno_futuro_N_dias'])['data_coleta'].unique()
+    for data_atual in datas_com_retorno_valido:
+        dia_df = df[(df['data_coleta'] == data_atual) & (df['retorno_futuro_N_dias'].notna())].copy()
+        if dia_df.empty:
+            continue
+        if len(dia_df['retorno_futuro_N_dias'].dropna()) < 4:
+            continue
+        quantil_inf = dia_df['retorno_futuro_N_dias'].quantile(q_inferior)
+        quantil_sup = dia_df['retorno_futuro_N_dias'].quantile(q_superior)
+        indices_dia = dia_df.index
+        if quantil_inf != quantil_sup:
+            df.loc[indices_dia[dia_df['retorno_futuro_N_dias'] <= quantil_inf], 'rotulo_desempenho_futuro'] = 0
+            df.loc[indices_dia[dia_df['retorno_futuro_N_dias'] >= quantil_sup], 'rotulo_desempenho_futuro'] = 1
+
+    df.drop(columns=['data_futura_alvo', 'preco_futuro_N_dias'], inplace=True, errors='ignore')
+    return df
+
+
+def gerar_historico(anos: float, n_tickers: int, seed: int = 42) -> pd.DataFrame:
+    """
+    Passeio aleatório de cotações em dias úteis. ~5% das coletas faltam e
+    alguns tickers ficam com preço constante (dias com quantis iguais).
+    As cotações são arredondadas a 2 casas, como numeric(10, 2) no banco.
+    """
+    rng = np.random.default_rng(seed)
+    datas = pd.bdate_range(end=pd.Timestamp("2026-01-02"), periods=int(anos * 252))
+    n_dias = len(datas)
+
+    retornos = rng.normal(0.0003, 0.02, size=(n_dias, n_tickers))
+    cotacoes = np.round(20 * np.exp(np.cumsum(retornos, axis=0)), 2)
+    cotacoes[:, : max(1, n_tickers // 50)] = 10.0
+
+    presente = rng.random((n_dias, n_tickers)) > 0.05
+    idx_dia, idx_ticker = np.nonzero(presente)
+    return pd.DataFrame({
+        'acao': np.array([f"T{i:04d}" for i in range(n_tickers)])[idx_ticker],
+        'data_coleta': datas[idx_dia],
+        'cotacao': cotacoes[idx_dia, idx_ticker],
+    })
+
+
+def _comparar(df_novo: pd.DataFrame, df_legado: pd.DataFrame) -> None:
+    a = df_novo['rotulo_desempenho_futuro'].sort_index()
+    b = df_legado['rotulo_desempenho_futuro'].sort_index()
+    pd.testing.assert_series_equal(a, b)
+    pd.testing.assert_index_equal(df_novo.index, df_legado.index)
+
+
+def verificar_equivalencia() -> None:
+    """Compara com o loop antigo em históricos pequenos (incluindo dias com < 4 ações)."""
+    casos = [(0.5, 3), (0.5, 4), (0.5, 5), (1, 30), (2, 80)]
+    for anos, n_tickers in casos:
+        for q_inf, q_sup in [(0.25, 0.75), (0.1, 0.9), (0.3, 0.6)]:
+            df = gerar_historico(anos, n_tickers, seed=n_tickers)
+            _comparar(
+                calcular_rotulos_desempenho_futuro(df, 10, q_inf, q_sup),
+                _rotulos_legado(df, 10, q_inf, q_sup),
+            )
+    print(f"✅ Rótulos idênticos ao loop antigo em {len(casos) * 3} cenários.")
+
+
+def _medir(func, df) -> tuple[float, pd.DataFrame]:
+    t0 = time.perf_counter()
+    resultado = func(df, n_dias=10, q_inferior=0.25, q_superior=0.75)
+    return time.perf_counter() - t0, resultado
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de calcular_rotulos_desempenho_futuro.")
+    parser.add_argument("--anos", type=float, nargs="+", default=[5, 10])
+    parser.add_argument("--tickers", type=int, default=500)
+    parser.add_argument("--legado", action="store_true",
+                        help="Também mede o loop antigo (lento) e compara os rótulos.")
+    parser.add_argument("--verificar", action="store_true",
+                        help="Apenas a verificação de equivalência em históricos pequenos.")
+    args = parser.parse_args()
+
+    verificar_equivalencia()
+    if args.verificar:
+        return
+
+    for anos in args.anos:
+        df = gerar_historico(anos, args.tickers)
+        print(f"\n📊 {anos:g} anos x {args.tickers} tickers ({len(df):,} linhas)")
+        t_novo, df_novo = _medir(calcular_rotulos_desempenho_futuro, df)
+        print(f"   vetorizado: {t_novo:8.2f}s")
+        if args.legado:
+            t_legado, df_legado = _medir(_rotulos_legado, df)
+            _comparar(df_novo, df_legado)
+            print(f"   loop antigo:{t_legado:8.2f}s  ({t_legado / t_novo:.0f}x mais lento, rótulos idênticos)")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,6 @@ from datetime import date
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from src.core.db_connection import get_connection
 from src.data.scraper_orquestrador import main as scraper_main
 from src.models.regressor_preco import executar_pipeline_regressor
 from src.models.recomendador_acoes import recomendar_varias_acoes
@@ -27,8 +26,7 @@ def tarefa_diaria():
 
     # 3) Executa inserção em lote das recomendações
     print("▶️ Inserindo recomendações em lote no banco...")
-    conn = get_connection()
-    recomendar_varias_acoes(conn)
+    recomendar_varias_acoes()
 
     # 4) Executa backup do banco (equivalente à opção 1)
     print("▶️ Executando backup do banco...")
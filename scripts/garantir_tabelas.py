@@ -45,6 +45,14 @@ DDL_STATEMENTS = [
         CONSTRAINT indicadores_fundamentalistas_pkey PRIMARY KEY (acao, data_coleta)
     );
     """,
+    # Momento da última gravação da linha (frescor do snapshot do recomendador).
+    # Linhas antigas ficam NULL e contam como gravadas à meia-noite de data_coleta.
+    """
+    ALTER TABLE public.indicadores_fundamentalistas
+        ADD COLUMN IF NOT EXISTS atualizado_em timestamp NULL;
+    ALTER TABLE public.indicadores_fundamentalistas
+        ALTER COLUMN atualizado_em SET DEFAULT CURRENT_TIMESTAMP;
+    """,
     """
     CREATE TABLE IF NOT EXISTS public.recomendacoes_acoes (
         acao varchar(10) NOT NULL,
@@ -56,6 +64,19 @@ DDL_STATEMENTS = [
     );
     """,
     """
+    CREATE TABLE IF NOT EXISTS public.recomendacoes_snapshot (
+        acao varchar(10) PRIMARY KEY,
+        data_recomendacao date NOT NULL,
+        payload jsonb NOT NULL,
+        features jsonb NOT NULL,
+        etag varchar(40) NOT NULL,
+        gerado_em timestamp DEFAULT CURRENT_TIMESTAMP NOT NULL
+    );
+    """,
+    """
+    ALTER TABLE public.recomendacoes_snapshot ADD COLUMN IF NOT EXISTS modelo_hash varchar(64) NULL;
+    """,
+    """
     CREATE TABLE IF NOT EXISTS public.resultados_precos (
         id serial4 NOT NULL,
         acao varchar(10) NOT NULL,
@@ -69,12 +90,126 @@ DDL_STATEMENTS = [
     );
     """,
     """
+    CREATE TABLE IF NOT EXISTS public.backfill_regressor_datas (
+        data_calculo date PRIMARY KEY,
+        n_dias smallint NOT NULL,
+        etapa varchar(12) NOT NULL,
+        previsoes integer NOT NULL DEFAULT 0,
+        processado_em timestamp DEFAULT CURRENT_TIMESTAMP NOT NULL
+    );
+    """,
+    """
     CREATE TABLE IF NOT EXISTS public.resumos_diarios_ia (
         data_ref date PRIMARY KEY,
         resumo text NOT NULL,
         gerado_em timestamp DEFAULT CURRENT_TIMESTAMP NOT NULL
     );
     """,
+    """
+    CREATE TABLE IF NOT EXISTS public.explicacoes_ia (
+        chave char(64) PRIMARY KEY,
+        acao varchar(10) NOT NULL,
+        data_ref date NOT NULL,
+        explicacao text NOT NULL,
+        gerado_em timestamp DEFAULT CURRENT_TIMESTAMP NOT NULL
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS public.features_indicadores (
+        universo varchar(20) NOT NULL,
+        acao varchar(10) NOT NULL,
+        data_coleta date NOT NULL,
+        vi_graham double precision NULL,
+        preco_sobre_graham double precision NULL,
+        delta_cotacao_7d double precision NULL,
+        delta_pl_7d double precision NULL,
+        delta_pvp_7d double precision NULL,
+        delta_dividend_yield_7d double precision NULL,
+        delta_roe_7d double precision NULL,
+        pl_vs_mercado double precision NULL,
+        pvp_vs_mercado double precision NULL,
+        roe_vs_mercado double precision NULL,
+        margem_liquida_vs_mercado double precision NULL,
+        dividend_yield_vs_mercado double precision NULL,
+        CONSTRAINT features_indicadores_pkey PRIMARY KEY (universo, acao, data_coleta)
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS public.precos_diarios (
+        acao varchar(10) NOT NULL,
+        data date NOT NULL,
+        abertura numeric(14, 6) NULL,
+        maxima numeric(14, 6) NULL,
+        minima numeric(14, 6) NULL,
+        fechamento numeric(14, 6) NOT NULL,
+        fechamento_ajustado numeric(14, 6) NULL,
+        volume bigint NULL,
+        CONSTRAINT precos_diarios_pkey PRIMARY KEY (acao, data)
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS public.disponibilidade_campos_fonte (
+        acao varchar(10) NOT NULL,
+        fonte varchar(20) NOT NULL,
+        campos text[] NOT NULL DEFAULT '{}',
+        verificado_em timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        CONSTRAINT disponibilidade_campos_fonte_pkey PRIMARY KEY (acao, fonte)
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS public.coleta_execucoes (
+        execucao_id varchar(40) NOT NULL,
+        fonte varchar(20) NOT NULL,
+        acao varchar(10) NOT NULL,
+        iniciado_em timestamp NOT NULL,
+        latencia_ms double precision NOT NULL,
+        espera_ms double precision NOT NULL DEFAULT 0,
+        status_http smallint NULL,
+        campos_preenchidos smallint NOT NULL DEFAULT 0,
+        erro_classe varchar(60) NULL,
+        do_cache boolean NOT NULL DEFAULT false,
+        CONSTRAINT coleta_execucoes_pkey PRIMARY KEY (execucao_id, fonte, acao, iniciado_em)
+    );
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_coleta_execucoes_iniciado_em
+        ON public.coleta_execucoes (iniciado_em);
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS public.fila_tarefas (
+        id bigserial PRIMARY KEY,
+        tipo varchar(40) NOT NULL,
+        parametros jsonb NOT NULL DEFAULT '{}',
+        chave_dedupe varchar(200) NULL,
+        status varchar(12) NOT NULL DEFAULT 'pendente',
+        progresso real NULL,
+        mensagem text NULL,
+        erro text NULL,
+        tentativas smallint NOT NULL DEFAULT 0,
+        worker varchar(100) NULL,
+        criado_em timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        iniciado_em timestamp NULL,
+        concluido_em timestamp NULL,
+        heartbeat_em timestamp NULL
+    );
+    """,
+    """
+    CREATE UNIQUE INDEX IF NOT EXISTS uq_fila_tarefas_dedupe_ativas
+        ON public.fila_tarefas (chave_dedupe)
+        WHERE status IN ('pendente', 'executando');
+    """,
+    """
+    ALTER TABLE public.fila_tarefas ADD COLUMN IF NOT EXISTS resultado jsonb NULL;
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_fila_tarefas_chave_dedupe
+        ON public.fila_tarefas (chave_dedupe, criado_em DESC);
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_fila_tarefas_pendentes
+        ON public.fila_tarefas (criado_em, id)
+        WHERE status = 'pendente';
+    """,
 ]
 
 
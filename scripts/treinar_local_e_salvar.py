@@ -18,6 +18,9 @@ Exemplos:
 - Backfill do regressor por período (sem vazamento temporal):
     python scripts/treinar_local_e_salvar.py --job regressor --n-dias 10 --data-inicio 2026-04-20 --data-fim 2026-04-30 --sem-vazamento-temporal
 
+- Backfill longo em 4 processos, refazendo a busca de hiperparâmetros a cada 60 dias:
+    python scripts/treinar_local_e_salvar.py --job regressor --data-inicio 2025-05-01 --data-fim 2026-04-30 --processos 4 --janela-hiperparametros 60
+
 - Rodar apenas os dias pendentes desde a última execução:
     python scripts/treinar_local_e_salvar.py --job regressor --n-dias 10 --pendente
 
@@ -36,9 +39,10 @@ _PROJECT_ROOT = Path(__file__).resolve().parent.parent
 if str(_PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(_PROJECT_ROOT))
 
-from src.core.db_connection import get_connection
 from src.models.classificador import executar_pipeline_classificador
-from src.models.regressor_preco import executar_pipeline_regressor, preparar_dados_cache
+from src.models.regressor_preco import executar_pipeline_regressor
+from src.models.backfill_regressor import executar_backfill_regressor, ultima_data_processada
+from scripts.garantir_tabelas import garantir_tabelas
 from src.models.recomendador_acoes import recomendar_varias_acoes
 
 MODELO_NOME = "modelo_classificador_desempenho.pkl"
@@ -113,10 +117,28 @@ def main():
         "--pendente",
         action="store_true",
         help=(
-            "Detecta a última data_calculo em resultados_precos e roda o backfill "
-            "do dia seguinte até hoje. Ignora --data-inicio e --data-fim."
+            "Detecta a última data_calculo processada (resultados_precos ou datas "
+            "puladas pelo backfill) e roda o backfill do dia seguinte até hoje. "
+            "Ignora --data-inicio e --data-fim."
         ),
     )
+    parser.add_argument(
+        "--janela-hiperparametros",
+        type=int,
+        default=30,
+        help="Backfill: dias em que os hiperparâmetros da última busca são reaproveitados. Padrão: 30.",
+    )
+    parser.add_argument(
+        "--sem-warm-start",
+        action="store_true",
+        help="Backfill: reajusta a floresta do zero em vez de crescer a anterior com warm_start.",
+    )
+    parser.add_argument(
+        "--processos",
+        type=int,
+        default=1,
+        help="Backfill: blocos de datas processados em paralelo. Padrão: 1.",
+    )
     args = parser.parse_args()
 
     data_calculo = date.fromisoformat(args.data_calculo)
@@ -137,19 +159,13 @@ def main():
     if args.job in ("todos", "regressor"):
         # Resolve intervalo de datas a processar
         if args.pendente:
-            conn = get_connection()
-            try:
-                import pandas as pd
-                ultima = pd.read_sql_query(
-                    "SELECT MAX(data_calculo) AS ultima FROM resultados_precos", conn
-                ).iloc[0, 0]
-            finally:
-                conn.close()
+            garantir_tabelas()
+            ultima = ultima_data_processada()
             if ultima is None:
                 raise RuntimeError(
                     "Tabela resultados_precos está vazia. Use --data-inicio/--data-fim para o primeiro backfill."
                 )
-            data_inicio = pd.Timestamp(ultima).date() + timedelta(days=1)
+            data_inicio = ultima + timedelta(days=1)
             data_fim = date.today()
             if data_inicio > data_fim:
                 print("[2] Nenhum dia pendente — resultados_precos já está atualizado.")
@@ -168,23 +184,17 @@ def main():
 
         if data_inicio and data_fim:
             print("[2] Regressor em backfill por período...")
-            print("[2] Pré-carregando e processando dados (uma única vez)...")
-            dados_cache = preparar_dados_cache(n_dias=args.n_dias)
-            print("[2] Dados prontos. Iniciando iterações...")
-            atual = data_inicio
-            total = (data_fim - data_inicio).days + 1
-            i = 1
-            while atual <= data_fim:
-                print(f"[2] [{i}/{total}] Rodando regressor para data_calculo={atual} ...")
-                executar_pipeline_regressor(
-                    n_dias=args.n_dias,
-                    data_calculo=atual,
-                    save_to_db=True,
-                    sem_vazamento_temporal=args.sem_vazamento_temporal,
-                    _dados_cache=dados_cache,
-                )
-                atual += timedelta(days=1)
-                i += 1
+            garantir_tabelas()
+            executar_backfill_regressor(
+                data_inicio,
+                data_fim,
+                n_dias=args.n_dias,
+                save_to_db=True,
+                sem_vazamento_temporal=args.sem_vazamento_temporal,
+                janela_hiperparametros=args.janela_hiperparametros,
+                warm_start=not args.sem_warm_start,
+                processos=args.processos,
+            )
             print("[2] Backfill do regressor concluído.")
         elif not args.pendente:
             print("[2] Treinando regressor e salvando no banco Railway...")
@@ -198,11 +208,7 @@ def main():
 
     if args.job in ("todos", "recomendacoes"):
         print("[3] Gerando recomendações e salvando no banco Railway...")
-        conn = get_connection()
-        try:
-            recomendar_varias_acoes(conn)
-        finally:
-            conn.close()
+        recomendar_varias_acoes()
         print("[3] Recomendações concluídas.")
 
     print("=== Pipeline local finalizado ===")
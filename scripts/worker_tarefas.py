@@ -0,0 +1,54 @@
+"""
+Worker da fila de tarefas (fila_tarefas).
+
+Busca tarefas pendentes no PostgreSQL e as executa, respeitando os limites de
+concorrência de cada grupo (src/api/tarefas.py). Rode quantos processos
+quiser, em quantas máquinas quiser; um worker só executa uma tarefa por vez.
+SIGTERM/Ctrl+C: termina a tarefa em andamento e sai.
+
+Exemplos:
+    python scripts/worker_tarefas.py                                    # todos os tipos
+    python scripts/worker_tarefas.py --tipos treinar classificador regressor
+    python scripts/worker_tarefas.py --tipos coletar recomendar resumo-diario backup-banco
+"""
+
+import argparse
+import signal
+import sys
+import threading
+from pathlib import Path
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+from dotenv import load_dotenv
+load_dotenv(_PROJECT_ROOT / ".env")
+
+from scripts.garantir_tabelas import garantir_tabelas
+from src.api.tarefas import TAREFAS
+from src.core import fila_tarefas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tipos", nargs="*", choices=sorted(TAREFAS), help="tipos executados (padrão: todos)")
+    parser.add_argument("--intervalo", type=float, default=fila_tarefas.INTERVALO_POLLING,
+                        help="segundos entre buscas com a fila vazia")
+    args = parser.parse_args()
+
+    parar = threading.Event()
+
+    def _encerrar(signum, _frame):
+        print(f"⚠️ Sinal {signum} recebido; encerrando após a tarefa em andamento.")
+        parar.set()
+
+    signal.signal(signal.SIGTERM, _encerrar)
+    signal.signal(signal.SIGINT, _encerrar)
+
+    garantir_tabelas()
+    fila_tarefas.executar_worker(TAREFAS, tipos=args.tipos, intervalo=args.intervalo, parar=parar)
+
+
+if __name__ == "__main__":
+    main()
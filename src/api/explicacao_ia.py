@@ -0,0 +1,310 @@
+"""
+Textos de IA (Gemini) da API: explicação das recomendações e resumo diário.
+
+Antes, cada chamada criava um genai.Client, listava os modelos disponíveis
+(client.models.list()) e tentava cada um com time.sleep(3) entre tentativas —
+tudo dentro da requisição de /recomendacao/{ticker}. Agora:
+
+  - o cliente e a lista de modelos ficam em cache no processo (a lista é
+    renovada a cada GEMINI_TTL_MODELOS segundos);
+  - as explicações são geradas em threads de fundo e memoizadas na tabela
+    explicacoes_ia com chave = hash de (ticker, faixa de probabilidade,
+    features mais importantes e seus valores). Outra visualização do mesmo
+    ticker no mesmo dia reaproveita o texto sem chamar o Gemini, e pedidos
+    simultâneos da mesma chave compartilham uma única geração.
+
+Backends (GEMINI_BACKEND): "gemini" (padrão) ou "stub", que devolve um texto
+determinístico gerado localmente, sem rede (testes offline).
+
+Configuração (.env):
+    GEMINI_BACKEND          gemini | stub (padrão gemini)
+    GEMINI_TTL_MODELOS      segundos de cache da lista de modelos (padrão 3600)
+    EXPLICACAO_IA_ESPERA    segundos que POST /recomendacao/{ticker} espera a explicação (padrão 20)
+    EXPLICACAO_IA_FAIXA     largura da faixa de probabilidade usada na chave (padrão 0.05)
+"""
+
+import sys
+from pathlib import Path
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from src.core.db_connection import conexao
+
+TABELA = "explicacoes_ia"
+BACKEND = os.getenv("GEMINI_BACKEND", "gemini").lower()
+TTL_MODELOS = float(os.getenv("GEMINI_TTL_MODELOS", "3600"))
+ESPERA_PADRAO = float(os.getenv("EXPLICACAO_IA_ESPERA", "20"))
+FAIXA_PROBABILIDADE = float(os.getenv("EXPLICACAO_IA_FAIXA", "0.05"))
+PAUSA_RETENTATIVA = 3
+MAX_MEMORIA = 1000
+
+# Status de obter_explicacao()
+PRONTA = "pronta"
+GERANDO = "gerando"
+INDISPONIVEL = "indisponivel"
+
+
+# ── Backends ──────────────────────────────────────────────────────────────────
+
+class _ClienteGemini:
+    """genai.Client e lista de modelos com generateContent, em cache (thread-safe)."""
+
+    def __init__(self, ttl_modelos: float = TTL_MODELOS):
+        self.ttl_modelos = ttl_modelos
+        self._lock = threading.Lock()
+        self._cliente = None
+        self._chave_api = None
+        self._modelos: List[str] = []
+        self._modelos_em: Optional[float] = None
+
+    def _obter(self):
+        chave_api = os.getenv("GEMINI_API_KEY", "")
+        if not chave_api:
+            return None, []
+        with self._lock:
+            if self._cliente is None or chave_api != self._chave_api:
+                from google import genai as google_genai
+                self._cliente = google_genai.Client(api_key=chave_api)
+                self._chave_api = chave_api
+                self._modelos_em = None
+
+            principal = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+            if self._modelos_em is None or time.monotonic() - self._modelos_em > self.ttl_modelos:
+                try:
+                    todos = [
+                        m.name.replace("models/", "")
+                        for m in self._cliente.models.list()
+                        if "generateContent" in (m.supported_actions or [])
+                    ]
+                    self._modelos = [principal] + [m for m in todos if m != principal]
+                    self._modelos_em = time.monotonic()
+                except Exception as e:
+                    # Sem cache: tenta listar de novo na próxima chamada
+                    print(f"[GEMINI] Não foi possível listar os modelos: {e}")
+                    self._modelos = [principal]
+            return self._cliente, list(self._modelos)
+
+    def gerar(self, prompt: str) -> Optional[str]:
+        try:
+            from google.genai.errors import ClientError as _GeminiClientError
+
+            cliente, modelos = self._obter()
+            if cliente is None:
+                return None
+            for _modelo in modelos:
+                for _tentativa in range(2):
+                    try:
+                        response = cliente.models.generate_content(model=_modelo, contents=prompt)
+                        texto = (response.text or "").strip()
+                        if texto:
+                            print(f"[GEMINI] Respondido por: {_modelo}")
+                            return texto
+                    except _GeminiClientError as _ce:
+                        print(f"[GEMINI] {_modelo} descartado (4xx): {_ce}")
+                        break
+                    except Exception as _retry_err:
+                        print(f"[GEMINI] {_modelo} tentativa {_tentativa+1} falhou: {_retry_err}")
+                        if _tentativa < 1:
+                            time.sleep(PAUSA_RETENTATIVA)
+        except Exception as _err:
+            print(f"[GEMINI] Erro no fallback dinâmico: {_err}")
+        return None
+
+
+def _gerar_stub(prompt: str) -> str:
+    """Texto determinístico (mesmo prompt → mesmo texto), sem rede."""
+    digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+    inicio = " ".join(prompt.split())[:160]
+    return f"[stub {digest}] {inicio}"
+
+
+_gemini = _ClienteGemini()
+
+
+def gerar_texto(prompt: str) -> Optional[str]:
+    """Gera o texto de forma síncrona no backend configurado; None se indisponível."""
+    if BACKEND == "stub":
+        return _gerar_stub(prompt)
+    return _gemini.gerar(prompt)
+
+
+# ── Explicação das recomendações ──────────────────────────────────────────────
+
+def top_features(modelo, valores, n: int = 5) -> List[Tuple[str, float, float]]:
+    """[(feature, importância, valor)] das `n` features mais importantes do modelo com valor."""
+    from src.models.recomendador_acoes import FEATURES_ESPERADAS_PELO_MODELO
+
+    importances = modelo.feature_importances_
+    top = []
+    for i in importances.argsort()[::-1][:n]:
+        nome = FEATURES_ESPERADAS_PELO_MODELO[i]
+        valor = pd.to_numeric(valores.get(nome), errors="coerce")
+        if not pd.isna(valor):
+            top.append((nome, float(importances[i]), float(valor)))
+    return top
+
+
+def chave_explicacao(ticker: str, prob_sim: float, top: List[Tuple[str, float, float]]) -> str:
+    """Hash das entradas do prompt: ticker, faixa de probabilidade e top features (valor com 2 casas)."""
+    faixa = int(prob_sim // FAIXA_PROBABILIDADE)
+    entradas = [ticker.upper(), faixa, [(nome, round(valor, 2)) for nome, _, valor in top]]
+    return hashlib.sha256(json.dumps(entradas).encode("utf-8")).hexdigest()
+
+
+def montar_prompt(ticker: str, resposta: Dict, top: List[Tuple[str, float, float]]) -> str:
+    top_str = "\n".join(f"- {nome} ({imp*100:.1f}%): {valor:.2f}" for nome, imp, valor in top) or "Não disponível"
+    positivos_str = "\n".join(f"- {j}" for j in resposta["justificativas_positivas"]) or "Nenhum"
+    negativos_str = "\n".join(f"- {j}" for j in resposta["justificativas_negativas"]) or "Nenhum"
+    resultado = resposta["resultado"]
+    prob_sim = resposta["probabilidades"]["recomendada"]
+
+    return f"""Você é um analista de investimentos em ações brasileiras. Analise a recomendação do modelo de machine learning para a ação {ticker} e escreva uma explicação clara e objetiva em português.
+
+DADOS DO MODELO:
+- Resultado: {resultado}
+- Probabilidade de ser recomendada: {prob_sim*100:.1f}%
+
+FEATURES MAIS IMPORTANTES PARA ESTA DECISÃO (nome: peso do modelo | valor atual):
+{top_str}
+
+PONTOS POSITIVOS IDENTIFICADOS:
+{positivos_str}
+
+PONTOS DE ATENÇÃO IDENTIFICADOS:
+{negativos_str}
+
+Escreva entre 3 e 5 frases explicando por que o modelo chegou a essa conclusão, conectando os indicadores mais relevantes com o resultado. Use linguagem acessível, sem jargões excessivos. Não repita os números já listados acima — apenas interprete-os. Não use markdown, listas ou títulos — apenas texto corrido.
+"""
+
+
+class _Memo:
+    """Explicações do dia (memória + tabela explicacoes_ia) e gerações em andamento."""
+
+    def __init__(self, max_memoria: int = MAX_MEMORIA):
+        self._lock = threading.Lock()
+        self._memoria: "OrderedDict[str, Tuple[date, str]]" = OrderedDict()
+        self._em_andamento: Dict[str, Future] = {}
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="explicacao-ia")
+        self.max_memoria = max_memoria
+
+    def _da_memoria(self, chave: str) -> Optional[str]:
+        entrada = self._memoria.get(chave)
+        if entrada is None or entrada[0] != date.today():
+            return None
+        self._memoria.move_to_end(chave)
+        return entrada[1]
+
+    def _guardar(self, chave: str, texto: str) -> None:
+        with self._lock:
+            self._memoria[chave] = (date.today(), texto)
+            self._memoria.move_to_end(chave)
+            while len(self._memoria) > self.max_memoria:
+                self._memoria.popitem(last=False)
+
+    def buscar(self, chave: str) -> Optional[str]:
+        with self._lock:
+            texto = self._da_memoria(chave)
+        if texto is not None:
+            return texto
+        try:
+            with conexao() as conn, conn.cursor() as cur:
+                cur.execute(
+                    f"SELECT explicacao FROM {TABELA} WHERE chave = %s AND data_ref = %s",
+                    (chave, date.today()),
+                )
+                linha = cur.fetchone()
+        except Exception as e:
+            print(f"⚠️ Cache de explicações indisponível: {e}")
+            return None
+        if linha is None:
+            return None
+        self._guardar(chave, linha[0])
+        return linha[0]
+
+    def _gerar(self, chave: str, ticker: str, prompt: str) -> Optional[str]:
+        try:
+            texto = gerar_texto(prompt)
+            if texto:
+                self._guardar(chave, texto)
+                try:
+                    with conexao() as conn, conn.cursor() as cur:
+                        cur.execute(
+                            f"""
+                            INSERT INTO {TABELA} (chave, acao, data_ref, explicacao)
+                            VALUES (%s, %s, %s, %s)
+                            ON CONFLICT (chave)
+                            DO UPDATE SET acao = EXCLUDED.acao, data_ref = EXCLUDED.data_ref,
+                                          explicacao = EXCLUDED.explicacao, gerado_em = NOW()
+                            """,
+                            (chave, ticker, date.today(), texto),
+                        )
+                except Exception as e:
+                    print(f"⚠️ Não foi possível gravar a explicação de {ticker}: {e}")
+            return texto
+        finally:
+            with self._lock:
+                self._em_andamento.pop(chave, None)
+
+    def solicitar(self, chave: str, ticker: str, prompt: str) -> Future:
+        """Future da geração da chave (reaproveita a que estiver em andamento)."""
+        with self._lock:
+            texto = self._da_memoria(chave)
+            if texto is not None:
+                pronto = Future()
+                pronto.set_result(texto)
+                return pronto
+            futuro = self._em_andamento.get(chave)
+            if futuro is None:
+                futuro = self._executor.submit(self._gerar, chave, ticker, prompt)
+                self._em_andamento[chave] = futuro
+            return futuro
+
+
+_memo = _Memo()
+
+
+def obter_explicacao(ticker: str, resposta: Dict, modelo, valores,
+                     espera: float = 0.0) -> Tuple[str, Optional[str]]:
+    """
+    Explicação da recomendação `resposta` (payload de /recomendacao) de `ticker`.
+
+    Devolve (status, texto): PRONTA com o texto memoizado ou gerado em até
+    `espera` segundos; GERANDO se a geração continua em segundo plano (o
+    resultado fica no cache para a próxima chamada); INDISPONIVEL se o backend
+    não gerou texto.
+    """
+    try:
+        top = top_features(modelo, valores)
+    except Exception as e:
+        print(f"[XAI] Erro ao obter as features mais importantes: {e}")
+        top = []
+    chave = chave_explicacao(ticker, resposta["probabilidades"]["recomendada"], top)
+
+    texto = _memo.buscar(chave)
+    if texto is not None:
+        return PRONTA, texto
+
+    futuro = _memo.solicitar(chave, ticker, montar_prompt(ticker, resposta, top))
+    if espera > 0:
+        try:
+            futuro.result(timeout=espera)
+        except Exception:
+            pass
+    if not futuro.done():
+        return GERANDO, None
+    texto = futuro.result()
+    return (PRONTA, texto) if texto else (INDISPONIVEL, None)
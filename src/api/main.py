@@ -1,9 +1,9 @@
+import json
 import os
+import subprocess
 import sys
 import threading
-import re
 from pathlib import Path
-from datetime import date
 import shutil
 import pandas as pd
 from scripts.garantir_tabelas import garantir_tabelas
@@ -15,7 +15,9 @@ if str(_PROJECT_ROOT) not in sys.path:
 from dotenv import load_dotenv
 load_dotenv(_PROJECT_ROOT / ".env")
 
-from fastapi import FastAPI, BackgroundTasks, HTTPException, Security, UploadFile, File
+from fastapi import FastAPI, Header, HTTPException, Response, Security, UploadFile, File
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
 from starlette.middleware.wsgi import WSGIMiddleware
 from fastapi.security.api_key import APIKeyHeader
 
@@ -29,333 +31,39 @@ def verificar_chave(key: str = Security(api_key_header)):
         raise HTTPException(status_code=403, detail="API key inválida")
     return key
 
-# ── Estado global de tarefas ──────────────────────────────────────────────────
+# ── Workers embutidos ─────────────────────────────────────────────────────────
+# As tarefas de /tarefas/* vão para a fila no PostgreSQL (src/core/fila_tarefas)
+# e são executadas por processos worker (scripts/worker_tarefas.py). No
+# serviço único (Railway) a API sobe FILA_WORKERS_EMBUTIDOS workers como
+# processos filhos, mais um só para as previsões do dashboard ("previsao"), e
+# reinicia os que morrerem; com workers em serviços próprios, use 0.
 
-_lock = threading.Lock()
-_tarefa_em_andamento: dict = {"nome": None}
+FILA_WORKERS_EMBUTIDOS = int(os.getenv("FILA_WORKERS_EMBUTIDOS", "2"))
+INTERVALO_SUPERVISAO_WORKERS = 30.0
+_workers_embutidos: list = []
+_parar_supervisao = threading.Event()
 
-def _set_tarefa(nome: str | None):
-    with _lock:
-        _tarefa_em_andamento["nome"] = nome
 
-def _get_tarefa() -> str | None:
-    with _lock:
-        return _tarefa_em_andamento["nome"]
-
-
-def _gerar_texto_gemini_com_fallback(prompt: str) -> str | None:
-    gemini_key = os.getenv("GEMINI_API_KEY", "")
-    if not gemini_key:
-        return None
-
-    try:
-        import time
-        from google import genai as google_genai
-        from google.genai.errors import ClientError as _GeminiClientError
-
-        _modelo_principal = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
-        client = google_genai.Client(api_key=gemini_key)
-
-        _todos = [
-            m.name.replace("models/", "")
-            for m in client.models.list()
-            if "generateContent" in (m.supported_actions or [])
-        ]
-        _modelos = [_modelo_principal] + [m for m in _todos if m != _modelo_principal]
-
-        for _modelo in _modelos:
-            for _tentativa in range(2):
-                try:
-                    response = client.models.generate_content(
-                        model=_modelo,
-                        contents=prompt,
-                    )
-                    texto = (response.text or "").strip()
-                    if texto:
-                        print(f"[GEMINI] Respondido por: {_modelo}")
-                        return texto
-                except _GeminiClientError as _ce:
-                    print(f"[GEMINI] {_modelo} descartado (4xx): {_ce}")
-                    break
-                except Exception as _retry_err:
-                    print(f"[GEMINI] {_modelo} tentativa {_tentativa+1} falhou: {_retry_err}")
-                    if _tentativa < 1:
-                        time.sleep(3)
-    except Exception as _err:
-        print(f"[GEMINI] Erro no fallback dinâmico: {_err}")
-
-    return None
-
-
-# ── Workers ───────────────────────────────────────────────────────────────────
-
-def _run_coletar():
-    _set_tarefa("coletar")
-    try:
-        from src.data.scraper_orquestrador import main as scraper_main
-        scraper_main()
-    finally:
-        _set_tarefa(None)
-
-def _run_treinar():
-    _set_tarefa("treinar")
-    try:
-        from src.models.classificador import executar_pipeline_classificador
-        from src.models.regressor_preco import executar_pipeline_multidia
-        executar_pipeline_classificador()
-        executar_pipeline_multidia(max_dias=10, data_calculo=date.today(), save_to_db=True)
-    finally:
-        _set_tarefa(None)
-
-def _run_classificador():
-    _set_tarefa("classificador")
-    try:
-        from src.models.classificador import executar_pipeline_classificador
-        executar_pipeline_classificador()
-    finally:
-        _set_tarefa(None)
-
-def _run_regressor():
-    _set_tarefa("regressor")
-    try:
-        from src.models.regressor_preco import executar_pipeline_multidia
-        # Treina um modelo por horizonte (1..10 dias úteis) — mais robusto que modelo único
-        executar_pipeline_multidia(max_dias=10, data_calculo=date.today(), save_to_db=True)
-    finally:
-        _set_tarefa(None)
-
-def _run_recomendar():
-    _set_tarefa("recomendar")
-    try:
-        from src.core.db_connection import get_connection
-        from src.models.recomendador_acoes import recomendar_varias_acoes
-        conn = get_connection()
-        recomendar_varias_acoes(conn)
-    finally:
-        _set_tarefa(None)
-
-
-def _consultar_resumo_diario_hoje(conn):
-    with conn.cursor() as cur:
-        cur.execute(
-            """
-            SELECT resumo, TO_CHAR(data_ref, 'YYYY-MM-DD') AS data_ref
-            FROM resumos_diarios_ia
-            WHERE data_ref = CURRENT_DATE
-            LIMIT 1
-            """
-        )
-        row = cur.fetchone()
-    if not row:
-        return None
-    return {"resumo": row[0], "gerado_em": row[1]}
-
-
-def _gerar_e_salvar_resumo_diario(conn):
-    df_semana = pd.read_sql(
-        """
-        SELECT COUNT(*) AS total
-        FROM recomendacoes_acoes
-        WHERE resultado ILIKE '%RECOMENDADA%'
-          AND resultado NOT ILIKE '%NÃO%'
-          AND data_insercao >= date_trunc('week', CURRENT_DATE)
-        """,
-        conn,
-    )
-    total_recomendadas_semana = int(df_semana.iloc[0]["total"] or 0)
-
-    df_destaques = pd.read_sql(
-        """
-        WITH base AS (
-            SELECT
-                r.acao,
-                r.resultado,
-                r.data_insercao::date AS dia_ref,
-                i.dividend_yield,
-                i.roe,
-                ROW_NUMBER() OVER (
-                    PARTITION BY r.acao
-                    ORDER BY r.data_insercao DESC
-                ) AS rn
-            FROM recomendacoes_acoes r
-            LEFT JOIN indicadores_fundamentalistas i
-                ON i.acao = r.acao
-               AND i.data_coleta = (
-                   SELECT MAX(i2.data_coleta)
-                   FROM indicadores_fundamentalistas i2
-                   WHERE i2.acao = r.acao
-               )
-            WHERE r.resultado ILIKE '%RECOMENDADA%'
-              AND r.resultado NOT ILIKE '%NÃO%'
-              AND r.data_insercao >= date_trunc('week', CURRENT_DATE)
-        )
-        SELECT acao, dividend_yield, roe
-        FROM base
-        WHERE rn = 1
-        ORDER BY COALESCE(dividend_yield, 0) + COALESCE(roe, 0) DESC
-        LIMIT 3
-        """,
-        conn,
+def _iniciar_worker_embutido(tipos: list) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, str(_PROJECT_ROOT / "scripts" / "worker_tarefas.py"), "--tipos", *tipos]
     )
 
-    try:
-        df_erro = pd.read_sql(
-            """
-            SELECT ROUND(AVG(
-                ((r.preco_previsto - i.cotacao) / i.cotacao) * 100
-            )::numeric, 4) AS erro_medio_10d
-            FROM resultados_precos r
-            LEFT JOIN indicadores_fundamentalistas i
-              ON r.acao = i.acao
-             AND r.data_previsao = i.data_coleta
-            WHERE r.data_previsao <= CURRENT_DATE
-              AND r.data_previsao >= CURRENT_DATE - INTERVAL '30 days'
-              AND i.cotacao IS NOT NULL
-              AND i.cotacao <> 0
-            """,
-            conn,
-        )
-        erro_medio_10d = df_erro.iloc[0]["erro_medio_10d"]
-    except Exception:
-        df_erro = pd.read_sql(
-            """
-            SELECT ROUND(AVG(
-                CASE WHEN i.cotacao IS NOT NULL AND i.cotacao <> 0
-                     THEN ((r.preco_previsto - i.cotacao) / i.cotacao) * 100
-                     ELSE NULL END
-            )::numeric, 4) AS erro_medio_10d
-            FROM resultados_precos r
-            LEFT JOIN indicadores_fundamentalistas i
-              ON r.acao = i.acao
-             AND r.data_previsao = i.data_coleta
-            WHERE r.data_previsao <= CURRENT_DATE
-              AND r.data_previsao >= CURRENT_DATE - INTERVAL '30 days'
-            """,
-            conn,
-        )
-        erro_medio_10d = df_erro.iloc[0]["erro_medio_10d"]
-
-    destaque_linhas = []
-    for _, row in df_destaques.iterrows():
-        dy = row["dividend_yield"]
-        roe = row["roe"]
-        dy_str = "n/d" if pd.isna(dy) else f"{float(dy):.2f}%"
-        roe_str = "n/d" if pd.isna(roe) else f"{float(roe):.2f}%"
-        destaque_linhas.append(f"- {row['acao']} (DY: {dy_str}, ROE: {roe_str})")
-    tem_destaques = len(destaque_linhas) > 0
-    destaques_texto = "\n".join(destaque_linhas) if tem_destaques else "- Sem destaques suficientes nesta semana"
-
-    tem_erro = not pd.isna(erro_medio_10d)
-    erro_str = "n/d" if not tem_erro else f"{float(erro_medio_10d):.2f}%"
-    contexto_qualitativo = (
-        f"- Há recomendações esta semana? {'sim' if total_recomendadas_semana > 0 else 'não'}\n"
-        f"- Há top destaques positivos válidos? {'sim' if tem_destaques else 'não'}\n"
-        f"- Há erro médio de 10 dias disponível? {'sim' if tem_erro else 'não'}"
-    )
 
-    prompt = f"""Você é um analista de investimentos e deve gerar um resumo diário curto para um dashboard financeiro.
-
-Dados objetivos de hoje:
-- Ações recomendadas nesta semana: {total_recomendadas_semana}
-- Top 3 destaques positivos (melhor combinação DY + ROE):
-{destaques_texto}
-- Erro médio do modelo de previsão (últimos 10 dias): {erro_str}
-Contexto de disponibilidade dos dados:
-{contexto_qualitativo}
-
-Escreva um resumo em português do Brasil, entre 3 e 5 frases, tom profissional e claro para tomada de decisão.
-Inclua leitura crítica breve de risco/atenção e oportunidade.
-Se algum dado estiver indisponível, mencione isso no máximo uma vez, sem repetir a mesma ideia em frases diferentes.
-Evite enfatizar ausência de dados; priorize orientação prática de acompanhamento (o que monitorar no próximo ciclo).
-Não use markdown, títulos, listas, cabeçalhos, nem linha inicial do tipo "Resumo Diário".
-Não inclua placeholders como [Data], {{Data}} ou <Data>.
-Comece diretamente pela análise, em texto corrido.
-"""
-    resumo = _gerar_texto_gemini_com_fallback(prompt)
-    if not resumo:
-        if total_recomendadas_semana == 0 and not tem_destaques and not tem_erro:
-            resumo = (
-                "O mercado entrou na semana sem sinais objetivos fortes para novas entradas pelo modelo. "
-                "O cenário favorece postura seletiva, com foco em preservar qualidade da carteira e acompanhar gatilhos de tendência e resultado operacional. "
-                "A prioridade no curto prazo é monitorar a próxima atualização dos indicadores e das recomendações para identificar mudanças de direção."
-            )
-        elif total_recomendadas_semana == 0:
-            resumo = (
-                f"Na semana atual, o modelo ainda não confirmou novas recomendações de compra. "
-                f"{'Os destaques observados no recorte recente incluem ' + ', '.join(df_destaques['acao'].tolist()) + '. ' if tem_destaques else ''}"
-                f"{f'O erro médio recente está em {erro_str}, referência útil para calibrar confiança nas projeções. ' if tem_erro else ''}"
-                "A leitura do momento é de prudência tática, com acompanhamento próximo dos próximos sinais de retomada."
-            )
-        else:
-            resumo = (
-                f"Na semana atual, o modelo marcou {total_recomendadas_semana} ações como recomendadas. "
-                f"{'Entre os principais destaques por DY e ROE estão ' + ', '.join(df_destaques['acao'].tolist()) + '. ' if tem_destaques else ''}"
-                f"{f'O erro médio recente das previsões está em {erro_str}, métrica importante para ajustar nível de convicção. ' if tem_erro else ''}"
-                "A estratégia é manter acompanhamento disciplinado da evolução dos indicadores para priorizar entradas com melhor relação risco-retorno."
-            )
-    else:
-        # Remove títulos/headers redundantes gerados pelo LLM e placeholders de data.
-        linhas = [ln.strip() for ln in resumo.splitlines() if ln.strip()]
-        linhas_filtradas = []
-        for ln in linhas:
-            lower = ln.lower()
-            if "resumo diário" in lower or "resumo do dia" in lower:
+def _supervisionar_workers() -> None:
+    """Reinicia workers embutidos que morreram (crash, OOM kill)."""
+    while not _parar_supervisao.wait(INTERVALO_SUPERVISAO_WORKERS):
+        for i, (tipos, processo) in enumerate(_workers_embutidos):
+            codigo = processo.poll()
+            if codigo is None:
                 continue
-            ln = re.sub(r"\[data\]|\{data\}|<data>", "", ln, flags=re.IGNORECASE).strip(" -–—:")
-            if ln:
-                linhas_filtradas.append(ln)
-        if linhas_filtradas:
-            resumo = " ".join(linhas_filtradas).strip()
-
-    with conn.cursor() as cur:
-        cur.execute(
-            """
-            INSERT INTO resumos_diarios_ia (data_ref, resumo)
-            VALUES (CURRENT_DATE, %s)
-            ON CONFLICT (data_ref)
-            DO UPDATE SET resumo = EXCLUDED.resumo, gerado_em = NOW()
-            RETURNING resumo, TO_CHAR(data_ref, 'YYYY-MM-DD') AS data_ref
-            """,
-            (resumo,),
-        )
-        saved = cur.fetchone()
-    return {"resumo": saved[0], "gerado_em": saved[1]}
-
-
-def _run_resumo_diario():
-    _set_tarefa("resumo-diario")
-    conn = None
-    lock_key = 88442217
-    try:
-        from src.core.db_connection import get_connection
-        conn = get_connection()
-        with conn.cursor() as cur:
-            cur.execute("SELECT pg_advisory_lock(%s)", (lock_key,))
-        existente = _consultar_resumo_diario_hoje(conn)
-        if existente:
-            return
-        _gerar_e_salvar_resumo_diario(conn)
-    finally:
-        if conn is not None:
+            print(f"⚠️ Worker embutido (pid {processo.pid}) saiu com código {codigo}; reiniciando.")
             try:
-                with conn.cursor() as cur:
-                    cur.execute("SELECT pg_advisory_unlock(%s)", (lock_key,))
-            except Exception:
-                pass
-            conn.close()
-        _set_tarefa(None)
+                _workers_embutidos[i] = (tipos, _iniciar_worker_embutido(tipos))
+            except OSError as e:
+                print(f"❌ Não foi possível reiniciar o worker embutido: {e}")
 
 
-def _run_backup_banco():
-    _set_tarefa("backup-banco")
-    try:
-        from scripts.backup import criar_backup, enviar_backup_email
-
-        dump = criar_backup()
-        enviar_backup_email(dump)
-    finally:
-        _set_tarefa(None)
-
 # ── App ───────────────────────────────────────────────────────────────────────
 
 app = FastAPI(title="Insight Invest API", version="1.0.0")
@@ -365,83 +73,190 @@ app = FastAPI(title="Insight Invest API", version="1.0.0")
 def _startup_garantir_tabelas():
     garantir_tabelas()
 
+
+@app.on_event("startup")
+def _startup_workers():
+    if FILA_WORKERS_EMBUTIDOS <= 0:
+        return
+    from src.api.tarefas import TAREFAS
+    # Previsões do dashboard têm um worker só delas: não esperam atrás de um treino
+    gerais = [tipo for tipo in TAREFAS if tipo != "previsao"]
+    for _ in range(FILA_WORKERS_EMBUTIDOS):
+        _workers_embutidos.append((gerais, _iniciar_worker_embutido(gerais)))
+    _workers_embutidos.append((["previsao"], _iniciar_worker_embutido(["previsao"])))
+    if _workers_embutidos:
+        threading.Thread(target=_supervisionar_workers, daemon=True).start()
+
+
+@app.on_event("shutdown")
+def _shutdown_workers():
+    _parar_supervisao.set()
+    # SIGTERM: cada worker termina a tarefa em andamento e sai
+    for _, processo in _workers_embutidos:
+        processo.terminate()
+
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
+def _enfileirar_tarefa(tipo: str) -> dict:
+    from src.core import fila_tarefas
+
+    try:
+        tarefa_id = fila_tarefas.enfileirar(tipo, chave_dedupe=tipo)
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=f"Erro ao enfileirar tarefa: {exc}") from exc
+    if tarefa_id is None:
+        raise HTTPException(status_code=409, detail=f"Tarefa '{tipo}' já em andamento")
+    return {"aceito": True, "tarefa": tipo, "id": tarefa_id}
+
 @app.get("/tarefas/status")
 def status(_key: str = Security(verificar_chave)):
-    tarefa = _get_tarefa()
-    if tarefa:
-        return {"em_andamento": True, "tarefa": tarefa}
-    return {"em_andamento": False, "tarefa": None}
+    """Tarefas pendentes e em execução na fila (em_andamento/tarefa: a mais antiga em execução)."""
+    from src.core import fila_tarefas
+
+    try:
+        ativas = fila_tarefas.listar_ativas()
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=f"Erro ao consultar a fila: {exc}") from exc
+    executando = [t for t in ativas if t["status"] == fila_tarefas.EXECUTANDO]
+    return {
+        "em_andamento": bool(executando),
+        "tarefa": executando[0]["tipo"] if executando else None,
+        "tarefas": ativas,
+    }
+
+@app.get("/tarefas/{tarefa_id}")
+def tarefa(tarefa_id: int, _key: str = Security(verificar_chave)):
+    """Status, progresso, erro e tempos (espera_s, duracao_s) de uma tarefa da fila."""
+    from src.core import fila_tarefas
+
+    try:
+        registro = fila_tarefas.obter(tarefa_id)
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=f"Erro ao consultar a fila: {exc}") from exc
+    if registro is None:
+        raise HTTPException(status_code=404, detail=f"Tarefa {tarefa_id} não encontrada")
+    return registro
 
 @app.post("/tarefas/coletar", status_code=202)
-def coletar(background_tasks: BackgroundTasks, _key: str = Security(verificar_chave)):
-    if _get_tarefa():
-        raise HTTPException(status_code=409, detail=f"Tarefa '{_get_tarefa()}' já em andamento")
-    background_tasks.add_task(_run_coletar)
-    return {"aceito": True, "tarefa": "coletar"}
+def coletar(_key: str = Security(verificar_chave)):
+    return _enfileirar_tarefa("coletar")
 
 @app.post("/tarefas/treinar", status_code=202)
-def treinar(background_tasks: BackgroundTasks, _key: str = Security(verificar_chave)):
-    if _get_tarefa():
-        raise HTTPException(status_code=409, detail=f"Tarefa '{_get_tarefa()}' já em andamento")
-    background_tasks.add_task(_run_treinar)
-    return {"aceito": True, "tarefa": "treinar"}
+def treinar(_key: str = Security(verificar_chave)):
+    return _enfileirar_tarefa("treinar")
 
 @app.post("/tarefas/treinar-classificador", status_code=202)
-def treinar_classificador(background_tasks: BackgroundTasks, _key: str = Security(verificar_chave)):
-    if _get_tarefa():
-        raise HTTPException(status_code=409, detail=f"Tarefa '{_get_tarefa()}' já em andamento")
-    background_tasks.add_task(_run_classificador)
-    return {"aceito": True, "tarefa": "classificador"}
+def treinar_classificador(_key: str = Security(verificar_chave)):
+    return _enfileirar_tarefa("classificador")
 
 @app.post("/tarefas/treinar-regressor", status_code=202)
-def treinar_regressor(background_tasks: BackgroundTasks, _key: str = Security(verificar_chave)):
-    if _get_tarefa():
-        raise HTTPException(status_code=409, detail=f"Tarefa '{_get_tarefa()}' já em andamento")
-    background_tasks.add_task(_run_regressor)
-    return {"aceito": True, "tarefa": "regressor"}
+def treinar_regressor(_key: str = Security(verificar_chave)):
+    return _enfileirar_tarefa("regressor")
 
 @app.post("/tarefas/recomendar", status_code=202)
-def recomendar(background_tasks: BackgroundTasks, _key: str = Security(verificar_chave)):
-    if _get_tarefa():
-        raise HTTPException(status_code=409, detail=f"Tarefa '{_get_tarefa()}' já em andamento")
-    background_tasks.add_task(_run_recomendar)
-    return {"aceito": True, "tarefa": "recomendar"}
-
+def recomendar(_key: str = Security(verificar_chave)):
+    return _enfileirar_tarefa("recomendar")
 
 @app.post("/tarefas/gerar-resumo-diario", status_code=202)
-def gerar_resumo_diario(background_tasks: BackgroundTasks, _key: str = Security(verificar_chave)):
-    if _get_tarefa():
-        raise HTTPException(status_code=409, detail=f"Tarefa '{_get_tarefa()}' já em andamento")
-    background_tasks.add_task(_run_resumo_diario)
-    return {"aceito": True, "tarefa": "resumo-diario"}
-
+def gerar_resumo_diario(_key: str = Security(verificar_chave)):
+    return _enfileirar_tarefa("resumo-diario")
 
 @app.post("/tarefas/backup-banco", status_code=202)
-def backup_banco(background_tasks: BackgroundTasks, _key: str = Security(verificar_chave)):
-    if _get_tarefa():
-        raise HTTPException(status_code=409, detail=f"Tarefa '{_get_tarefa()}' já em andamento")
-    background_tasks.add_task(_run_backup_banco)
-    return {"aceito": True, "tarefa": "backup-banco"}
+def backup_banco(_key: str = Security(verificar_chave)):
+    return _enfileirar_tarefa("backup-banco")
 
-@app.post("/recomendacao/{ticker}")
-def recomendacao_ticker(ticker: str, _key: str = Security(verificar_chave)):
+@app.get("/coleta/telemetria")
+def coleta_telemetria(execucoes: int = 5, _key: str = Security(verificar_chave)):
+    """Latência (p50/p95/p99, histograma), erros e preenchimento por fonte nas últimas N coletas."""
+    from src.data import telemetria_coleta
+    from src.data.scraper_orquestrador import COLUNAS_INDICADORES
+
+    if not 1 <= execucoes <= 100:
+        raise HTTPException(status_code=400, detail="execucoes deve estar entre 1 e 100.")
+    try:
+        return telemetria_coleta.resumo_por_fonte(execucoes, total_campos=len(COLUNAS_INDICADORES))
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=f"Erro ao consultar telemetria: {exc}") from exc
+
+# ── Recomendação ──────────────────────────────────────────────────────────────
+
+MAX_TICKERS_LOTE = 100
+
+
+class PedidoRecomendacaoLote(BaseModel):
+    tickers: list[str]
+    stream: bool = True
+    max_idade_horas: float | None = None
+
+
+@app.post("/recomendacao/lote")
+def recomendacao_lote(pedido: PedidoRecomendacaoLote, _key: str = Security(verificar_chave)):
+    """
+    Recomendação de vários tickers: indicadores do banco (quando recentes) ou
+    coletados em paralelo, previsão vetorizada e um resultado por ticker assim
+    que fica pronto (NDJSON com stream=true; senão JSON ao final). Sem
+    explicação de IA — use POST /recomendacao/{ticker}/explicacao.
+    """
+    from src.models.recomendador_acoes import (
+        carregar_artefatos_modelo,
+        montar_resposta_recomendacao,
+        recomendar_em_fluxo,
+    )
+
+    tickers = list(dict.fromkeys(t.strip().upper() for t in pedido.tickers if t and t.strip()))
+    if not tickers:
+        raise HTTPException(status_code=400, detail="Informe ao menos um ticker.")
+    if len(tickers) > MAX_TICKERS_LOTE:
+        raise HTTPException(status_code=400, detail=f"Máximo de {MAX_TICKERS_LOTE} tickers por lote.")
+
+    try:
+        modelo = carregar_artefatos_modelo()
+    except FileNotFoundError as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=f"Erro ao carregar modelo: {exc}") from exc
+
+    def _resultados():
+        try:
+            for item in recomendar_em_fluxo(tickers, modelo=modelo, max_idade_horas=pedido.max_idade_horas):
+                if "erro" in item:
+                    yield {"ticker": item["ticker"], "erro": item["erro"]}
+                    continue
+                resposta = montar_resposta_recomendacao(
+                    item["ticker"], item["prob_sim"], item["prob_nao"], item["features"]
+                )
+                resposta["origem"] = item["origem"]
+                yield resposta
+        except Exception as exc:
+            print(f"❌ Erro na recomendação em lote: {exc}")
+            yield {"erro": f"Erro durante a recomendação em lote: {exc}"}
+
+    if pedido.stream:
+        return StreamingResponse(
+            (json.dumps(r, ensure_ascii=False) + "\n" for r in _resultados()),
+            media_type="application/x-ndjson",
+        )
+    return {"resultados": list(_resultados())}
+
+
+def _etag_confere(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidatas = [c.strip() for c in if_none_match.split(",")]
+    return "*" in candidatas or etag in (c.removeprefix("W/") for c in candidatas)
+
+
+def _recomendacao_ao_vivo(ticker: str):
+    """Coleta e prevê o ticker agora; devolve (resposta, modelo, features)."""
     from src.models.recomendador_acoes import (
         FEATURES_ESPERADAS_PELO_MODELO,
-        FEATURES_CHAVE_PARA_EXIBIR_E_JUSTIFICAR,
         calcular_preco_sobre_graham_para_recomendacao,
         carregar_artefatos_modelo,
         coletar_indicadores,
+        montar_resposta_recomendacao,
     )
-    import pandas as pd
-    import numpy as np
-
-    ticker = ticker.strip().upper()
-    if not ticker:
-        raise HTTPException(status_code=400, detail="Ticker inválido")
 
     resultado_scraper = coletar_indicadores(ticker)
     if isinstance(resultado_scraper, str) or resultado_scraper is None:
@@ -469,180 +284,147 @@ def recomendacao_ticker(ticker: str, _key: str = Security(verificar_chave)):
     except Exception as exc:
         raise HTTPException(status_code=500, detail=f"Erro durante previsão: {exc}") from exc
 
-    prob_nao = float(proba[0])
-    prob_sim = float(proba[1])
-
-    if prob_sim >= 0.75:
-        resultado = "FORTEMENTE RECOMENDADA para compra"
-    elif prob_sim >= 0.60:
-        resultado = "RECOMENDADA para compra"
-    elif prob_sim >= 0.50:
-        resultado = "PARCIALMENTE RECOMENDADA (Viés positivo)"
-    elif prob_sim >= 0.40:
-        resultado = "PARCIALMENTE NÃO RECOMENDADA (Viés negativo)"
-    elif prob_sim >= 0.25:
-        resultado = "NÃO RECOMENDADA para compra"
-    else:
-        resultado = "FORTEMENTE NÃO RECOMENDADA para compra"
-
-    def _v(col):
-        if col not in x_final.columns:
-            return np.nan
-        return pd.to_numeric(x_final[col].iloc[0], errors="coerce")
-
-    pl = _v("pl")
-    pvp = _v("pvp")
-    dy = _v("dividend_yield")
-    roe = _v("roe")
-    psg = _v("preco_sobre_graham")
-    var12m = _v("variacao_12m")
-    margem_liq = _v("margem_liquida")
-    p_ebit = _v("p_ebit")
-
-    justificativas_positivas = []
-    justificativas_negativas = []
-
-    if pd.notna(pl):
-        if pl <= 0:
-            justificativas_negativas.append(f"Empresa com prejuízo (P/L={pl:.2f}).")
-        elif 0 < pl < 2:
-            justificativas_negativas.append(f"P/L excessivamente baixo ({pl:.2f}), pode indicar alto risco ou distorções.")
-        elif 2 <= pl < 10:
-            justificativas_positivas.append(f"P/L baixo ({pl:.2f}), pode indicar subavaliação.")
-        elif 10 <= pl < 20:
-            justificativas_positivas.append(f"P/L em nível razoável ({pl:.2f}).")
-        elif pl >= 20:
-            justificativas_negativas.append(f"P/L elevado ({pl:.2f}).")
-
-    if pd.notna(pvp):
-        if pvp <= 0:
-            justificativas_negativas.append(f"Patrimônio líquido negativo ou zero (P/VP={pvp:.2f}).")
-        elif 0 < pvp < 1:
-            justificativas_positivas.append(f"P/VP < 1 ({pvp:.2f}), pode estar descontada em relação ao VPA.")
-        elif 1 <= pvp < 2:
-            justificativas_positivas.append(f"P/VP razoável ({pvp:.2f}).")
-        elif pvp >= 2:
-            justificativas_negativas.append(f"P/VP pode ser considerado alto ({pvp:.2f}).")
-
-    if pd.notna(dy):
-        if dy >= 6:
-            justificativas_positivas.append(f"Excelente Dividend Yield ({dy:.2f}%).")
-        elif 4 <= dy < 6:
-            justificativas_positivas.append(f"Bom Dividend Yield ({dy:.2f}%).")
-        elif 0 <= dy < 2:
-            justificativas_negativas.append(f"Dividend Yield baixo ({dy:.2f}%).")
-        elif dy < 0:
-            justificativas_negativas.append(f"Dividend Yield negativo ({dy:.2f}%), requer atenção.")
-
-    if pd.notna(roe):
-        if roe > 50:
-            justificativas_negativas.append(f"ROE extremamente alto ({roe:.2f}%), pode indicar distorção contábil ou patrimônio muito baixo.")
-        elif 20 <= roe <= 50:
-            justificativas_positivas.append(f"Excelente rentabilidade (ROE {roe:.2f}%).")
-        elif 15 <= roe < 20:
-            justificativas_positivas.append(f"Boa rentabilidade (ROE {roe:.2f}%).")
-        elif 0 <= roe < 10:
-            justificativas_negativas.append(f"Rentabilidade (ROE {roe:.2f}%) pode ser melhorada.")
-        elif roe < 0:
-            justificativas_negativas.append(f"Rentabilidade negativa (ROE {roe:.2f}%).")
-
-    if pd.notna(psg):
-        if psg < 0.75:
-            justificativas_positivas.append(f"Preço atrativo pelo Valor de Graham (P/VG {psg:.2f}).")
-        elif 0.75 <= psg < 1.2:
-            justificativas_positivas.append(f"Preço razoável pelo Valor de Graham (P/VG {psg:.2f}).")
-        elif psg >= 1.5:
-            justificativas_negativas.append(f"Preço elevado pelo Valor de Graham (P/VG {psg:.2f}).")
-
-    if pd.notna(var12m):
-        if var12m > 15:
-            justificativas_positivas.append(f"Boa valorização recente (Variação 12M: {var12m:.2f}%).")
-        elif var12m < -15:
-            justificativas_negativas.append(f"Desvalorização considerável recente (Variação 12M: {var12m:.2f}%).")
-
-    if pd.notna(margem_liq):
-        if margem_liq > 40:
-            justificativas_negativas.append(f"Margem líquida extremamente alta ({margem_liq:.2f}%), pode indicar lucro não recorrente.")
-        elif 15 < margem_liq <= 40:
-            justificativas_positivas.append(f"Excelente margem líquida ({margem_liq:.2f}%).")
-        elif 5 <= margem_liq <= 15:
-            justificativas_positivas.append(f"Margem líquida razoável ({margem_liq:.2f}%).")
-        elif margem_liq < 5:
-            justificativas_negativas.append(f"Margem líquida apertada ou negativa ({margem_liq:.2f}%).")
-
-    if pd.notna(p_ebit):
-        if p_ebit <= 0:
-            justificativas_negativas.append(f"EBIT negativo ou zero (P/EBIT={p_ebit:.2f}).")
-        elif 0 < p_ebit < 10:
-            justificativas_positivas.append(f"P/EBIT atrativo ({p_ebit:.2f}).")
-        elif p_ebit >= 15:
-            justificativas_negativas.append(f"P/EBIT elevado ({p_ebit:.2f}).")
-
-    indicadores_chave = {}
-    for feat in FEATURES_CHAVE_PARA_EXIBIR_E_JUSTIFICAR:
-        val = _v(feat)
-        indicadores_chave[feat] = None if pd.isna(val) else float(val)
-
-    # ── Explicação XAI via Gemini ─────────────────────────────────────────────
-    explicacao_ia = None
-    try:
-        feature_names = FEATURES_ESPERADAS_PELO_MODELO
-        importances = modelo.feature_importances_
-        top_idx = importances.argsort()[::-1][:5]
-        top_features = [
-            f"{feature_names[i]} ({importances[i]*100:.1f}%): {_v(feature_names[i]):.2f}"
-            for i in top_idx
-            if not pd.isna(_v(feature_names[i]))
-        ]
+    valores = x_final.iloc[0]
+    return montar_resposta_recomendacao(ticker, float(proba[1]), float(proba[0]), valores), modelo, valores
+
 
-        positivos_str = "\n".join(f"- {j}" for j in justificativas_positivas) or "Nenhum"
-        negativos_str = "\n".join(f"- {j}" for j in justificativas_negativas) or "Nenhum"
-        top_str = "\n".join(f"- {f}" for f in top_features) or "Não disponível"
+def _ticker_valido(ticker: str) -> str:
+    ticker = ticker.strip().upper()
+    if not ticker:
+        raise HTTPException(status_code=400, detail="Ticker inválido")
+    return ticker
 
-        prompt = f"""Você é um analista de investimentos em ações brasileiras. Analise a recomendação do modelo de machine learning para a ação {ticker} e escreva uma explicação clara e objetiva em português.
 
-DADOS DO MODELO:
-- Resultado: {resultado}
-- Probabilidade de ser recomendada: {prob_sim*100:.1f}%
+@app.get("/recomendacao/{ticker}")
+def recomendacao_ticker_leitura(
+    ticker: str,
+    if_none_match: str | None = Header(default=None),
+    _key: str = Security(verificar_chave),
+):
+    """
+    Leitura condicional da recomendação (sem explicação de IA — peça-a em
+    POST /recomendacao/{ticker}/explicacao). Com snapshot recente, a
+    precondição If-None-Match é avaliada com o ETag gravado antes de qualquer
+    outro trabalho: 304 custa uma consulta pela chave primária.
+    """
+    from src.models import snapshot_recomendacoes
+
+    ticker = _ticker_valido(ticker)
+    snapshot = snapshot_recomendacoes.carregar(ticker)
+    if snapshot is not None:
+        cabecalhos = {"ETag": snapshot["etag"], "X-Recomendacao-Origem": "snapshot"}
+        if _etag_confere(if_none_match, snapshot["etag"]):
+            return Response(status_code=304, headers=cabecalhos)
+        resposta = dict(snapshot["payload"])
+    else:
+        resposta, _, _ = _recomendacao_ao_vivo(ticker)
+        etag = snapshot_recomendacoes.calcular_etag(resposta)
+        cabecalhos = {"ETag": etag, "X-Recomendacao-Origem": "ao-vivo"}
+        if _etag_confere(if_none_match, etag):
+            return Response(status_code=304, headers=cabecalhos)
 
-FEATURES MAIS IMPORTANTES PARA ESTA DECISÃO (nome: peso do modelo | valor atual):
-{top_str}
+    # O ETag cobre só o payload; a explicação é outro recurso
+    resposta["explicacao_ia"] = None
+    return JSONResponse(content=resposta, headers=cabecalhos)
+
+
+@app.post("/recomendacao/{ticker}")
+def recomendacao_ticker(
+    ticker: str,
+    explicacao: bool = True,
+    _key: str = Security(verificar_chave),
+):
+    """
+    Recomendação de um ticker, com a explicação de IA. Serve o snapshot noturno
+    (recomendacoes_snapshot) quando há um recente; só coleta e prevê ao vivo os
+    tickers fora do snapshot. Para cache HTTP (ETag/304), use GET.
+    """
+    from src.models import snapshot_recomendacoes
+    from src.models.recomendador_acoes import carregar_artefatos_modelo
+
+    ticker = _ticker_valido(ticker)
+    snapshot = snapshot_recomendacoes.carregar(ticker)
+    if snapshot is not None:
+        origem = "snapshot"
+        resposta = dict(snapshot["payload"])
+        valores = snapshot["features"]
+        modelo = None
+    else:
+        origem = "ao-vivo"
+        resposta, modelo, valores = _recomendacao_ao_vivo(ticker)
+
+    resposta["explicacao_ia"] = None
+    if explicacao:
+        # Espera até EXPLICACAO_IA_ESPERA s; depois disso a geração segue em
+        # segundo plano e fica no cache para /recomendacao/{ticker}/explicacao
+        from src.api.explicacao_ia import ESPERA_PADRAO, obter_explicacao
+        try:
+            modelo = modelo or carregar_artefatos_modelo()
+            _, resposta["explicacao_ia"] = obter_explicacao(
+                ticker, resposta, modelo, valores, espera=ESPERA_PADRAO
+            )
+        except Exception as exc:
+            print(f"[XAI] Explicação indisponível para {ticker}: {exc}")
+
+    return JSONResponse(content=resposta, headers={"X-Recomendacao-Origem": origem})
+
+
+@app.post("/recomendacao/{ticker}/explicacao")
+def recomendacao_explicacao(ticker: str, espera: float = 0.0, _key: str = Security(verificar_chave)):
+    """
+    Explicação de IA de uma recomendação, pedida depois do resultado numérico.
+    Responde 200 com o texto quando já está em cache (ou fica pronto em até
+    `espera` segundos) e 202 com status "gerando" enquanto a geração segue em
+    segundo plano — basta repetir a chamada.
+    """
+    from contextlib import closing
+    from src.api.explicacao_ia import GERANDO, obter_explicacao
+    from src.models.recomendador_acoes import (
+        carregar_artefatos_modelo,
+        montar_resposta_recomendacao,
+        recomendar_em_fluxo,
+    )
 
-PONTOS POSITIVOS IDENTIFICADOS:
-{positivos_str}
+    ticker = ticker.strip().upper()
+    if not ticker:
+        raise HTTPException(status_code=400, detail="Ticker inválido")
 
-PONTOS DE ATENÇÃO IDENTIFICADOS:
-{negativos_str}
+    try:
+        modelo = carregar_artefatos_modelo()
+    except FileNotFoundError as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=f"Erro ao carregar modelo: {exc}") from exc
 
-Escreva entre 3 e 5 frases explicando por que o modelo chegou a essa conclusão, conectando os indicadores mais relevantes com o resultado. Use linguagem acessível, sem jargões excessivos. Não repita os números já listados acima — apenas interprete-os. Não use markdown, listas ou títulos — apenas texto corrido.
-"""
-        explicacao_ia = _gerar_texto_gemini_com_fallback(prompt)
-    except Exception as _xai_err:
-        print(f"[XAI] Erro ao chamar Gemini: {_xai_err}")
-        explicacao_ia = None
+    # Indicadores do banco ou do cache de coleta (a recomendação acabou de coletá-los)
+    with closing(recomendar_em_fluxo([ticker], modelo=modelo)) as fluxo:
+        item = next(fluxo, None)
+    if item is None or "erro" in item:
+        raise HTTPException(status_code=422, detail=f"Falha ao coletar dados para {ticker}")
 
-    return {
+    resposta = montar_resposta_recomendacao(ticker, item["prob_sim"], item["prob_nao"], item["features"])
+    status, texto = obter_explicacao(ticker, resposta, modelo, item["features"], espera=min(max(espera, 0.0), 60.0))
+    corpo = {
         "ticker": ticker,
-        "resultado": resultado,
-        "probabilidades": {
-            "nao_recomendada": prob_nao,
-            "recomendada": prob_sim,
-        },
-        "indicadores_chave": indicadores_chave,
-        "justificativas_positivas": justificativas_positivas,
-        "justificativas_negativas": justificativas_negativas,
-        "explicacao_ia": explicacao_ia,
+        "resultado": resposta["resultado"],
+        "probabilidades": resposta["probabilidades"],
+        "status": status,
+        "explicacao_ia": texto,
     }
+    if status == GERANDO:
+        return JSONResponse(status_code=202, content=corpo)
+    return corpo
 
 
 @app.get("/resumo-diario")
 def resumo_diario():
+    from src.api.resumo_diario import consultar_resumo_diario_hoje
     from src.core.db_connection import get_connection
 
     conn = None
     try:
         conn = get_connection()
-        payload = _consultar_resumo_diario_hoje(conn)
+        payload = consultar_resumo_diario_hoje(conn)
         if not payload:
             raise HTTPException(status_code=404, detail="Resumo diário ainda não foi gerado para hoje.")
         return payload
@@ -673,14 +455,22 @@ def upload_modelo(
     modelo_dir.mkdir(parents=True, exist_ok=True)
     destino = modelo_dir / nome_esperado
 
+    # Grava em arquivo temporário e troca atomicamente: leitores (inclusive
+    # modelos carregados com mmap) nunca veem um .pkl pela metade
+    temporario = destino.with_suffix(".pkl.tmp")
     try:
-        with destino.open("wb") as f:
+        with temporario.open("wb") as f:
             shutil.copyfileobj(arquivo.file, f)
+        os.replace(temporario, destino)
     except Exception as exc:
+        temporario.unlink(missing_ok=True)
         raise HTTPException(status_code=500, detail=f"Falha ao salvar arquivo: {exc}") from exc
     finally:
         arquivo.file.close()
 
+    from src.models import registro_modelos
+    registro_modelos.invalidar(destino)
+
     return {
         "ok": True,
         "arquivo": str(destino),
@@ -0,0 +1,230 @@
+"""
+Resumo diário de IA do dashboard (tabela resumos_diarios_ia).
+
+Gerado uma vez por dia pela tarefa "resumo-diario" (fila_tarefas) e servido
+por GET /resumo-diario.
+"""
+
+import sys
+from pathlib import Path
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+import re
+
+import pandas as pd
+
+from src.api.explicacao_ia import gerar_texto
+from src.core.db_connection import get_connection
+
+# pg_advisory_lock: um único gerador por dia, mesmo com vários workers
+_CHAVE_LOCK = 88442217
+
+
+def consultar_resumo_diario_hoje(conn):
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT resumo, TO_CHAR(data_ref, 'YYYY-MM-DD') AS data_ref
+            FROM resumos_diarios_ia
+            WHERE data_ref = CURRENT_DATE
+            LIMIT 1
+            """
+        )
+        row = cur.fetchone()
+    if not row:
+        return None
+    return {"resumo": row[0], "gerado_em": row[1]}
+
+
+def gerar_e_salvar_resumo_diario(conn):
+    df_semana = pd.read_sql(
+        """
+        SELECT COUNT(*) AS total
+        FROM recomendacoes_acoes
+        WHERE resultado ILIKE '%RECOMENDADA%'
+          AND resultado NOT ILIKE '%NÃO%'
+          AND data_insercao >= date_trunc('week', CURRENT_DATE)
+        """,
+        conn,
+    )
+    total_recomendadas_semana = int(df_semana.iloc[0]["total"] or 0)
+
+    df_destaques = pd.read_sql(
+        """
+        WITH base AS (
+            SELECT
+                r.acao,
+                r.resultado,
+                r.data_insercao::date AS dia_ref,
+                i.dividend_yield,
+                i.roe,
+                ROW_NUMBER() OVER (
+                    PARTITION BY r.acao
+                    ORDER BY r.data_insercao DESC
+                ) AS rn
+            FROM recomendacoes_acoes r
+            LEFT JOIN indicadores_fundamentalistas i
+                ON i.acao = r.acao
+               AND i.data_coleta = (
+                   SELECT MAX(i2.data_coleta)
+                   FROM indicadores_fundamentalistas i2
+                   WHERE i2.acao = r.acao
+               )
+            WHERE r.resultado ILIKE '%RECOMENDADA%'
+              AND r.resultado NOT ILIKE '%NÃO%'
+              AND r.data_insercao >= date_trunc('week', CURRENT_DATE)
+        )
+        SELECT acao, dividend_yield, roe
+        FROM base
+        WHERE rn = 1
+        ORDER BY COALESCE(dividend_yield, 0) + COALESCE(roe, 0) DESC
+        LIMIT 3
+        """,
+        conn,
+    )
+
+    try:
+        df_erro = pd.read_sql(
+            """
+            SELECT ROUND(AVG(
+                ((r.preco_previsto - i.cotacao) / i.cotacao) * 100
+            )::numeric, 4) AS erro_medio_10d
+            FROM resultados_precos r
+            LEFT JOIN indicadores_fundamentalistas i
+              ON r.acao = i.acao
+             AND r.data_previsao = i.data_coleta
+            WHERE r.data_previsao <= CURRENT_DATE
+              AND r.data_previsao >= CURRENT_DATE - INTERVAL '30 days'
+              AND i.cotacao IS NOT NULL
+              AND i.cotacao <> 0
+            """,
+            conn,
+        )
+        erro_medio_10d = df_erro.iloc[0]["erro_medio_10d"]
+    except Exception:
+        df_erro = pd.read_sql(
+            """
+            SELECT ROUND(AVG(
+                CASE WHEN i.cotacao IS NOT NULL AND i.cotacao <> 0
+                     THEN ((r.preco_previsto - i.cotacao) / i.cotacao) * 100
+                     ELSE NULL END
+            )::numeric, 4) AS erro_medio_10d
+            FROM resultados_precos r
+            LEFT JOIN indicadores_fundamentalistas i
+              ON r.acao = i.acao
+             AND r.data_previsao = i.data_coleta
+            WHERE r.data_previsao <= CURRENT_DATE
+              AND r.data_previsao >= CURRENT_DATE - INTERVAL '30 days'
+            """,
+            conn,
+        )
+        erro_medio_10d = df_erro.iloc[0]["erro_medio_10d"]
+
+    destaque_linhas = []
+    for _, row in df_destaques.iterrows():
+        dy = row["dividend_yield"]
+        roe = row["roe"]
+        dy_str = "n/d" if pd.isna(dy) else f"{float(dy):.2f}%"
+        roe_str = "n/d" if pd.isna(roe) else f"{float(roe):.2f}%"
+        destaque_linhas.append(f"- {row['acao']} (DY: {dy_str}, ROE: {roe_str})")
+    tem_destaques = len(destaque_linhas) > 0
+    destaques_texto = "\n".join(destaque_linhas) if tem_destaques else "- Sem destaques suficientes nesta semana"
+
+    tem_erro = not pd.isna(erro_medio_10d)
+    erro_str = "n/d" if not tem_erro else f"{float(erro_medio_10d):.2f}%"
+    contexto_qualitativo = (
+        f"- Há recomendações esta semana? {'sim' if total_recomendadas_semana > 0 else 'não'}\n"
+        f"- Há top destaques positivos válidos? {'sim' if tem_destaques else 'não'}\n"
+        f"- Há erro médio de 10 dias disponível? {'sim' if tem_erro else 'não'}"
+    )
+
+    prompt = f"""Você é um analista de investimentos e deve gerar um resumo diário curto para um dashboard financeiro.
+
+Dados objetivos de hoje:
+- Ações recomendadas nesta semana: {total_recomendadas_semana}
+- Top 3 destaques positivos (melhor combinação DY + ROE):
+{destaques_texto}
+- Erro médio do modelo de previsão (últimos 10 dias): {erro_str}
+Contexto de disponibilidade dos dados:
+{contexto_qualitativo}
+
+Escreva um resumo em português do Brasil, entre 3 e 5 frases, tom profissional e claro para tomada de decisão.
+Inclua leitura crítica breve de risco/atenção e oportunidade.
+Se algum dado estiver indisponível, mencione isso no máximo uma vez, sem repetir a mesma ideia em frases diferentes.
+Evite enfatizar ausência de dados; priorize orientação prática de acompanhamento (o que monitorar no próximo ciclo).
+Não use markdown, títulos, listas, cabeçalhos, nem linha inicial do tipo "Resumo Diário".
+Não inclua placeholders como [Data], {{Data}} ou <Data>.
+Comece diretamente pela análise, em texto corrido.
+"""
+    resumo = gerar_texto(prompt)
+    if not resumo:
+        if total_recomendadas_semana == 0 and not tem_destaques and not tem_erro:
+            resumo = (
+                "O mercado entrou na semana sem sinais objetivos fortes para novas entradas pelo modelo. "
+                "O cenário favorece postura seletiva, com foco em preservar qualidade da carteira e acompanhar gatilhos de tendência e resultado operacional. "
+                "A prioridade no curto prazo é monitorar a próxima atualização dos indicadores e das recomendações para identificar mudanças de direção."
+            )
+        elif total_recomendadas_semana == 0:
+            resumo = (
+                f"Na semana atual, o modelo ainda não confirmou novas recomendações de compra. "
+                f"{'Os destaques observados no recorte recente incluem ' + ', '.join(df_destaques['acao'].tolist()) + '. ' if tem_destaques else ''}"
+                f"{f'O erro médio recente está em {erro_str}, referência útil para calibrar confiança nas projeções. ' if tem_erro else ''}"
+                "A leitura do momento é de prudência tática, com acompanhamento próximo dos próximos sinais de retomada."
+            )
+        else:
+            resumo = (
+                f"Na semana atual, o modelo marcou {total_recomendadas_semana} ações como recomendadas. "
+                f"{'Entre os principais destaques por DY e ROE estão ' + ', '.join(df_destaques['acao'].tolist()) + '. ' if tem_destaques else ''}"
+                f"{f'O erro médio recente das previsões está em {erro_str}, métrica importante para ajustar nível de convicção. ' if tem_erro else ''}"
+                "A estratégia é manter acompanhamento disciplinado da evolução dos indicadores para priorizar entradas com melhor relação risco-retorno."
+            )
+    else:
+        # Remove títulos/headers redundantes gerados pelo LLM e placeholders de data.
+        linhas = [ln.strip() for ln in resumo.splitlines() if ln.strip()]
+        linhas_filtradas = []
+        for ln in linhas:
+            lower = ln.lower()
+            if "resumo diário" in lower or "resumo do dia" in lower:
+                continue
+            ln = re.sub(r"\[data\]|\{data\}|<data>", "", ln, flags=re.IGNORECASE).strip(" -–—:")
+            if ln:
+                linhas_filtradas.append(ln)
+        if linhas_filtradas:
+            resumo = " ".join(linhas_filtradas).strip()
+
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO resumos_diarios_ia (data_ref, resumo)
+            VALUES (CURRENT_DATE, %s)
+            ON CONFLICT (data_ref)
+            DO UPDATE SET resumo = EXCLUDED.resumo, gerado_em = NOW()
+            RETURNING resumo, TO_CHAR(data_ref, 'YYYY-MM-DD') AS data_ref
+            """,
+            (resumo,),
+        )
+        saved = cur.fetchone()
+    return {"resumo": saved[0], "gerado_em": saved[1]}
+
+
+def executar_resumo_diario():
+    conn = None
+    try:
+        conn = get_connection()
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_lock(%s)", (_CHAVE_LOCK,))
+        existente = consultar_resumo_diario_hoje(conn)
+        if existente:
+            return
+        gerar_e_salvar_resumo_diario(conn)
+    finally:
+        if conn is not None:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT pg_advisory_unlock(%s)", (_CHAVE_LOCK,))
+            except Exception:
+                pass
+            conn.close()
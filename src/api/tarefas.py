@@ -0,0 +1,107 @@
+"""
+Tarefas de fundo da API, executadas pelos workers da fila (fila_tarefas).
+
+TAREFAS mapeia o tipo (o mesmo nome de /tarefas/{tipo}) para a função e o
+grupo de concorrência. Os dois treinos escrevem em modelo/ e disputam CPU,
+então dividem o grupo "treino"; coleta, recomendação, resumo e backup têm
+grupos próprios e podem rodar ao mesmo tempo que o treino. As previsões sob
+demanda do dashboard (página Previsões) rodam no grupo "previsao", com até
+FILA_LIMITE_PREVISOES ao mesmo tempo (padrão 1).
+"""
+
+import sys
+from pathlib import Path
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+import json
+import os
+from datetime import date
+
+from src.core.fila_tarefas import Tarefa, reportar_progresso
+
+LIMITE_PREVISOES = int(os.getenv("FILA_LIMITE_PREVISOES", "1"))
+
+
+def executar_coleta():
+    from src.data.scraper_orquestrador import main as scraper_main
+    scraper_main()
+
+
+def executar_classificador():
+    from src.models.classificador import executar_pipeline_classificador
+    executar_pipeline_classificador()
+
+
+def executar_regressor():
+    from src.models.regressor_preco import executar_pipeline_multidia
+    # Treina um modelo por horizonte (1..10 dias úteis) — mais robusto que modelo único.
+    # Sem coleta nova desde o último treino, só prevê com os modelos salvos.
+    executar_pipeline_multidia(max_dias=10, data_calculo=date.today(), save_to_db=True, reusar_modelos=True)
+
+
+def executar_treino():
+    reportar_progresso(0.0, "treinando classificador")
+    executar_classificador()
+    reportar_progresso(0.5, "treinando regressor")
+    executar_regressor()
+
+
+def executar_recomendacao():
+    from src.models.recomendador_acoes import recomendar_varias_acoes
+    recomendar_varias_acoes()
+
+
+def executar_resumo():
+    from src.api.resumo_diario import executar_resumo_diario
+    executar_resumo_diario()
+
+
+def executar_previsao(ticker: str, n_dias: int, data_calculo: str):
+    """Previsão multi-dia de um ticker (sem gravar no banco); devolve o DataFrame em orient="split"."""
+    from src.models.modelos_horizonte import prever_com_modelos_salvos
+    from src.models.regressor_preco import executar_pipeline_multidia
+
+    def _progresso(atual, total):
+        reportar_progresso(atual / total, f"Processando dia {atual} de {total}...")
+
+    # Modelos do treino noturno (qualquer modo), se ainda atualizados
+    final_df = prever_com_modelos_salvos(n_dias, date.fromisoformat(data_calculo), tickers=[ticker])
+    if final_df is None:
+        final_df = executar_pipeline_multidia(
+            max_dias=n_dias,
+            data_calculo=date.fromisoformat(data_calculo),
+            save_to_db=False,  # Só para exibição no dashboard
+            tickers=[ticker],
+            progress_callback=_progresso,
+            # Uma única busca de hiperparâmetros; os demais horizontes só ajustam a floresta
+            modo_treino="hiperparametros_compartilhados",
+            # Modelo mais barato: não vira artefato que o treino noturno reaproveitaria
+            salvar_modelos=False,
+        )
+    if final_df.empty:
+        raise ValueError("Nenhuma previsão foi gerada. Verifique os dados de entrada.")
+    return json.loads(final_df.to_json(orient="split", date_format="iso"))
+
+
+def executar_backup():
+    from scripts.backup import criar_backup, enviar_backup_email
+
+    reportar_progresso(0.0, "gerando dump")
+    dump = criar_backup()
+    reportar_progresso(0.8, "enviando por email")
+    enviar_backup_email(dump)
+
+
+TAREFAS = {
+    "coletar":        Tarefa(executar_coleta, grupo="coleta"),
+    "treinar":        Tarefa(executar_treino, grupo="treino"),
+    "classificador":  Tarefa(executar_classificador, grupo="treino"),
+    "regressor":      Tarefa(executar_regressor, grupo="treino"),
+    "recomendar":     Tarefa(executar_recomendacao, grupo="recomendacao"),
+    "resumo-diario":  Tarefa(executar_resumo, grupo="resumo"),
+    "backup-banco":   Tarefa(executar_backup, grupo="backup"),
+    "previsao":       Tarefa(executar_previsao, grupo="previsao", limite=LIMITE_PREVISOES),
+}
@@ -1,11 +1,17 @@
 import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
 import os
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
 from dotenv import load_dotenv
 
 load_dotenv(Path(__file__).resolve().parent.parent.parent / ".env")
 
-def get_connection():
+
+def _conectar():
     conn = psycopg2.connect(
         host=os.getenv("DB_HOST", "localhost"),
         database=os.getenv("DB_NAME", "stocks"),
@@ -15,3 +21,279 @@ def get_connection():
     )
     conn.autocommit = True  # garante leitura dos dados mais recentes (sem transação implícita)
     return conn
+
+
+# ── Pool de conexões ──────────────────────────────────────────────────────────
+# Um pool por processo. Dashboard, API, scrapers e workers pegam conexões já
+# abertas em vez de pagar TCP + autenticação no banco remoto a cada chamada.
+#
+# Configuração (.env):
+#   DB_POOL_MIN            conexões mantidas abertas (padrão 1)
+#   DB_POOL_MAX            máximo de conexões simultâneas (padrão 10)
+#   DB_POOL_IDLE_SECONDS   conexão ociosa há mais tempo que isso é reciclada (padrão 300)
+#   DB_POOL_TIMEOUT        segundos esperando uma conexão livre antes de erro (padrão 30)
+
+
+class PoolConexoes:
+    """
+    Pool thread-safe com:
+      - health check no checkout (descarta conexões fechadas ou quebradas);
+      - reciclagem de conexões ociosas há mais de `max_ociosidade` segundos;
+      - reset na devolução (rollback de transação pendente, autocommit religado);
+      - espera bloqueante (com timeout) quando todas as conexões estão em uso;
+      - estatísticas de uso para monitoramento.
+    """
+
+    def __init__(self, minimo: int, maximo: int, max_ociosidade: float, timeout: float):
+        self.minimo = max(0, minimo)
+        self.maximo = max(1, maximo, self.minimo)
+        self.max_ociosidade = max_ociosidade
+        self.timeout = timeout
+        self.pid = os.getpid()
+        self._cond = threading.Condition()
+        self._livres: list = []          # [(conn, instante_devolucao)]
+        self._em_uso = 0
+        self._stats = {
+            "checkouts": 0,
+            "esperas": 0,
+            "tempo_espera_total": 0.0,
+            "conexoes_criadas": 0,
+            "conexoes_descartadas": 0,
+        }
+
+    # ── checkout / checkin ───────────────────────────────────────────────────
+
+    def obter(self):
+        inicio = time.monotonic()
+        esperou = False
+        with self._cond:
+            while not self._livres and self._em_uso >= self.maximo:
+                esperou = True
+                restante = self.timeout - (time.monotonic() - inicio)
+                if restante <= 0:
+                    raise psycopg2.pool.PoolError(
+                        f"Nenhuma conexão livre após {self.timeout:.0f}s (máximo={self.maximo})"
+                    )
+                self._cond.wait(restante)
+            candidato = self._livres.pop() if self._livres else None
+            self._em_uso += 1
+            self._stats["checkouts"] += 1
+            if esperou:
+                self._stats["esperas"] += 1
+                self._stats["tempo_espera_total"] += time.monotonic() - inicio
+
+        try:
+            conn = self._validar(candidato) if candidato is not None else None
+            if conn is None:
+                conn = _conectar()
+                with self._cond:
+                    self._stats["conexoes_criadas"] += 1
+            return conn
+        except Exception:
+            with self._cond:
+                self._em_uso -= 1
+                self._cond.notify()
+            raise
+
+    def devolver(self, conn) -> None:
+        reutilizavel = not conn.closed and os.getpid() == self.pid and self._resetar(conn)
+        with self._cond:
+            self._em_uso -= 1
+            if reutilizavel:
+                self._livres.append((conn, time.monotonic()))
+            else:
+                self._stats["conexoes_descartadas"] += 1
+            ociosas = self._remover_ociosas()
+            self._cond.notify()
+        if not reutilizavel and os.getpid() == self.pid:
+            self._fechar_silenciosamente(conn)
+        for antiga in ociosas:
+            self._fechar_silenciosamente(antiga)
+
+    @staticmethod
+    def _resetar(conn) -> bool:
+        """
+        Desfaz o estado deixado por quem usou a conexão — transação aberta ou
+        abortada (inclusive BEGIN manual em autocommit) e autocommit desligado —
+        antes de devolvê-la ao pool. False se a conexão deve ser descartada.
+        """
+        try:
+            if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                if conn.autocommit:
+                    # rollback() não faz nada em autocommit; o BEGIN manual precisa de ROLLBACK
+                    with conn.cursor() as cur:
+                        cur.execute("ROLLBACK")
+                else:
+                    conn.rollback()
+            if not conn.autocommit:
+                conn.autocommit = True
+            return True
+        except Exception:
+            return False
+
+    def _remover_ociosas(self) -> list:
+        """Tira do pool as ociosas antigas, preservando `minimo` conexões abertas (chamar com _cond)."""
+        limite = time.monotonic() - self.max_ociosidade
+        removidas = []
+        # _livres funciona como pilha: as mais antigas ficam no início
+        while len(self._livres) > self.minimo and self._livres[0][1] < limite:
+            removidas.append(self._livres.pop(0)[0])
+        self._stats["conexoes_descartadas"] += len(removidas)
+        return removidas
+
+    def _validar(self, candidato):
+        """Health check: recicla ociosas antigas e testa a conexão com SELECT 1."""
+        conn, devolvida_em = candidato
+        ociosa_ha = time.monotonic() - devolvida_em
+        if not conn.closed and ociosa_ha <= self.max_ociosidade:
+            try:
+                if conn.status != psycopg2.extensions.STATUS_READY:
+                    conn.rollback()
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                return conn
+            except Exception:
+                pass
+        self._fechar_silenciosamente(conn)
+        with self._cond:
+            self._stats["conexoes_descartadas"] += 1
+        return None
+
+    @staticmethod
+    def _fechar_silenciosamente(conn) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def fechar_todas(self) -> None:
+        with self._cond:
+            livres, self._livres = self._livres, []
+        for conn, _ in livres:
+            self._fechar_silenciosamente(conn)
+
+    def estatisticas(self) -> dict:
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                "em_uso": self._em_uso,
+                "livres": len(self._livres),
+                "minimo": self.minimo,
+                "maximo": self.maximo,
+            })
+        stats["tempo_espera_medio"] = (
+            stats["tempo_espera_total"] / stats["esperas"] if stats["esperas"] else 0.0
+        )
+        return stats
+
+
+_pool: PoolConexoes | None = None
+_pool_lock = threading.Lock()
+# Conexões herdadas via fork: mantidas referenciadas para que o GC do processo
+# filho nunca as feche (o close() enviaria Terminate no socket do processo pai).
+_conexoes_herdadas: list = []
+
+
+def _criar_pool() -> PoolConexoes:
+    return PoolConexoes(
+        minimo=int(os.getenv("DB_POOL_MIN", "1")),
+        maximo=int(os.getenv("DB_POOL_MAX", "10")),
+        max_ociosidade=float(os.getenv("DB_POOL_IDLE_SECONDS", "300")),
+        timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+    )
+
+
+def _obter_pool() -> PoolConexoes:
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.pid != os.getpid():
+            _pool = _criar_pool()
+        return _pool
+
+
+def _apos_fork_no_filho() -> None:
+    """Descarta (sem fechar) o pool herdado do pai — ex: ProcessPoolExecutor."""
+    global _pool, _pool_lock
+    if _pool is not None:
+        _conexoes_herdadas.extend(conn for conn, _ in _pool._livres)
+    _pool = None
+    _pool_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_apos_fork_no_filho)
+
+
+@contextmanager
+def conexao():
+    """
+    Context manager que empresta uma conexão do pool e a devolve ao sair:
+
+        with conexao() as conn:
+            df = pd.read_sql(query, conn)
+    """
+    pool = _obter_pool()
+    conn = pool.obter()
+    try:
+        yield conn
+    finally:
+        pool.devolver(conn)
+
+
+def estatisticas_pool() -> dict:
+    """Checkouts, esperas, tempo de espera e ocupação do pool deste processo."""
+    return _obter_pool().estatisticas()
+
+
+class _ConexaoEmprestada:
+    """
+    Proxy devolvido por get_connection(): delega tudo à conexão psycopg2, mas
+    close() devolve a conexão ao pool em vez de encerrá-la.
+    """
+
+    def __init__(self, pool: PoolConexoes, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def close(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool.devolver(conn)
+
+    @property
+    def closed(self):
+        return 1 if self._conn is None else self._conn.closed
+
+    def __getattr__(self, nome):
+        if self._conn is None:
+            raise psycopg2.InterfaceError("conexão já devolvida ao pool")
+        return getattr(self._conn, nome)
+
+    def __setattr__(self, nome, valor):
+        if nome in ("_pool", "_conn"):
+            object.__setattr__(self, nome, valor)
+        else:
+            setattr(self._conn, nome, valor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def __del__(self):
+        # Chamadores antigos que nunca chamam close() não vazam vagas do pool
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+def get_connection():
+    """
+    Compatível com o uso antigo (conn = get_connection(); ...; conn.close()),
+    mas a conexão vem do pool e close() apenas a devolve.
+    """
+    pool = _obter_pool()
+    return _ConexaoEmprestada(pool, pool.obter())
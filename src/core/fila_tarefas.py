@@ -0,0 +1,359 @@
+"""
+Fila de tarefas persistente no PostgreSQL (tabela fila_tarefas).
+
+A API só enfileira (enfileirar) e consulta (obter/listar_ativas); quem
+executa são processos worker (scripts/worker_tarefas.py), que buscam a
+próxima tarefa pendente com SELECT ... FOR UPDATE SKIP LOCKED. Assim:
+
+  - cada tarefa tem id, status (pendente → executando → concluida/falhou),
+    progresso, mensagem, erro e tempos (criado_em, iniciado_em,
+    concluido_em), e nada se perde num restart da API;
+  - tarefas de grupos diferentes rodam ao mesmo tempo (coleta e recomendação
+    enquanto o RandomForest treina), cada grupo com o seu limite de
+    concorrência;
+  - o treino (CPU) roda fora do processo do uvicorn.
+
+Enfileirar com `chave_dedupe` recusa (devolve None) uma segunda tarefa com a
+mesma chave enquanto a primeira estiver pendente ou executando. O retorno da
+função da tarefa (se houver) é gravado em `resultado` (JSONB); solicitar()
+reaproveita o resultado da última tarefa concluída com a mesma chave, ou a
+tarefa ativa, antes de enfileirar uma nova.
+
+O worker renova heartbeat_em da tarefa em execução; tarefas "executando" sem
+heartbeat há TIMEOUT_HEARTBEAT segundos (worker morto) voltam para a fila,
+até MAX_TENTATIVAS tentativas.
+
+Configuração (.env):
+    FILA_INTERVALO_POLLING    segundos entre buscas quando a fila está vazia (padrão 5)
+    FILA_TIMEOUT_HEARTBEAT    segundos sem heartbeat até a tarefa ser considerada órfã (padrão 300)
+    FILA_MAX_TENTATIVAS       tentativas por tarefa (padrão 2)
+"""
+
+import sys
+from pathlib import Path
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+import zlib
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+
+from psycopg2.extras import Json
+
+from src.core.db_connection import conexao
+
+TABELA = "fila_tarefas"
+INTERVALO_POLLING = float(os.getenv("FILA_INTERVALO_POLLING", "5"))
+TIMEOUT_HEARTBEAT = float(os.getenv("FILA_TIMEOUT_HEARTBEAT", "300"))
+MAX_TENTATIVAS = int(os.getenv("FILA_MAX_TENTATIVAS", "2"))
+INTERVALO_HEARTBEAT = 30.0
+
+PENDENTE = "pendente"
+EXECUTANDO = "executando"
+CONCLUIDA = "concluida"
+FALHOU = "falhou"
+ATIVOS = (PENDENTE, EXECUTANDO)
+
+COLUNAS = [
+    "id", "tipo", "parametros", "status", "progresso", "mensagem", "erro", "resultado",
+    "tentativas", "worker", "criado_em", "iniciado_em", "concluido_em", "heartbeat_em",
+]
+
+
+@dataclass(frozen=True)
+class Tarefa:
+    """
+    Tipo de tarefa: função executada (recebe os parâmetros como kwargs; o
+    retorno, serializável em JSON, vira `resultado`) e grupo de concorrência —
+    no máximo `limite` tarefas do grupo ao mesmo tempo.
+    """
+    funcao: Callable[..., None]
+    grupo: str
+    limite: int = 1
+
+
+# ── Enfileiramento e consulta (API) ─────────────────────────────────────────
+
+def enfileirar(tipo: str, parametros: Optional[Dict] = None, chave_dedupe: Optional[str] = None) -> Optional[int]:
+    """Id da nova tarefa, ou None se já existe uma ativa com a mesma `chave_dedupe`."""
+    with conexao() as conn, conn.cursor() as cur:
+        cur.execute(
+            f"""
+            INSERT INTO {TABELA} (tipo, parametros, chave_dedupe)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (chave_dedupe) WHERE status IN ('pendente', 'executando') DO NOTHING
+            RETURNING id
+            """,
+            (tipo, Json(parametros or {}), chave_dedupe),
+        )
+        linha = cur.fetchone()
+    return linha[0] if linha else None
+
+
+def solicitar(tipo: str, parametros: Optional[Dict], chave_dedupe: str) -> Dict:
+    """
+    Tarefa que atende `chave_dedupe`, sem repetir trabalho: a última concluída
+    com resultado (cache), a pendente/em execução com a mesma chave, ou uma
+    nova. Só faz sentido para tarefas cujo resultado depende apenas da chave.
+    """
+    for _ in range(3):
+        with conexao() as conn, conn.cursor() as cur:
+            cur.execute(
+                f"""
+                SELECT {', '.join(COLUNAS)} FROM {TABELA}
+                WHERE chave_dedupe = %s
+                  AND (status IN %s OR (status = %s AND resultado IS NOT NULL))
+                ORDER BY (status = %s) DESC, criado_em DESC
+                LIMIT 1
+                """,
+                (chave_dedupe, ATIVOS, CONCLUIDA, CONCLUIDA),
+            )
+            linha = cur.fetchone()
+        if linha:
+            return _como_dict(linha)
+        # Corrida com outro pedido (ou com a conclusão da tarefa ativa): consulta de novo
+        tarefa_id = enfileirar(tipo, parametros, chave_dedupe)
+        if tarefa_id is not None:
+            return obter(tarefa_id)
+    raise RuntimeError(f"Não foi possível enfileirar a tarefa {tipo} ({chave_dedupe}).")
+
+
+def _como_dict(linha) -> Dict:
+    tarefa = dict(zip(COLUNAS, linha))
+    inicio, fim = tarefa["iniciado_em"], tarefa["concluido_em"]
+    tarefa["espera_s"] = round(((inicio or datetime.now()) - tarefa["criado_em"]).total_seconds(), 1)
+    tarefa["duracao_s"] = round(((fim or datetime.now()) - inicio).total_seconds(), 1) if inicio else None
+    for col in ("criado_em", "iniciado_em", "concluido_em", "heartbeat_em"):
+        tarefa[col] = tarefa[col].isoformat() if tarefa[col] else None
+    return tarefa
+
+
+def obter(tarefa_id: int) -> Optional[Dict]:
+    with conexao() as conn, conn.cursor() as cur:
+        cur.execute(f"SELECT {', '.join(COLUNAS)} FROM {TABELA} WHERE id = %s", (tarefa_id,))
+        linha = cur.fetchone()
+    return _como_dict(linha) if linha else None
+
+
+def listar_ativas() -> List[Dict]:
+    """Tarefas pendentes e em execução, da mais antiga para a mais nova."""
+    with conexao() as conn, conn.cursor() as cur:
+        cur.execute(
+            f"SELECT {', '.join(COLUNAS)} FROM {TABELA} WHERE status IN %s ORDER BY criado_em, id",
+            (ATIVOS,),
+        )
+        return [_como_dict(linha) for linha in cur.fetchall()]
+
+
+# ── Progresso (chamado de dentro das tarefas) ───────────────────────────────
+
+_local = threading.local()
+
+
+def reportar_progresso(fracao: float, mensagem: Optional[str] = None) -> None:
+    """Progresso (0..1) da tarefa em execução nesta thread; fora de um worker não faz nada."""
+    tarefa_id = getattr(_local, "tarefa_id", None)
+    if tarefa_id is None:
+        return
+    try:
+        with conexao() as conn, conn.cursor() as cur:
+            cur.execute(
+                f"UPDATE {TABELA} SET progresso = %s, mensagem = COALESCE(%s, mensagem), "
+                f"heartbeat_em = NOW() WHERE id = %s",
+                (max(0.0, min(1.0, fracao)), mensagem, tarefa_id),
+            )
+    except Exception as e:
+        print(f"⚠️ Não foi possível registrar o progresso da tarefa {tarefa_id}: {e}")
+
+
+# ── Worker ───────────────────────────────────────────────────────────────────
+
+def _chave_grupo(grupo: str) -> int:
+    """Chave do advisory lock que serializa as reservas de um grupo."""
+    return zlib.crc32(f"{TABELA}:{grupo}".encode("utf-8"))
+
+
+def reservar(tarefas: Dict[str, Tarefa], worker: str, tipos: Optional[Iterable[str]] = None) -> Optional[Dict]:
+    """
+    Reserva, grupo a grupo, a tarefa pendente mais antiga dos `tipos`
+    (padrão: todos de `tarefas`) cujo grupo ainda está abaixo do limite. A contagem (de todos os
+    tipos do grupo) e a reserva acontecem sob um advisory lock do grupo — dois
+    workers não estouram o limite — e com SKIP LOCKED, sem disputar a mesma
+    linha.
+    """
+    permitidos = set(tipos) if tipos else set(tarefas)
+    grupos: Dict[str, List[str]] = {}
+    for tipo, tarefa in tarefas.items():
+        grupos.setdefault(tarefa.grupo, []).append(tipo)
+
+    with conexao() as conn, conn.cursor() as cur:
+        for grupo, do_grupo in grupos.items():
+            reservaveis = [t for t in do_grupo if t in permitidos]
+            if not reservaveis:
+                continue
+            limite = max(tarefas[t].limite for t in do_grupo)
+            cur.execute("BEGIN")
+            try:
+                cur.execute("SELECT pg_advisory_xact_lock(%s)", (_chave_grupo(grupo),))
+                cur.execute(
+                    f"SELECT COUNT(*) FROM {TABELA} WHERE status = %s AND tipo = ANY(%s)",
+                    (EXECUTANDO, do_grupo),
+                )
+                linha = None
+                if cur.fetchone()[0] < limite:
+                    cur.execute(
+                        f"""
+                        UPDATE {TABELA}
+                        SET status = %s, worker = %s, tentativas = tentativas + 1,
+                            iniciado_em = NOW(), heartbeat_em = NOW(), erro = NULL
+                        WHERE id = (
+                            SELECT id FROM {TABELA}
+                            WHERE status = %s AND tipo = ANY(%s)
+                            ORDER BY criado_em, id
+                            FOR UPDATE SKIP LOCKED
+                            LIMIT 1
+                        )
+                        RETURNING id, tipo, parametros
+                        """,
+                        (EXECUTANDO, worker, PENDENTE, reservaveis),
+                    )
+                    linha = cur.fetchone()
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+            if linha:
+                return {"id": linha[0], "tipo": linha[1], "parametros": linha[2] or {}}
+    return None
+
+
+def _finalizar(tarefa_id: int, status: str, erro: Optional[str] = None, resultado=None) -> None:
+    with conexao() as conn, conn.cursor() as cur:
+        cur.execute(
+            f"""
+            UPDATE {TABELA}
+            SET status = %s, erro = %s, resultado = %s, concluido_em = NOW(),
+                progresso = COALESCE(%s, progresso)
+            WHERE id = %s
+            """,
+            (status, erro, None if resultado is None else Json(resultado),
+             1.0 if status == CONCLUIDA else None, tarefa_id),
+        )
+
+
+def recuperar_orfas(timeout: float = TIMEOUT_HEARTBEAT, max_tentativas: int = MAX_TENTATIVAS) -> int:
+    """Devolve à fila (ou marca como falha) tarefas em execução sem heartbeat recente."""
+    with conexao() as conn, conn.cursor() as cur:
+        cur.execute(
+            f"""
+            UPDATE {TABELA}
+            SET status = CASE WHEN tentativas < %s THEN 'pendente' ELSE 'falhou' END,
+                erro = 'worker interrompido (sem heartbeat)',
+                concluido_em = CASE WHEN tentativas < %s THEN NULL ELSE NOW() END
+            WHERE status = 'executando' AND heartbeat_em < NOW() - make_interval(secs => %s)
+            """,
+            (max_tentativas, max_tentativas, timeout),
+        )
+        return cur.rowcount
+
+
+def _heartbeat(tarefa_id: int, parar: threading.Event) -> None:
+    while not parar.wait(INTERVALO_HEARTBEAT):
+        try:
+            with conexao() as conn, conn.cursor() as cur:
+                cur.execute(f"UPDATE {TABELA} SET heartbeat_em = NOW() WHERE id = %s", (tarefa_id,))
+        except Exception as e:
+            print(f"⚠️ Heartbeat da tarefa {tarefa_id} falhou: {e}")
+
+
+def _finalizar_com_retentativas(tarefa_id: int, status: str, erro: Optional[str] = None,
+                                resultado=None, tentativas: int = 3) -> bool:
+    """
+    _finalizar resistente a falhas transitórias do banco. Se nada der certo, a
+    tarefa fica "executando" e volta para a fila por recuperar_orfas.
+    """
+    for tentativa in range(tentativas):
+        try:
+            _finalizar(tarefa_id, status, erro, resultado)
+            return True
+        except Exception as e:
+            print(f"⚠️ Não foi possível gravar o fim da tarefa {tarefa_id} "
+                  f"(tentativa {tentativa + 1}/{tentativas}): {e}")
+            time.sleep(2 ** tentativa)
+    return False
+
+
+def executar(tarefas: Dict[str, Tarefa], reservada: Dict, worker: str) -> bool:
+    """Executa uma tarefa reservada e grava o resultado. True se concluiu."""
+    tarefa_id, tipo = reservada["id"], reservada["tipo"]
+    print(f"▶️ [{worker}] tarefa {tarefa_id} ({tipo}) iniciada.")
+    parar = threading.Event()
+    batimento = threading.Thread(target=_heartbeat, args=(tarefa_id, parar), daemon=True)
+    batimento.start()
+    _local.tarefa_id = tarefa_id
+    t0 = time.perf_counter()
+    try:
+        resultado = tarefas[tipo].funcao(**reservada["parametros"])
+    except Exception as e:
+        print(f"❌ [{worker}] tarefa {tarefa_id} ({tipo}) falhou: {e}")
+        _finalizar_com_retentativas(
+            tarefa_id, FALHOU, "".join(traceback.format_exception_only(type(e), e)).strip()
+        )
+        return False
+    finally:
+        _local.tarefa_id = None
+        parar.set()
+        batimento.join()
+    try:
+        json.dumps(resultado)
+    except (TypeError, ValueError) as e:
+        print(f"❌ [{worker}] tarefa {tarefa_id} ({tipo}) devolveu resultado não serializável: {e}")
+        _finalizar_com_retentativas(tarefa_id, FALHOU, f"resultado não serializável em JSON: {e}")
+        return False
+    if not _finalizar_com_retentativas(tarefa_id, CONCLUIDA, resultado=resultado):
+        return False
+    print(f"✅ [{worker}] tarefa {tarefa_id} ({tipo}) concluída em {time.perf_counter() - t0:.1f}s.")
+    return True
+
+
+def executar_worker(tarefas: Dict[str, Tarefa], tipos: Optional[Iterable[str]] = None,
+                    intervalo: float = INTERVALO_POLLING, parar: Optional[threading.Event] = None) -> None:
+    """Laço do worker: reserva e executa tarefas dos `tipos` (padrão: todos) até `parar`."""
+    tipos = sorted(tipos or tarefas)
+    desconhecidos = set(tipos) - set(tarefas)
+    if desconhecidos:
+        raise ValueError(f"Tipos de tarefa desconhecidos: {', '.join(sorted(desconhecidos))}")
+    parar = parar or threading.Event()
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    print(f"⏱ Worker {worker} aguardando tarefas: {', '.join(tipos)}")
+
+    ultima_recuperacao = 0.0
+    while not parar.is_set():
+        try:
+            if time.monotonic() - ultima_recuperacao > INTERVALO_HEARTBEAT:
+                recuperadas = recuperar_orfas()
+                if recuperadas:
+                    print(f"⚠️ {recuperadas} tarefa(s) órfã(s) devolvida(s) à fila.")
+                ultima_recuperacao = time.monotonic()
+            reservada = reservar(tarefas, worker, tipos)
+        except Exception as e:
+            print(f"❌ [{worker}] Erro ao consultar a fila: {e}")
+            reservada = None
+        if reservada is None:
+            parar.wait(intervalo)
+            continue
+        try:
+            executar(tarefas, reservada, worker)
+        except Exception as e:
+            # O worker nunca morre por uma tarefa; se o fim não foi gravado,
+            # recuperar_orfas devolve a tarefa à fila.
+            print(f"❌ [{worker}] Erro inesperado na tarefa {reservada['id']}: {e}")
@@ -0,0 +1,255 @@
+"""
+Gravação em lote no PostgreSQL.
+
+Em vez de abrir uma conexão e executar um INSERT ... ON CONFLICT por linha,
+o GravadorLote acumula as linhas em memória e grava tudo com
+psycopg2.extras.execute_values — um único INSERT multi-VALUES por página.
+Uma noite inteira de indicadores_fundamentalistas (~150 tickers) vira um ou
+poucos round-trips ao banco.
+
+Uso:
+    with gravador_indicadores() as gravador:
+        for dados in ...:
+            gravador.adicionar(dados)
+    # flush automático ao sair do bloco
+
+Se o INSERT do lote falhar por causa de uma linha (valor inválido, violação de
+constraint), o lote é regravado linha a linha: as linhas boas são gravadas e
+só as ruins ficam de fora. Se a falha for de conexão, as linhas voltam para o
+buffer. Em ambos os casos flush()/fechar() (e a saída do bloco with) levantam
+ErroGravacaoLote com as linhas não gravadas — os flushes automáticos de
+adicionar() só avisam e deixam o erro para o próximo flush explícito.
+"""
+
+import math
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import psycopg2
+import psycopg2.pool
+from psycopg2.extras import execute_values
+
+from src.core.db_connection import get_connection
+
+
+def _sanitizar(valor):
+    """float('inf'/'nan') → None (colunas numeric do PostgreSQL não aceitam)."""
+    if isinstance(valor, float) and not math.isfinite(valor):
+        return None
+    return valor
+
+
+# Falhas de conexão (não do conteúdo das linhas): as linhas voltam para o buffer
+_ERROS_CONEXAO = (psycopg2.OperationalError, psycopg2.InterfaceError, psycopg2.pool.PoolError)
+
+
+class ErroGravacaoLote(Exception):
+    """Linhas que não puderam ser gravadas (mesmo na nova tentativa linha a linha)."""
+
+    def __init__(self, tabela: str, linhas: List[Dict], erro: str):
+        self.tabela = tabela
+        self.linhas = linhas
+        self.erro = erro
+        super().__init__(f"{len(linhas)} linha(s) não gravada(s) em {tabela}: {erro}")
+
+
+class GravadorLote:
+    """
+    Buffer thread-safe de linhas para upsert em lote.
+
+    Args:
+        tabela: nome da tabela de destino.
+        chave: colunas do ON CONFLICT (ex: ("acao", "data_coleta")).
+        colunas: colunas gravadas. Se None, usa a união das chaves das linhas
+            (na ordem em que aparecem); colunas ausentes numa linha viram NULL.
+        tamanho_lote: número de linhas que dispara um flush automático.
+        intervalo_flush: segundos desde o último flush que disparam um flush
+            automático na próxima chamada a adicionar().
+        atualizar: colunas atualizadas no conflito. Se None, todas as que não
+            fazem parte da chave. Lista vazia → ON CONFLICT DO NOTHING.
+    """
+
+    def __init__(
+        self,
+        tabela: str,
+        chave: Sequence[str],
+        colunas: Optional[Sequence[str]] = None,
+        tamanho_lote: int = 500,
+        intervalo_flush: float = 30.0,
+        atualizar: Optional[Sequence[str]] = None,
+    ):
+        self.tabela = tabela
+        self.chave = tuple(chave)
+        self.colunas = list(colunas) if colunas else None
+        self.tamanho_lote = max(1, tamanho_lote)
+        self.intervalo_flush = intervalo_flush
+        self.atualizar = list(atualizar) if atualizar is not None else None
+        self._buffer: Dict[tuple, Dict] = {}
+        self._lock = threading.Lock()
+        self._ultimo_flush = time.monotonic()
+        self.linhas_gravadas = 0
+        self.round_trips = 0
+        self._falhas: List[Dict] = []           # linhas recusadas pelo banco, ainda não reportadas
+        self._erro_falhas: Optional[str] = None
+        self._erro_conexao: Optional[str] = None  # linhas devolvidas ao buffer
+
+    # ── API pública ──────────────────────────────────────────────────────────
+
+    def adicionar(self, linha: Dict) -> None:
+        """
+        Enfileira uma linha. Linhas com a mesma chave substituem a anterior
+        (um INSERT multi-VALUES não pode atualizar a mesma linha duas vezes).
+        """
+        linha = {k: _sanitizar(v) for k, v in linha.items()}
+        chave = tuple(linha.get(c) for c in self.chave)
+        with self._lock:
+            self._buffer[chave] = linha
+            deve_gravar = (
+                len(self._buffer) >= self.tamanho_lote
+                or time.monotonic() - self._ultimo_flush >= self.intervalo_flush
+            )
+        if deve_gravar:
+            self._descarregar()  # falhas ficam para o próximo flush()
+
+    def adicionar_varias(self, linhas: Iterable[Dict]) -> None:
+        for linha in linhas:
+            self.adicionar(linha)
+
+    def flush(self) -> int:
+        """
+        Grava o buffer atual. Retorna o número de linhas gravadas; levanta
+        ErroGravacaoLote se alguma linha (deste ou de flushes automáticos
+        anteriores) não foi gravada.
+        """
+        gravadas = self._descarregar()
+        with self._lock:
+            falhas, self._falhas = self._falhas, []
+            pendentes = list(self._buffer.values()) if self._erro_conexao else []
+            erro = "; ".join(e for e in (self._erro_falhas, self._erro_conexao) if e)
+            self._erro_falhas = self._erro_conexao = None
+        if falhas or pendentes:
+            raise ErroGravacaoLote(self.tabela, falhas + pendentes, erro)
+        return gravadas
+
+    def fechar(self) -> None:
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.fechar()
+            return False
+        # Já há uma exceção saindo do bloco: grava o que der sem mascará-la
+        try:
+            self.fechar()
+        except ErroGravacaoLote as e:
+            print(f"❌ {e}")
+        return False
+
+    # ── Helpers ──────────────────────────────────────────────────────────────
+
+    def _descarregar(self) -> int:
+        with self._lock:
+            linhas = list(self._buffer.values())
+            self._buffer.clear()
+            self._ultimo_flush = time.monotonic()
+        return self._gravar(linhas) if linhas else 0
+
+    def _gravar(self, linhas: List[Dict]) -> int:
+        colunas = self.colunas or self._uniao_colunas(linhas)
+        sql = self._montar_sql(colunas)
+        valores = [tuple(l.get(c) for c in colunas) for l in linhas]
+
+        conn = None
+        try:
+            conn = get_connection()
+            with conn.cursor() as cur:
+                execute_values(cur, sql, valores, page_size=len(valores))
+            conn.commit()
+            self.linhas_gravadas += len(valores)
+            self.round_trips += 1
+            print(f"✅ {len(valores)} linha(s) gravadas em {self.tabela} (lote).")
+            return len(valores)
+        except _ERROS_CONEXAO as e:
+            print(f"❌ Erro de conexão ao gravar lote em {self.tabela} ({len(valores)} linhas): {e}")
+            self._rebufferizar(linhas, str(e))
+            return 0
+        except Exception as e:
+            if conn is None:  # nem conseguiu a conexão
+                self._rebufferizar(linhas, str(e))
+                return 0
+            print(f"⚠️ Lote em {self.tabela} recusado ({e}); regravando linha a linha.")
+            conn.rollback()
+            return self._gravar_linha_a_linha(conn, sql, linhas, valores)
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def _gravar_linha_a_linha(self, conn, sql: str, linhas: List[Dict], valores: List[tuple]) -> int:
+        """Upsert individual de cada linha; as recusadas vão para self._falhas."""
+        gravadas, falhas, erro = 0, [], None
+        for i, (linha, valor) in enumerate(zip(linhas, valores)):
+            try:
+                with conn.cursor() as cur:
+                    execute_values(cur, sql, [valor])
+                conn.commit()
+                gravadas += 1
+            except _ERROS_CONEXAO as e:
+                self._rebufferizar(linhas[i:], str(e))
+                break
+            except Exception as e:
+                conn.rollback()
+                falhas.append(linha)
+                erro = str(e).strip()
+            self.round_trips += 1
+        self.linhas_gravadas += gravadas
+        if falhas:
+            print(f"❌ {len(falhas)} linha(s) recusadas em {self.tabela}: {erro}")
+            with self._lock:
+                self._falhas.extend(falhas)
+                self._erro_falhas = self._erro_falhas or erro
+        if gravadas:
+            print(f"✅ {gravadas} linha(s) gravadas em {self.tabela} (linha a linha).")
+        return gravadas
+
+    def _rebufferizar(self, linhas: List[Dict], erro: str) -> None:
+        """Devolve as linhas ao buffer sem sobrescrever versões mais novas da mesma chave."""
+        with self._lock:
+            for linha in linhas:
+                self._buffer.setdefault(tuple(linha.get(c) for c in self.chave), linha)
+            self._erro_conexao = erro
+
+    @staticmethod
+    def _uniao_colunas(linhas: List[Dict]) -> List[str]:
+        colunas: Dict[str, None] = {}
+        for linha in linhas:
+            for col in linha:
+                colunas.setdefault(col, None)
+        return list(colunas)
+
+    def _montar_sql(self, colunas: List[str]) -> str:
+        atualizar = self.atualizar
+        if atualizar is None:
+            atualizar = [c for c in colunas if c not in self.chave]
+        if atualizar:
+            conflito = "DO UPDATE SET " + ", ".join(f"{c} = EXCLUDED.{c}" for c in atualizar)
+        else:
+            conflito = "DO NOTHING"
+        return (
+            f"INSERT INTO {self.tabela} ({', '.join(colunas)}) VALUES %s "
+            f"ON CONFLICT ({', '.join(self.chave)}) {conflito}"
+        )
+
+
+def gravador_indicadores(tamanho_lote: int = 500, intervalo_flush: float = 60.0) -> GravadorLote:
+    """GravadorLote configurado para indicadores_fundamentalistas."""
+    return GravadorLote(
+        "indicadores_fundamentalistas",
+        chave=("acao", "data_coleta"),
+        tamanho_lote=tamanho_lote,
+        intervalo_flush=intervalo_flush,
+    )
+
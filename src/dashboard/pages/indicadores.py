@@ -10,7 +10,7 @@ import numpy as np
 from dash import dash_table
 from dash.dash_table.Format import Format, Scheme, Sign
 
-from src.core.db_connection import get_connection
+from src.core.db_connection import conexao
 
 # Margem de erro (em %) abaixo da qual a previsão é considerada "Precisa".
 # Alterar este valor atualiza automaticamente o gráfico de pizza, a tabela e os filtros.
@@ -363,53 +363,52 @@ def register_callbacks_indicadores(app):
     )
     def plotar_top_10(metrico):
         try:
-            conn = get_connection()
-            if metrico == "graham":
-                query = """
-                    SELECT acao, lpa, vpa, cotacao, pl, roe
-                    FROM indicadores_fundamentalistas
-                    WHERE data_coleta = (
-                        SELECT MAX(data_coleta) FROM indicadores_fundamentalistas
-                    )
-                      AND lpa > 0 AND vpa > 0 AND cotacao > 0
-                      AND pl >= 0 AND roe >= 0
-                """
-                df = pd.read_sql(query, conn)
-                df[["lpa", "vpa", "cotacao"]] = df[["lpa", "vpa", "cotacao"]].apply(pd.to_numeric, errors='coerce')
-                df = df.dropna(subset=['lpa', 'vpa', 'cotacao'])
-                df['valor_graham'] = np.sqrt(22.5 * df['lpa'] * df['vpa'])
-                df['metrica'] = df['valor_graham'] - df['cotacao']
-                df = df[df['metrica'] > 0].sort_values('metrica', ascending=False).head(10)
-                y_label = 'Desconto vs. Valor Graham'
-            else:
-                query = f"""
-                    SELECT acao, {metrico} AS metrica
-                    FROM indicadores_fundamentalistas
-                    WHERE data_coleta = (
-                        SELECT MAX(data_coleta) FROM indicadores_fundamentalistas
-                    ) AND {metrico} IS NOT NULL
-                """
-                if metrico == 'dividend_yield':
-                    query = query.replace('WHERE', 'WHERE pl >= 0 AND roe >= 0 AND')
-                if metrico == 'roe':
-                    query = query.replace('WHERE', 'WHERE pl >= 0 AND lpa > 0 AND')
-                df = pd.read_sql(query, conn)
-                df['metrica'] = pd.to_numeric(df['metrica'], errors='coerce')
-                df = df.dropna(subset=['metrica'])
-                if metrico == 'div_liq_patrimonio':
-                    tmp = df.sort_values('metrica').head(10)
-                    df = tmp.sort_values('metrica', ascending=False)
+            with conexao() as conn:
+                if metrico == "graham":
+                    query = """
+                        SELECT acao, lpa, vpa, cotacao, pl, roe
+                        FROM indicadores_fundamentalistas
+                        WHERE data_coleta = (
+                            SELECT MAX(data_coleta) FROM indicadores_fundamentalistas
+                        )
+                          AND lpa > 0 AND vpa > 0 AND cotacao > 0
+                          AND pl >= 0 AND roe >= 0
+                    """
+                    df = pd.read_sql(query, conn)
+                    df[["lpa", "vpa", "cotacao"]] = df[["lpa", "vpa", "cotacao"]].apply(pd.to_numeric, errors='coerce')
+                    df = df.dropna(subset=['lpa', 'vpa', 'cotacao'])
+                    df['valor_graham'] = np.sqrt(22.5 * df['lpa'] * df['vpa'])
+                    df['metrica'] = df['valor_graham'] - df['cotacao']
+                    df = df[df['metrica'] > 0].sort_values('metrica', ascending=False).head(10)
+                    y_label = 'Desconto vs. Valor Graham'
                 else:
-                    df = df.sort_values('metrica', ascending=False).head(10)
-                labels = {
-                    "dividend_yield": "Dividend Yield (%)",
-                    "roe": "ROE (%)",
-                    "cotacao": "Cotação (R$)",
-                    "margem_liquida": "Margem Líquida (%)",
-                    "div_liq_patrimonio": "Dív. Líq./Patrimônio"
-                }
-                y_label = labels.get(metrico, metrico)
-            conn.close()
+                    query = f"""
+                        SELECT acao, {metrico} AS metrica
+                        FROM indicadores_fundamentalistas
+                        WHERE data_coleta = (
+                            SELECT MAX(data_coleta) FROM indicadores_fundamentalistas
+                        ) AND {metrico} IS NOT NULL
+                    """
+                    if metrico == 'dividend_yield':
+                        query = query.replace('WHERE', 'WHERE pl >= 0 AND roe >= 0 AND')
+                    if metrico == 'roe':
+                        query = query.replace('WHERE', 'WHERE pl >= 0 AND lpa > 0 AND')
+                    df = pd.read_sql(query, conn)
+                    df['metrica'] = pd.to_numeric(df['metrica'], errors='coerce')
+                    df = df.dropna(subset=['metrica'])
+                    if metrico == 'div_liq_patrimonio':
+                        tmp = df.sort_values('metrica').head(10)
+                        df = tmp.sort_values('metrica', ascending=False)
+                    else:
+                        df = df.sort_values('metrica', ascending=False).head(10)
+                    labels = {
+                        "dividend_yield": "Dividend Yield (%)",
+                        "roe": "ROE (%)",
+                        "cotacao": "Cotação (R$)",
+                        "margem_liquida": "Margem Líquida (%)",
+                        "div_liq_patrimonio": "Dív. Líq./Patrimônio"
+                    }
+                    y_label = labels.get(metrico, metrico)
 
             if df.empty:
                 return px.bar(title="Sem dados para este ranking no momento")
@@ -698,71 +697,69 @@ def register_callbacks_indicadores(app):
         Input("metric-picker", "value")
     )
     def render_top_recommendations(metrico):
-        conn = get_connection()
-        if metrico == "graham":
-            query = """
-                SELECT acao, lpa, vpa, cotacao, pl, roe
-                FROM indicadores_fundamentalistas
-                WHERE data_coleta = (
-                    SELECT MAX(data_coleta) FROM indicadores_fundamentalistas
-                )
-                  AND lpa > 0 AND vpa > 0 AND cotacao > 0
-                  AND pl >= 0 AND roe >= 0
-            """
-            df = pd.read_sql(query, conn)
-            df[["lpa", "vpa", "cotacao"]] = df[["lpa", "vpa", "cotacao"]].apply(pd.to_numeric, errors="coerce")
-            df = df.dropna(subset=["lpa", "vpa", "cotacao"])
-            df["valor_graham"] = np.sqrt(22.5 * df["lpa"] * df["vpa"])
-            df["metrica"] = df["valor_graham"] - df["cotacao"]
-            top_df = df[df["metrica"] > 0].sort_values("metrica", ascending=False).head(10)
-        else:
-            base_query = f"""
-                SELECT acao, {metrico} AS metrica
-                FROM indicadores_fundamentalistas
-                WHERE data_coleta = (
-                    SELECT MAX(data_coleta) FROM indicadores_fundamentalistas
-                ) AND {metrico} IS NOT NULL
-            """
-            if metrico == "dividend_yield":
-                base_query = base_query.replace("WHERE", "WHERE pl >= 0 AND roe >= 0 AND")
-            if metrico == "roe":
-                base_query = base_query.replace("WHERE", "WHERE pl >= 0 AND lpa > 0 AND")
-            df = pd.read_sql(base_query, conn)
-            df["metrica"] = pd.to_numeric(df["metrica"], errors="coerce")
-            df = df.dropna(subset=["metrica"])
-            if metrico == "div_liq_patrimonio":
-                tmp = df.sort_values("metrica").head(10)
-                top_df = tmp.sort_values("metrica", ascending=False)
+        with conexao() as conn:
+            if metrico == "graham":
+                query = """
+                    SELECT acao, lpa, vpa, cotacao, pl, roe
+                    FROM indicadores_fundamentalistas
+                    WHERE data_coleta = (
+                        SELECT MAX(data_coleta) FROM indicadores_fundamentalistas
+                    )
+                      AND lpa > 0 AND vpa > 0 AND cotacao > 0
+                      AND pl >= 0 AND roe >= 0
+                """
+                df = pd.read_sql(query, conn)
+                df[["lpa", "vpa", "cotacao"]] = df[["lpa", "vpa", "cotacao"]].apply(pd.to_numeric, errors="coerce")
+                df = df.dropna(subset=["lpa", "vpa", "cotacao"])
+                df["valor_graham"] = np.sqrt(22.5 * df["lpa"] * df["vpa"])
+                df["metrica"] = df["valor_graham"] - df["cotacao"]
+                top_df = df[df["metrica"] > 0].sort_values("metrica", ascending=False).head(10)
             else:
-                top_df = df.sort_values("metrica", ascending=False).head(10)
-        conn.close()
+                base_query = f"""
+                    SELECT acao, {metrico} AS metrica
+                    FROM indicadores_fundamentalistas
+                    WHERE data_coleta = (
+                        SELECT MAX(data_coleta) FROM indicadores_fundamentalistas
+                    ) AND {metrico} IS NOT NULL
+                """
+                if metrico == "dividend_yield":
+                    base_query = base_query.replace("WHERE", "WHERE pl >= 0 AND roe >= 0 AND")
+                if metrico == "roe":
+                    base_query = base_query.replace("WHERE", "WHERE pl >= 0 AND lpa > 0 AND")
+                df = pd.read_sql(base_query, conn)
+                df["metrica"] = pd.to_numeric(df["metrica"], errors="coerce")
+                df = df.dropna(subset=["metrica"])
+                if metrico == "div_liq_patrimonio":
+                    tmp = df.sort_values("metrica").head(10)
+                    top_df = tmp.sort_values("metrica", ascending=False)
+                else:
+                    top_df = df.sort_values("metrica", ascending=False).head(10)
 
         top_actions = top_df["acao"].tolist()
         if not top_actions:
             return html.P("Sem dados para o ranking atual", className="text-muted")
 
-        conn2 = get_connection()
-        placeholders = ", ".join(["%s"] * len(top_actions))
-        sql_recos = f"""
-            SELECT acao, recomendada, nao_recomendada, resultado
-            FROM (
-                SELECT
-                  acao,
-                  recomendada,
-                  nao_recomendada,
-                  resultado,
-                  ROW_NUMBER() OVER (
-                    PARTITION BY acao
-                    ORDER BY data_insercao DESC
-                  ) AS rn
-                FROM recomendacoes_acoes
-                WHERE acao IN ({placeholders})
-            ) sub
-            WHERE rn = 1
-              AND recomendada < 1
-        """
-        recos_df = pd.read_sql(sql_recos, conn2, params=top_actions)
-        conn2.close()
+        with conexao() as conn2:
+            placeholders = ", ".join(["%s"] * len(top_actions))
+            sql_recos = f"""
+                SELECT acao, recomendada, nao_recomendada, resultado
+                FROM (
+                    SELECT
+                      acao,
+                      recomendada,
+                      nao_recomendada,
+                      resultado,
+                      ROW_NUMBER() OVER (
+                        PARTITION BY acao
+                        ORDER BY data_insercao DESC
+                      ) AS rn
+                    FROM recomendacoes_acoes
+                    WHERE acao IN ({placeholders})
+                ) sub
+                WHERE rn = 1
+                  AND recomendada < 1
+            """
+            recos_df = pd.read_sql(sql_recos, conn2, params=top_actions)
 
         recos_df["acao"] = pd.Categorical(recos_df["acao"], categories=top_actions, ordered=True)
         recos_df = recos_df.sort_values("acao")
@@ -873,22 +870,21 @@ def _loading_figure(bgcolor="#1e1e2f"):
 
 
 def _get_comparison_df():
-    conn = get_connection()
-    df = pd.read_sql(
-        '''
-        SELECT r.acao, r.data_calculo, r.data_previsao, r.preco_previsto,
-               i.cotacao AS preco_real,
-               CASE WHEN i.cotacao IS NOT NULL AND i.cotacao<>0
-                    THEN ROUND((r.preco_previsto - i.cotacao)/i.cotacao*100,4)
-                    ELSE NULL END AS erro_pct
-        FROM resultados_precos r
-        LEFT JOIN indicadores_fundamentalistas i
-          ON r.acao=i.acao AND r.data_previsao=i.data_coleta
-        ''',
-        conn,
-        parse_dates=['data_calculo', 'data_previsao']
-    )
-    conn.close()
+    with conexao() as conn:
+        df = pd.read_sql(
+            '''
+            SELECT r.acao, r.data_calculo, r.data_previsao, r.preco_previsto,
+                   i.cotacao AS preco_real,
+                   CASE WHEN i.cotacao IS NOT NULL AND i.cotacao<>0
+                        THEN ROUND((r.preco_previsto - i.cotacao)/i.cotacao*100,4)
+                        ELSE NULL END AS erro_pct
+            FROM resultados_precos r
+            LEFT JOIN indicadores_fundamentalistas i
+              ON r.acao=i.acao AND r.data_previsao=i.data_coleta
+            ''',
+            conn,
+            parse_dates=['data_calculo', 'data_previsao']
+        )
     df['data_calculo']  = df['data_calculo'].dt.strftime('%Y-%m-%d')
     df['data_previsao'] = df['data_previsao'].dt.strftime('%Y-%m-%d')
     return df
@@ -1,82 +1,46 @@
 from dash import html, dcc, Input, Output, State, no_update, dash_table
-import dash_bootstrap_components as dbc, pandas as pd, threading, uuid, json, os
+import dash_bootstrap_components as dbc, pandas as pd
 from dash.dash_table.Format import Format, Scheme
-from pathlib import Path
+import time
 from datetime import date
-from src.models.regressor_preco import executar_pipeline_multidia
-
-# --- LOCALIZAÇÃO DO REPOSITÓRIO BASE ---
-# src/dashboard/pages/previsoes.py → src/dashboard/pages → src/dashboard → src → project root
-_PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent.parent
-CACHE_STATUS_DIR = str(_PROJECT_ROOT / "cache_status")
-CACHE_RESULTS_DIR = str(_PROJECT_ROOT / "cache_results")
-# -----------------------------------------
-
-# --- CONFIGURAÇÃO DAS PASTAS DE CACHE ---
-if not os.path.exists(CACHE_STATUS_DIR):
-    os.makedirs(CACHE_STATUS_DIR)
-if not os.path.exists(CACHE_RESULTS_DIR):
-    os.makedirs(CACHE_RESULTS_DIR)
-# -----------------------------------------
-
-def calculation_worker(job_id, ticker, n_days):
-    """Esta função faz o trabalho pesado em segundo plano."""
-    status_file = os.path.join(CACHE_STATUS_DIR, f"{job_id}.json")
-    result_file = os.path.join(CACHE_RESULTS_DIR, f"{job_id}.json")
-
-    print(f"THREAD {job_id}: Iniciada para {ticker} por {n_days} dias.")
-
-    try:
-        # Função de callback para atualizar o progresso
-        def report_progress(current_day, total_days):
-            progress_info = {
-                "status": "running",
-                "progress": int((current_day / total_days) * 100),
-                "text": f"Processando dia {current_day} de {total_days}..."
-            }
-            with open(status_file, "w") as f:
-                json.dump(progress_info, f)
-
-        # Chama a nova função otimizada UMA ÚNICA VEZ
-        final_df = executar_pipeline_multidia(
-            max_dias=n_days,
-            data_calculo=date.today(),
-            save_to_db=False,  # Não salva no DB neste contexto, pois é só para exibição
-            tickers=[ticker],
-            progress_callback=report_progress
-        )
-
-        if final_df.empty:
-             raise ValueError("Nenhuma previsão foi gerada. Verifique os dados de entrada.")
-
-        # Salva o resultado final
-        final_df.to_json(result_file, orient="split", date_format="iso")
-
-        # Atualiza o status para concluído
-        final_status = {"status": "complete", "progress": 100, "text": "Concluído!"}
-        with open(status_file, "w") as f:
-            json.dump(final_status, f)
-
-        print(f"THREAD {job_id}: Concluída com sucesso.")
-
-        # Remoção dos arquivos de cache foi REMOVIDA daqui!
-        # O arquivo será removido pelo callback após leitura.
-
-    except Exception as e:
-        print(f"THREAD {job_id}: ERRO - {e}")
-        error_status = {"status": "error", "progress": 0, "text": f"Ocorreu um erro: {e}"}
-        with open(status_file, "w") as f:
-            json.dump(error_status, f)
-        # Remoção dos arquivos de cache foi REMOVIDA daqui!
-        # Remove os arquivos das pastas de cache também em caso de erro
-        for folder in [CACHE_STATUS_DIR, CACHE_RESULTS_DIR]:
-            try:
-                for filename in os.listdir(folder):
-                    file_path = os.path.join(folder, filename)
-                    if os.path.isfile(file_path):
-                        os.remove(file_path)
-            except Exception as e:
-                print(f"Erro ao limpar arquivos em {folder}: {e}")
+from src.core import fila_tarefas
+from src.models.modelos_horizonte import prever_com_modelos_salvos
+
+# Com os modelos por horizonte do último treino ainda atualizados (sem coleta
+# nova), a previsão é só predict, feita aqui mesmo. Caso contrário roda como
+# tarefa "previsao" na fila (src/api/tarefas.py), em processos worker — não no
+# processo que serve o dashboard. Pedidos iguais (ticker, dias, data)
+# reaproveitam a tarefa em andamento ou o resultado já calculado no dia.
+
+# Tarefa ainda pendente depois de AVISO_FILA segundos: provavelmente nenhum
+# worker atende "previsao"; depois de ESPERA_MAX_FILA a página desiste.
+AVISO_FILA = 30
+ESPERA_MAX_FILA = 600
+
+
+def _tabela_previsao(resultado):
+    """(data, columns) da DataTable a partir do DataFrame (ou do dict em orient="split")."""
+    if isinstance(resultado, pd.DataFrame):
+        final_df = resultado.copy()
+    else:
+        final_df = pd.DataFrame(resultado["data"], columns=resultado["columns"])
+    if 'data_previsao' in final_df.columns:
+        final_df['data_previsao'] = pd.to_datetime(final_df['data_previsao']).dt.strftime('%Y-%m-%d')
+
+    _fmt2 = Format(precision=2, scheme=Scheme.fixed)
+    _col_map = {
+        "acao":          {"name": "Ação",             "id": "acao"},
+        "data_previsao": {"name": "Data Alvo",        "id": "data_previsao"},
+        "preco_previsto":{"name": "Previsto (R$)",    "id": "preco_previsto",
+                          "type": "numeric", "format": _fmt2},
+        "dias_a_frente": {"name": "Dias à Frente",    "id": "dias_a_frente",
+                          "type": "numeric"},
+    }
+    columns = [
+        _col_map.get(col, {"name": col, "id": col})
+        for col in final_df.columns
+    ]
+    return final_df.to_dict('records'), columns
 
 
 def layout_previsoes():
@@ -195,6 +159,8 @@ def register_callbacks_previsoes(app):
         Output('progress-interval', 'disabled'),
         Output('btn-load-pred', 'disabled'),
         Output("table-previsao", "data"),
+        Output("table-previsao", "columns", allow_duplicate=True),
+        Output('progress-text', 'children', allow_duplicate=True),
         Input("btn-load-pred", "n_clicks"),
         State("input-ticker-prev", "value"),
         State("input-n-days-prev", "value"),
@@ -202,13 +168,35 @@ def register_callbacks_previsoes(app):
     )
     def start_job(n_clicks, ticker, n_days):
         if not ticker or not n_days:
-            return no_update, no_update, no_update, no_update
+            return no_update, no_update, no_update, no_update, no_update, no_update
 
-        job_id = str(uuid.uuid4())
-        thread = threading.Thread(target=calculation_worker, args=(job_id, ticker, int(n_days)))
-        thread.start()
+        ticker = ticker.strip().upper()
+        hoje = date.today().isoformat()
+        try:
+            final_df = prever_com_modelos_salvos(int(n_days), date.today(), tickers=[ticker])
+        except Exception as e:
+            print(f"⚠️ Modelos por horizonte indisponíveis ({e}); usando a fila.")
+            final_df = None
+        if final_df is not None and not final_df.empty:
+            data, columns = _tabela_previsao(final_df)
+            return no_update, True, False, data, columns, ""
 
-        return {"job_id": job_id}, False, True, []
+        try:
+            tarefa = fila_tarefas.solicitar(
+                "previsao",
+                {"ticker": ticker, "n_dias": int(n_days), "data_calculo": hoje},
+                chave_dedupe=f"previsao:{ticker}:{int(n_days)}:{hoje}",
+            )
+        except Exception as e:
+            print(f"Erro ao enfileirar previsão de {ticker}: {e}")
+            return no_update, True, False, [], [], f"Ocorreu um erro: {e}"
+
+        if tarefa["status"] == fila_tarefas.CONCLUIDA:
+            # Mesma previsão já calculada hoje: resultado imediato
+            data, columns = _tabela_previsao(tarefa["resultado"])
+            return {"job_id": tarefa["id"]}, True, False, data, columns, ""
+
+        return {"job_id": tarefa["id"], "enfileirado_em": time.time()}, False, True, [], no_update, ""
 
     # Callback de atualização de progresso
     @app.callback(
@@ -224,58 +212,43 @@ def register_callbacks_previsoes(app):
         prevent_initial_call=True
     )
     def update_progress(n, job_data):
-        job_id = job_data.get("job_id")
+        job_id = (job_data or {}).get("job_id")
         if not job_id:
             return no_update, no_update, no_update, no_update, True, False, {"display": "none"}
 
-        status_file = os.path.join(CACHE_STATUS_DIR, f"{job_id}.json")
-        
         try:
-            with open(status_file, "r") as f:
-                status = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
+            tarefa = fila_tarefas.obter(job_id)
+        except Exception as e:
+            print(f"Erro ao consultar a previsão {job_id}: {e}")
+            tarefa = None
+        if tarefa is None:
             # Esconde barra de progresso se não houver status
             return no_update, "", no_update, no_update, False, False, {"display": "none"}
 
-        progress = status.get("progress", 0)
-        text = status.get("text", "")
-
-        if status.get("status") == "complete":
-            result_file = os.path.join(CACHE_RESULTS_DIR, f"{job_id}.json")
-            final_df = pd.read_json(result_file, orient="split")
-
-            if 'data_previsao' in final_df.columns:
-                final_df['data_previsao'] = pd.to_datetime(final_df['data_previsao']).dt.strftime('%Y-%m-%d')
-            
-            _fmt2 = Format(precision=2, scheme=Scheme.fixed)
-            _col_map = {
-                "acao":          {"name": "Ação",             "id": "acao"},
-                "data_previsao": {"name": "Data Alvo",        "id": "data_previsao"},
-                "preco_previsto":{"name": "Previsto (R$)",    "id": "preco_previsto",
-                                  "type": "numeric", "format": _fmt2},
-                "dias_a_frente": {"name": "Dias à Frente",    "id": "dias_a_frente",
-                                  "type": "numeric"},
-            }
-            columns = [
-                _col_map.get(col, {"name": col, "id": col})
-                for col in final_df.columns
-            ]
-            
-            try:
-                if os.path.isfile(status_file):
-                    os.remove(status_file)
-                if os.path.isfile(result_file):
-                    os.remove(result_file)
-            except Exception as e:
-                print(f"Erro ao remover arquivos do job {job_id}: {e}")
-
+        if tarefa["status"] == fila_tarefas.CONCLUIDA:
+            data, columns = _tabela_previsao(tarefa["resultado"])
             # Esconde barra de progresso ao concluir e habilita botão
-            return 100, "Concluído!", final_df.to_dict('records'), columns, True, False, {"display": "none"}
-        
-        elif status.get("status") == "error":
+            return 100, "Concluído!", data, columns, True, False, {"display": "none"}
+
+        elif tarefa["status"] == fila_tarefas.FALHOU:
             # Esconde barra de progresso em caso de erro e habilita botão
-            return 0, text, [], [], True, False, {"display": "none"}
+            return 0, f"Ocorreu um erro: {tarefa['erro']}", [], [], True, False, {"display": "none"}
+
+        elif tarefa["status"] == fila_tarefas.PENDENTE:
+            espera = time.time() - job_data.get("enfileirado_em", time.time())
+            if espera >= ESPERA_MAX_FILA:
+                text = (f"A previsão não começou em {ESPERA_MAX_FILA // 60} min: nenhum worker atende "
+                        "previsões (python scripts/worker_tarefas.py --tipos previsao).")
+                return 0, text, [], [], True, False, {"display": "none"}
+            if espera >= AVISO_FILA:
+                text = (f"Aguardando na fila de previsões há {int(espera)}s — verifique se há um "
+                        "worker atendendo previsões.")
+            else:
+                text = "Aguardando na fila de previsões..."
+            return 0, text, no_update, no_update, False, True, {"display": "block"}
 
         else:
             # Mostra barra de progresso enquanto processa e desabilita botão
-            return progress, text, no_update, no_update, False, True, {"display": "block"}
\ No newline at end of file
+            progress = int((tarefa["progresso"] or 0) * 100)
+            text = tarefa["mensagem"] or "Processando..."
+            return progress, text, no_update, no_update, False, True, {"display": "block"}
@@ -1,4 +1,5 @@
 import os
+import time
 import requests
 import plotly.graph_objects as go
 from dash import html, dcc, Input, Output, State, no_update
@@ -85,6 +86,35 @@ _INDICADORES_CHAVE_NAMES = {
 }
 
 
+# A explicação de IA que não chegou junto com a recomendação (Gemini demorou
+# mais que EXPLICACAO_IA_ESPERA na API) é buscada em
+# /recomendacao/{ticker}/explicacao a cada INTERVALO_EXPLICACAO ms, por até
+# ESPERA_MAX_EXPLICACAO segundos.
+INTERVALO_EXPLICACAO = 3000
+ESPERA_MAX_EXPLICACAO = 120
+
+
+def _bloco_explicacao_ia(texto):
+    return html.Div([
+        html.P("🤖 Análise IA", style={
+            "color": "#b0b8ff", "fontWeight": "700",
+            "fontSize": "0.78rem", "textTransform": "uppercase",
+            "letterSpacing": "0.06em", "marginBottom": "8px",
+        }),
+        html.P(texto, style={
+            "color": "#c8c8e0", "fontSize": "0.85rem",
+            "lineHeight": "1.7", "marginBottom": "0",
+        }),
+    ], style={
+        "backgroundColor": "#1a1a30",
+        "border": "1px solid rgba(85, 97, 255, 0.25)",
+        "borderLeft": "3px solid #5561ff",
+        "borderRadius": "6px",
+        "padding": "12px 14px",
+        "marginTop": "8px",
+    })
+
+
 # -----------------------------------------------------------------------------
 # Layout
 # -----------------------------------------------------------------------------
@@ -126,6 +156,11 @@ def layout_recomendador():
                             ),
                         )
                     ),
+
+                    # Explicação de IA que ficou pronta depois da recomendação (fora do Loading)
+                    html.Div(id="rec-explicacao-ia"),
+                    dcc.Store(id="rec-explicacao-store"),
+                    dcc.Interval(id="rec-explicacao-interval", interval=INTERVALO_EXPLICACAO, disabled=True),
                 ], md=5),
 
                 # Separador vertical
@@ -324,22 +359,23 @@ def register_callbacks_recomendador(app):
     @app.callback(
         Output("recomendation-output", "children"),
         Output("rec-status-msg", "children", allow_duplicate=True),
+        Output("rec-explicacao-store", "data"),
         Input("btn-recommend", "n_clicks"),
         State("input-ticker-rec", "value"),
         prevent_initial_call=True,
     )
     def update_recommend(n_clicks, ticker):
         if not n_clicks:
-            return no_update, no_update
+            return no_update, no_update, no_update
 
         api_url = _resolver_api_url()
         api_key = os.getenv("API_KEY", "")
 
         if not api_key:
-            return dbc.Alert("Configuração ausente: defina API_KEY no serviço.", color="warning"), ""
+            return dbc.Alert("Configuração ausente: defina API_KEY no serviço.", color="warning"), "", None
 
         if not ticker:
-            return dbc.Alert("Informe um ticker válido.", color="warning"), ""
+            return dbc.Alert("Informe um ticker válido.", color="warning"), "", None
 
         try:
             resp = requests.post(
@@ -348,14 +384,14 @@ def register_callbacks_recomendador(app):
                 timeout=90,
             )
         except requests.RequestException as exc:
-            return dbc.Alert(f"Falha ao chamar API de recomendação: {exc}", color="danger"), ""
+            return dbc.Alert(f"Falha ao chamar API de recomendação: {exc}", color="danger"), "", None
 
         if resp.status_code != 200:
             try:
                 detalhe = resp.json().get("detail", resp.text)
             except Exception:
                 detalhe = resp.text
-            return dbc.Alert(f"Erro da API ({resp.status_code}): {detalhe}", color="danger"), ""
+            return dbc.Alert(f"Erro da API ({resp.status_code}): {detalhe}", color="danger"), "", None
 
         payload = resp.json()
         prob     = payload.get("probabilidades", {})
@@ -515,29 +551,9 @@ def register_callbacks_recomendador(app):
             margin=dict(l=20, r=20, t=35, b=5),
         )
 
-        # --- Explicação IA ---
-        ia_block = []
-        if explicacao_ia:
-            ia_block = [
-                html.Div([
-                    html.P("🤖 Análise IA", style={
-                        "color": "#b0b8ff", "fontWeight": "700",
-                        "fontSize": "0.78rem", "textTransform": "uppercase",
-                        "letterSpacing": "0.06em", "marginBottom": "8px",
-                    }),
-                    html.P(explicacao_ia, style={
-                        "color": "#c8c8e0", "fontSize": "0.85rem",
-                        "lineHeight": "1.7", "marginBottom": "0",
-                    }),
-                ], style={
-                    "backgroundColor": "#1a1a30",
-                    "border": "1px solid rgba(85, 97, 255, 0.25)",
-                    "borderLeft": "3px solid #5561ff",
-                    "borderRadius": "6px",
-                    "padding": "12px 14px",
-                    "marginTop": "8px",
-                })
-            ]
+        # --- Explicação IA (ainda gerando → buscada depois, ver update_explicacao) ---
+        ia_block = [_bloco_explicacao_ia(explicacao_ia)] if explicacao_ia else []
+        explicacao_pendente = None if explicacao_ia else {"ticker": ticker_resp, "desde": time.time()}
 
         return html.Div([
             # Veredicto
@@ -554,4 +570,49 @@ def register_callbacks_recomendador(app):
             *positivos_card,
             *negativos_card,
             *ia_block,
-        ]), ""
+        ]), "", explicacao_pendente
+
+    @app.callback(
+        Output("rec-explicacao-ia", "children"),
+        Output("rec-explicacao-interval", "disabled"),
+        Input("rec-explicacao-store", "data"),
+        prevent_initial_call=True,
+    )
+    def start_explicacao(pendente):
+        if not pendente:
+            return [], True
+        aviso = html.P("🤖 Gerando a análise de IA...", className="text-muted small mt-2")
+        return aviso, False
+
+    @app.callback(
+        Output("rec-explicacao-ia", "children", allow_duplicate=True),
+        Output("rec-explicacao-interval", "disabled", allow_duplicate=True),
+        Input("rec-explicacao-interval", "n_intervals"),
+        State("rec-explicacao-store", "data"),
+        prevent_initial_call=True,
+    )
+    def update_explicacao(n, pendente):
+        if not pendente:
+            return no_update, True
+
+        try:
+            resp = requests.post(
+                f"{_resolver_api_url()}/recomendacao/{pendente['ticker']}/explicacao",
+                headers={"X-API-Key": os.getenv("API_KEY", "")},
+                timeout=30,
+            )
+        except requests.RequestException as exc:
+            print(f"Erro ao buscar a explicação de {pendente['ticker']}: {exc}")
+            resp = None
+
+        if resp is not None and resp.status_code == 200:
+            texto = resp.json().get("explicacao_ia")
+            if texto:
+                return _bloco_explicacao_ia(texto), True
+            return html.P("Análise de IA indisponível para este ticker.", className="text-muted small mt-2"), True
+
+        if time.time() - pendente["desde"] >= ESPERA_MAX_EXPLICACAO:
+            return html.P(f"A análise de IA não ficou pronta em {ESPERA_MAX_EXPLICACAO // 60} min.",
+                          className="text-muted small mt-2"), True
+        # 202 (gerando) ou falha momentânea: tenta de novo no próximo intervalo
+        return no_update, False
@@ -0,0 +1,200 @@
+"""
+Cache com TTL dos resultados de coleta por (ticker, fonte).
+
+Um clique em "Recomendar" no dashboard coletava o mesmo ticker duas vezes
+(update_indicators chama coletar_com_fallback e a API /recomendacao/{ticker}
+coleta de novo), e Fundamentus e Yahoo baixavam cada um o histórico de 12
+meses para variacao_12m. Com o cache, a segunda coleta do mesmo ticker/fonte
+dentro do TTL é lida do disco.
+
+O cache fica num arquivo SQLite local, compartilhado pelos processos da
+máquina (API, dashboard, workers do recomendador):
+  - entradas expiram após CACHE_COLETA_TTL segundos;
+  - no máximo CACHE_COLETA_MAX_ITENS entradas (as menos acessadas saem — LRU);
+  - single-flight: pedidos simultâneos da mesma chave esperam a coleta em
+    andamento em vez de repeti-la (lock por chave entre threads do processo
+    e uma "reserva" com prazo na tabela coletas_em_andamento entre processos);
+  - só resultados válidos (não None) são guardados.
+
+Configuração (.env):
+    CACHE_COLETA_TTL         segundos de validade (padrão 900; 0 desliga o cache)
+    CACHE_COLETA_MAX_ITENS   tamanho máximo (padrão 5000)
+    CACHE_COLETA_ARQUIVO     caminho do SQLite (padrão <raiz>/.cache/coleta.sqlite3)
+"""
+
+import sys
+from pathlib import Path
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Any, Callable, Dict, Optional
+
+TTL_PADRAO = float(os.getenv("CACHE_COLETA_TTL", "900"))
+MAX_ITENS_PADRAO = int(os.getenv("CACHE_COLETA_MAX_ITENS", "5000"))
+ARQUIVO_PADRAO = Path(os.getenv("CACHE_COLETA_ARQUIVO", _PROJECT_ROOT / ".cache" / "coleta.sqlite3"))
+
+# Prazo da reserva de uma coleta em andamento (outro processo assume depois disso)
+PRAZO_RESERVA = 120.0
+INTERVALO_ESPERA = 0.2
+
+_DDL = """
+CREATE TABLE IF NOT EXISTS cache_coleta (
+    chave       TEXT PRIMARY KEY,
+    valor       BLOB NOT NULL,
+    criado_em   REAL NOT NULL,
+    acessado_em REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_cache_coleta_acessado ON cache_coleta (acessado_em);
+CREATE TABLE IF NOT EXISTS coletas_em_andamento (
+    chave     TEXT PRIMARY KEY,
+    pid       INTEGER NOT NULL,
+    expira_em REAL NOT NULL
+);
+"""
+
+
+class CacheColeta:
+    """Cache SQLite thread-safe e compartilhado entre processos."""
+
+    def __init__(self, arquivo: Path = ARQUIVO_PADRAO, ttl: float = TTL_PADRAO,
+                 max_itens: int = MAX_ITENS_PADRAO):
+        self.arquivo = Path(arquivo)
+        self.ttl = ttl
+        self.max_itens = max(1, max_itens)
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._iniciado = False
+        self.acertos = 0
+        self.coletas = 0
+        self.esperas = 0
+
+    # ── SQLite ───────────────────────────────────────────────────────────────
+
+    def _conectar(self) -> sqlite3.Connection:
+        if not self._iniciado:
+            self.arquivo.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.arquivo), timeout=30, isolation_level=None)
+        if not self._iniciado:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_DDL)
+            self._iniciado = True
+        return conn
+
+    def _ler(self, conn, chave: str) -> Optional[Any]:
+        linha = conn.execute(
+            "SELECT valor, criado_em FROM cache_coleta WHERE chave = ?", (chave,)
+        ).fetchone()
+        if linha is None or time.time() - linha[1] > self.ttl:
+            return None
+        conn.execute("UPDATE cache_coleta SET acessado_em = ? WHERE chave = ?", (time.time(), chave))
+        return pickle.loads(linha[0])
+
+    def _gravar(self, conn, chave: str, valor: Any) -> None:
+        agora = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache_coleta (chave, valor, criado_em, acessado_em) "
+            "VALUES (?, ?, ?, ?)",
+            (chave, pickle.dumps(valor), agora, agora),
+        )
+        conn.execute("DELETE FROM cache_coleta WHERE criado_em < ?", (agora - self.ttl,))
+        conn.execute(
+            "DELETE FROM cache_coleta WHERE chave NOT IN ("
+            "  SELECT chave FROM cache_coleta ORDER BY acessado_em DESC LIMIT ?)",
+            (self.max_itens,),
+        )
+
+    def _reservar(self, conn, chave: str) -> bool:
+        agora = time.time()
+        conn.execute("DELETE FROM coletas_em_andamento WHERE expira_em < ?", (agora,))
+        cur = conn.execute(
+            "INSERT OR IGNORE INTO coletas_em_andamento (chave, pid, expira_em) VALUES (?, ?, ?)",
+            (chave, os.getpid(), agora + PRAZO_RESERVA),
+        )
+        return cur.rowcount == 1
+
+    def _liberar(self, conn, chave: str) -> None:
+        conn.execute("DELETE FROM coletas_em_andamento WHERE chave = ? AND pid = ?", (chave, os.getpid()))
+
+    def _lock_chave(self, chave: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(chave, threading.Lock())
+
+    # ── API pública ──────────────────────────────────────────────────────────
+
+    def obter_ou_coletar(self, fonte: str, ticker: str, coletar: Callable[[], Any]) -> Any:
+        """
+        Valor em cache de (ticker, fonte) ou, se ausente/expirado, o retorno
+        de `coletar()` — executado uma única vez mesmo com pedidos simultâneos.
+        Exceções de `coletar()` são propagadas.
+        """
+        if self.ttl <= 0:
+            return coletar()
+
+        chave = f"{fonte}:{ticker.upper().strip()}"
+        with self._lock_chave(chave):
+            try:
+                conn = self._conectar()
+            except (sqlite3.Error, OSError) as e:
+                print(f"⚠️ Cache de coleta indisponível ({e}); coletando sem cache.")
+                return coletar()
+
+            with closing(conn):
+                esperou = False
+                while True:
+                    valor = self._ler(conn, chave)
+                    if valor is not None:
+                        self.acertos += 1
+                        self.esperas += esperou
+                        return valor
+                    if self._reservar(conn, chave):
+                        break
+                    # Outro processo está coletando esta chave
+                    esperou = True
+                    time.sleep(INTERVALO_ESPERA)
+
+                try:
+                    valor = coletar()
+                    self.coletas += 1
+                    if valor is not None:
+                        self._gravar(conn, chave, valor)
+                    return valor
+                finally:
+                    self._liberar(conn, chave)
+
+    def invalidar(self, ticker: Optional[str] = None) -> None:
+        """Remove as entradas de `ticker` (todas as fontes) ou o cache inteiro."""
+        with closing(self._conectar()) as conn:
+            if ticker is None:
+                conn.execute("DELETE FROM cache_coleta")
+            else:
+                conn.execute("DELETE FROM cache_coleta WHERE chave LIKE ?",
+                             (f"%:{ticker.upper().strip()}",))
+
+    def estatisticas(self) -> Dict[str, int]:
+        return {"acertos": self.acertos, "coletas": self.coletas, "esperas": self.esperas}
+
+
+_cache: Optional[CacheColeta] = None
+_cache_guard = threading.Lock()
+
+
+def obter_cache() -> CacheColeta:
+    """Instância do processo (configurada pelo .env)."""
+    global _cache
+    with _cache_guard:
+        if _cache is None:
+            _cache = CacheColeta()
+        return _cache
+
+
+def obter_ou_coletar(fonte: str, ticker: str, coletar: Callable[[], Any]) -> Any:
+    """Atalho para obter_cache().obter_ou_coletar(...)."""
+    return obter_cache().obter_ou_coletar(fonte, ticker, coletar)
@@ -0,0 +1,108 @@
+"""
+Mapa de disponibilidade de campos por (ticker, fonte).
+
+coletar_com_fallback só parava antes da última fonte quando todos os campos
+estavam preenchidos. Para bancos, p_ebitda/margem_ebitda/div_liq_* nunca
+existem, então Yahoo e Investidor10 eram consultados toda noite para quase
+todos os tickers, sem acrescentar nada.
+
+A tabela disponibilidade_campos_fonte guarda, para cada (acao, fonte), as
+colunas que a fonte já devolveu preenchidas (união ao longo das coletas). Na
+cascata, uma fonte é pulada quando todas as colunas que ela costuma ter já
+estão preenchidas pelas fontes anteriores.
+
+Para não perder campos que uma fonte passe a publicar, a entrada vale por
+DIAS_REVERIFICAR dias: depois disso a fonte é consultada de novo (e a data
+de verificação é renovada). Fontes sem entrada são sempre consultadas.
+
+Uso:
+    mapa = MapaDisponibilidade.carregar(acoes)
+    if not mapa.pode_pular(acao, "yahoo", dados): ...
+    mapa.registrar(acao, "yahoo", campos_preenchidos)
+    mapa.salvar()
+"""
+
+import sys
+from pathlib import Path
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Set, Tuple
+
+from src.core.db_connection import conexao
+from src.core.gravador_lote import GravadorLote
+
+TABELA = "disponibilidade_campos_fonte"
+DIAS_REVERIFICAR = float(os.getenv("DISPONIBILIDADE_DIAS_REVERIFICAR", "7"))
+
+
+class MapaDisponibilidade:
+    """{(acao, fonte): (colunas já devolvidas, verificado_em)} — thread-safe."""
+
+    def __init__(self, entradas: Dict[Tuple[str, str], Tuple[Set[str], datetime]] = None,
+                 dias_reverificar: float = DIAS_REVERIFICAR):
+        self._entradas = dict(entradas or {})
+        self._alteradas: Set[Tuple[str, str]] = set()
+        self._lock = threading.Lock()
+        self.dias_reverificar = dias_reverificar
+        self.puladas = 0
+
+    @classmethod
+    def carregar(cls, acoes: Iterable[str]) -> "MapaDisponibilidade":
+        """Entradas de `acoes` no banco; mapa vazio (nada é pulado) se o banco falhar."""
+        acoes = sorted({a.upper().strip() for a in acoes})
+        try:
+            with conexao() as conn, conn.cursor() as cur:
+                cur.execute(
+                    f"SELECT acao, fonte, campos, verificado_em FROM {TABELA} WHERE acao = ANY(%s)",
+                    (acoes,),
+                )
+                linhas = cur.fetchall()
+        except Exception as e:
+            print(f"⚠️ Mapa de disponibilidade indisponível ({e}); todas as fontes serão consultadas.")
+            return cls()
+        return cls({(acao, fonte): (set(campos or []), verificado_em)
+                    for acao, fonte, campos, verificado_em in linhas})
+
+    def pode_pular(self, acao: str, fonte: str, dados: Dict) -> bool:
+        """True se a fonte tem entrada recente e todas as suas colunas já estão em `dados`."""
+        with self._lock:
+            entrada = self._entradas.get((acao, fonte))
+        if entrada is None:
+            return False
+        campos, verificado_em = entrada
+        if datetime.now() - verificado_em > timedelta(days=self.dias_reverificar):
+            return False
+        if any(dados.get(col) is None for col in campos):
+            return False
+        with self._lock:
+            self.puladas += 1
+        return True
+
+    def registrar(self, acao: str, fonte: str, campos: Iterable[str]) -> None:
+        """Acrescenta `campos` (preenchidos nesta coleta) à entrada e renova a verificação."""
+        with self._lock:
+            anteriores = self._entradas.get((acao, fonte), (set(), None))[0]
+            self._entradas[(acao, fonte)] = (anteriores | set(campos), datetime.now())
+            self._alteradas.add((acao, fonte))
+
+    def salvar(self) -> None:
+        """Grava em lote as entradas registradas nesta execução."""
+        with self._lock:
+            linhas = [
+                {"acao": acao, "fonte": fonte, "campos": sorted(self._entradas[(acao, fonte)][0]),
+                 "verificado_em": self._entradas[(acao, fonte)][1]}
+                for acao, fonte in sorted(self._alteradas)
+            ]
+            self._alteradas.clear()
+        if not linhas:
+            return
+        with GravadorLote(TABELA, chave=("acao", "fonte"),
+                          colunas=["acao", "fonte", "campos", "verificado_em"],
+                          tamanho_lote=len(linhas)) as gravador:
+            gravador.adicionar_varias(linhas)
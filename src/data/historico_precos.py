@@ -0,0 +1,250 @@
+"""
+Histórico de fechamentos (12 meses) de todo o universo, baixado em lote.
+
+Fundamentus e Yahoo calculavam variacao_12m com um yf.Ticker(...).history()
+por ticker — até duas requisições por ticker numa coleta. Aqui os fechamentos
+de todos os tickers são baixados em poucos yf.download multi-ticker, guardados
+num painel local (.npz: datas x tickers) e as consultas de variacao_12m são
+respondidas da memória.
+
+Atualização do painel:
+  - tickers novos: 1 ano de histórico, LOTE_DOWNLOAD tickers por chamada;
+  - painel de um dia anterior: só os pregões desde a última data (append);
+  - a cada DIAS_REBAIXAR dias o painel é rebaixado inteiro, porque o Yahoo
+    reajusta os fechamentos passados a cada provento (auto_adjust), e
+    fechamentos de bases diferentes distorceriam a variação.
+
+Como no cálculo antigo (history(start=hoje-365d, end=hoje)), o pregão de hoje
+não entra: a variação vai do primeiro ao último fechamento em [hoje-365d, hoje).
+
+Uso:
+    historico_precos.preparar(ACOES_MONITORADAS)   # uma vez, antes da coleta
+    historico_precos.variacao_12m("PETR4")         # sem rede
+"""
+
+import sys
+from pathlib import Path
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+import os
+import threading
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+ARQUIVO_PAINEL = Path(os.getenv("HISTORICO_PRECOS_ARQUIVO", _PROJECT_ROOT / ".cache" / "precos_12m.npz"))
+LOTE_DOWNLOAD = 100
+DIAS_HISTORICO = 365
+DIAS_REBAIXAR = 7
+
+
+class _Painel:
+    """Fechamentos ajustados (datas x tickers) + metadados de atualização."""
+
+    def __init__(self, datas=None, tickers=None, fechamentos=None,
+                 atualizado_em: Optional[date] = None, completo_em: Optional[date] = None):
+        self.datas = datas if datas is not None else np.array([], dtype="datetime64[D]")
+        self.tickers = list(tickers) if tickers is not None else []
+        self.fechamentos = (
+            fechamentos if fechamentos is not None
+            else np.empty((len(self.datas), 0), dtype=float)
+        )
+        self.atualizado_em = atualizado_em
+        self.completo_em = completo_em
+        self.indice = {t: i for i, t in enumerate(self.tickers)}
+
+    def como_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.fechamentos, index=pd.DatetimeIndex(self.datas), columns=self.tickers)
+
+    @classmethod
+    def de_frame(cls, df: pd.DataFrame, atualizado_em, completo_em) -> "_Painel":
+        df = df.sort_index()
+        return cls(
+            df.index.values.astype("datetime64[D]"),
+            [str(c) for c in df.columns],
+            df.to_numpy(dtype=float),
+            atualizado_em,
+            completo_em,
+        )
+
+
+_painel = _Painel()
+_sem_dados: Dict[str, date] = {}   # tickers sem histórico no Yahoo (não tenta de novo no mesmo dia)
+_lock = threading.RLock()
+_carregado = False
+
+
+# ── Persistência ──────────────────────────────────────────────────────────────
+
+def _ler_arquivo() -> _Painel:
+    try:
+        with np.load(ARQUIVO_PAINEL, allow_pickle=False) as npz:
+            return _Painel(
+                npz["datas"].astype("datetime64[D]"),
+                npz["tickers"].tolist(),
+                npz["fechamentos"],
+                date.fromisoformat(str(npz["atualizado_em"])),
+                date.fromisoformat(str(npz["completo_em"])),
+            )
+    except FileNotFoundError:
+        return _Painel()
+    except Exception as e:
+        print(f"⚠️ Painel de preços ilegível ({e}); será rebaixado.")
+        return _Painel()
+
+
+def _salvar_arquivo(painel: _Painel) -> None:
+    ARQUIVO_PAINEL.parent.mkdir(parents=True, exist_ok=True)
+    tmp = ARQUIVO_PAINEL.with_name(ARQUIVO_PAINEL.stem + f".{os.getpid()}.tmp.npz")
+    np.savez(
+        tmp,
+        datas=painel.datas,
+        tickers=np.array(painel.tickers, dtype=str),
+        fechamentos=painel.fechamentos,
+        atualizado_em=np.array(str(painel.atualizado_em)),
+        completo_em=np.array(str(painel.completo_em)),
+    )
+    os.replace(tmp, ARQUIVO_PAINEL)
+
+
+# ── Download ──────────────────────────────────────────────────────────────────
+
+def _baixar_fechamentos(tickers: List[str], inicio: date, fim: date) -> Tuple[pd.DataFrame, Set[str]]:
+    """
+    Fechamentos ajustados em [inicio, fim) — colunas = tickers (sem .SA) — e o
+    conjunto de tickers cujo lote falhou (sem resposta, não "sem dados").
+    """
+    partes, falhos = [], set()
+    for i in range(0, len(tickers), LOTE_DOWNLOAD):
+        lote = tickers[i:i + LOTE_DOWNLOAD]
+        try:
+            bruto = yf.download(
+                [t + ".SA" for t in lote],
+                start=inicio.isoformat(),
+                end=fim.isoformat(),
+                auto_adjust=True,
+                progress=False,
+                threads=True,
+            )
+        except Exception as e:
+            print(f"⚠️ yf.download falhou para {len(lote)} ticker(s): {e}")
+            falhos.update(lote)
+            continue
+        if bruto is None or bruto.empty:
+            continue
+        fech = bruto["Close"]
+        if isinstance(fech, pd.Series):
+            fech = fech.to_frame(lote[0] + ".SA")
+        fech.columns = [str(c).removesuffix(".SA") for c in fech.columns]
+        partes.append(fech)
+    if not partes:
+        return pd.DataFrame(), falhos
+    df = pd.concat(partes, axis=1)
+    df.index = pd.to_datetime(df.index).tz_localize(None).normalize()
+    return df[~df.index.duplicated(keep="last")], falhos
+
+
+def _atualizar(tickers: Iterable[str]) -> None:
+    """Garante o painel em dia para `tickers` (chamar com _lock)."""
+    global _painel
+    hoje = date.today()
+    inicio_janela = hoje - timedelta(days=DIAS_HISTORICO)
+    painel = _painel
+
+    rebaixar = painel.completo_em is None or (hoje - painel.completo_em).days >= DIAS_REBAIXAR
+    bloqueados = {t for t, dia in _sem_dados.items() if dia == hoje}
+    if rebaixar:
+        conhecidos, novos = [], sorted((set(tickers) | set(painel.tickers)) - bloqueados)
+    else:
+        conhecidos, novos = list(painel.tickers), sorted(set(tickers) - set(painel.indice) - bloqueados)
+    append = (not rebaixar) and painel.atualizado_em is not None and painel.atualizado_em < hoje
+
+    if not novos and not append:
+        return
+
+    df = pd.DataFrame() if rebaixar else painel.como_frame()
+    if append and conhecidos:
+        ultima = pd.Timestamp(painel.datas[-1]).date() if len(painel.datas) else inicio_janela
+        recentes, _ = _baixar_fechamentos(conhecidos, ultima + timedelta(days=1), hoje)
+        if not recentes.empty:
+            df = recentes.combine_first(df)
+        print(f"📈 Painel de preços: +{len(recentes)} pregão(ões) para {len(conhecidos)} ticker(s).")
+    if novos:
+        baixados, falhos = _baixar_fechamentos(novos, inicio_janela, hoje)
+        if baixados.empty and rebaixar and painel.tickers:
+            # Yahoo fora do ar: mantém o painel anterior e tenta de novo na próxima consulta
+            print("⚠️ Download do painel de preços falhou; mantendo o painel anterior.")
+            return
+        for t in novos:
+            if t not in falhos and (t not in baixados.columns or baixados[t].notna().sum() == 0):
+                _sem_dados[t] = hoje
+        if not baixados.empty:
+            baixados = baixados.dropna(axis=1, how="all")
+            df = baixados.combine_first(df) if not df.empty else baixados
+        if rebaixar and falhos:
+            # Lotes que falharam no rebaixamento: fica a série anterior desses tickers
+            anterior = painel.como_frame()
+            mantidos = [t for t in anterior.columns if t in falhos and t not in df.columns]
+            if mantidos:
+                df = df.combine_first(anterior[mantidos]) if not df.empty else anterior[mantidos]
+                print(f"⚠️ Painel de preços: série anterior mantida para {len(mantidos)} ticker(s).")
+        print(f"📈 Painel de preços: 1 ano de histórico para {len(novos)} ticker(s).")
+
+    if df.empty:
+        df = pd.DataFrame(index=pd.DatetimeIndex([]))
+    df = df[df.index >= pd.Timestamp(inicio_janela - timedelta(days=7))]
+    _painel = _Painel.de_frame(
+        df,
+        atualizado_em=hoje,
+        completo_em=hoje if rebaixar else painel.completo_em,
+    )
+    try:
+        _salvar_arquivo(_painel)
+    except Exception as e:
+        print(f"⚠️ Não foi possível salvar o painel de preços: {e}")
+
+
+def _carregar_do_disco() -> None:
+    global _painel, _carregado
+    if not _carregado:
+        _painel = _ler_arquivo()
+        _carregado = True
+
+
+# ── API pública ───────────────────────────────────────────────────────────────
+
+def preparar(tickers: Iterable[str]) -> None:
+    """Baixa/atualiza em lote o histórico de `tickers` (antes de uma coleta)."""
+    tickers = [t.upper().strip() for t in tickers]
+    with _lock:
+        _carregar_do_disco()
+        _atualizar(tickers)
+
+
+def variacao_12m(acao: str) -> Optional[float]:
+    """
+    Variação (%) do primeiro ao último fechamento em [hoje-365d, hoje).
+    Tickers fora do painel são baixados na hora (e passam a fazer parte dele).
+    """
+    acao = acao.upper().strip()
+    with _lock:
+        _carregar_do_disco()
+        _atualizar([acao])
+        painel = _painel
+    j = painel.indice.get(acao)
+    if j is None:
+        return None
+
+    hoje = np.datetime64(date.today(), "D")
+    janela = (painel.datas >= hoje - DIAS_HISTORICO) & (painel.datas < hoje)
+    serie = painel.fechamentos[janela, j]
+    serie = serie[~np.isnan(serie)]
+    if len(serie) < 2 or serie[0] == 0.0:
+        return None
+    return (float(serie[-1]) / float(serie[0]) - 1.0) * 100.0
@@ -0,0 +1,290 @@
+"""
+Limitadores de taxa adaptativos por fonte de coleta.
+
+Cada fonte (Fundamentus, Yahoo, Investidor10 — um host cada) tem o seu próprio
+limitador. Assim, requisições a fontes diferentes podem acontecer ao mesmo
+tempo (Fundamentus do ticker N+1 enquanto o Yahoo atende o ticker N), mas cada
+site recebe no máximo `taxa_max` requisições por segundo.
+
+O limitador combina três mecanismos:
+  - token bucket: `rajada` fichas, repostas a `taxa` fichas/s; cada requisição
+    consome uma (rajada=1 equivale ao antigo time.sleep entre requisições);
+  - AIMD: falha de fonte (429, 5xx, timeout, erro de conexão) corta a taxa
+    pela metade; cada sucesso devolve taxa_max/10, até o teto;
+  - circuit breaker: LIMITE_FALHAS falhas seguidas abrem o circuito e a fonte
+    é recusada (CircuitoAberto) por PAUSA_CIRCUITO segundos — na rotina
+    diária, o resto da execução. Depois disso uma requisição de teste decide
+    se o circuito fecha ou volta a abrir.
+
+Respostas "normais" de erro (ticker inexistente, 404) não contam como falha.
+
+Uso:
+    limitador = obter_limitador("fundamentus")
+    with limitador.requisicao() as estado:  # CircuitoAberto se a fonte caiu
+        ...                                 # chamada HTTP
+        registrar_status(resp.status_code)  # ou registrar_erro(exc)
+    estado  # {"falhou", "status", "erro", "espera"} da requisição (usado na telemetria)
+
+Scrapers que fazem mais (ou menos) de uma requisição por ticker — ex.: o
+Fundamentus em lote, uma tabela para todas as ações — passam pelo limitador
+só nas chamadas HTTP; quem os chama agrega essas requisições com acompanhar().
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+
+# Taxa máxima (requisições/s) por fonte — equivale ao antigo
+# time.sleep(0.5)/time.sleep(1) dos processar_acao.
+TAXAS_PADRAO = {
+    "fundamentus":  2.0,
+    "yahoo":        2.0,
+    "investidor10": 1.0,
+}
+
+LIMITE_FALHAS = int(os.getenv("LIMITADOR_LIMITE_FALHAS", "5"))
+PAUSA_CIRCUITO = float(os.getenv("LIMITADOR_PAUSA_CIRCUITO", "1800"))
+TAXA_MIN = 0.05  # nunca menos que uma requisição a cada 20 s
+
+STATUS_FALHA = {429, 500, 502, 503, 504}
+# Exceções de rede/limitação (requests, curl_cffi e yfinance), reconhecidas pelo nome
+_NOMES_FALHA = ("Timeout", "ConnectionError", "RateLimit", "TooManyRequests")
+
+
+class CircuitoAberto(Exception):
+    """A fonte falhou seguidamente e está sendo pulada."""
+
+
+_local = threading.local()
+
+
+class LimitadorTaxa:
+    """Token bucket thread-safe com AIMD e circuit breaker."""
+
+    def __init__(self, nome: str, taxa_max: float, rajada: int = 1,
+                 limite_falhas: int = LIMITE_FALHAS, pausa_circuito: float = PAUSA_CIRCUITO):
+        self.nome = nome
+        self.taxa_max = taxa_max
+        self.taxa = taxa_max
+        self.rajada = max(1, rajada)
+        self.limite_falhas = limite_falhas
+        self.pausa_circuito = pausa_circuito
+        self._lock = threading.Lock()
+        self._fichas = float(self.rajada)
+        self._reposto_em = time.monotonic()
+        self._falhas_seguidas = 0
+        self._aberto_ate: Optional[float] = None
+        self._sonda: Optional[int] = None  # thread da requisição de teste (meio-aberto)
+        self.requisicoes = 0
+        self.falhas = 0
+        self.recusadas = 0
+        self.tempo_em_requisicao = 0.0
+        self.tempo_em_espera = 0.0
+
+    # ── Circuit breaker ──────────────────────────────────────────────────────
+
+    def circuito_aberto(self) -> bool:
+        with self._lock:
+            return self._aberto_ate is not None and time.monotonic() < self._aberto_ate
+
+    def fechar_circuito(self) -> None:
+        with self._lock:
+            self._aberto_ate = None
+            self._sonda = None
+            self._falhas_seguidas = 0
+            self.taxa = self.taxa_max
+
+    # ── Token bucket ─────────────────────────────────────────────────────────
+
+    def aguardar(self) -> float:
+        """
+        Bloqueia até haver uma ficha desta fonte (CircuitoAberto se a fonte caiu).
+        Retorna os segundos esperados.
+        """
+        espera_total = 0.0
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                if self._aberto_ate is not None:
+                    if agora < self._aberto_ate:
+                        self.recusadas += 1
+                        raise CircuitoAberto(f"{self.nome}: circuito aberto após {self.limite_falhas} falhas seguidas")
+                    # Meio-aberto: só esta thread passa, como teste; a próxima
+                    # falha reabre o circuito
+                    self._aberto_ate = None
+                    self._sonda = threading.get_ident()
+                    self._falhas_seguidas = self.limite_falhas - 1
+                elif self._sonda is not None and self._sonda != threading.get_ident():
+                    self.recusadas += 1
+                    raise CircuitoAberto(f"{self.nome}: circuito meio-aberto, aguardando a requisição de teste")
+                self._fichas = min(self.rajada, self._fichas + (agora - self._reposto_em) * self.taxa)
+                self._reposto_em = agora
+                if self._fichas >= 1.0:
+                    self._fichas -= 1.0
+                    self.tempo_em_espera += espera_total
+                    return espera_total
+                espera = (1.0 - self._fichas) / self.taxa
+            time.sleep(espera)
+            espera_total += espera
+
+    # ── AIMD ─────────────────────────────────────────────────────────────────
+
+    def _registrar_resultado(self, falhou: bool) -> None:
+        with self._lock:
+            if self._sonda == threading.get_ident():
+                self._sonda = None  # teste concluído: fecha (sucesso) ou reabre (falha)
+            if falhou:
+                self.falhas += 1
+                self._falhas_seguidas += 1
+                self.taxa = max(TAXA_MIN, self.taxa / 2.0)
+                if self._falhas_seguidas >= self.limite_falhas and self._aberto_ate is None:
+                    self._aberto_ate = time.monotonic() + self.pausa_circuito
+                    print(f"⚠️ [{self.nome}] {self._falhas_seguidas} falhas seguidas — "
+                          f"circuito aberto por {self.pausa_circuito:.0f}s.")
+            else:
+                self._falhas_seguidas = 0
+                self.taxa = min(self.taxa_max, self.taxa + self.taxa_max / 10.0)
+
+    @contextmanager
+    def requisicao(self):
+        """
+        Aguarda a ficha, executa o bloco e registra o resultado: exceções de
+        rede propagadas, registrar_status() e registrar_erro() dentro do bloco
+        contam como falha da fonte; o resto, como sucesso. Entrega ao bloco o
+        dict {"falhou", "status", "erro", "espera"} preenchido durante a requisição.
+        """
+        espera = self.aguardar()
+        anterior = getattr(_local, "requisicao", None)
+        estado = _local.requisicao = {"falhou": False, "status": None, "erro": None, "espera": espera}
+        t0 = time.perf_counter()
+        try:
+            yield estado
+        except Exception as e:
+            estado["falhou"] = estado["falhou"] or falha_de_fonte(e)
+            estado["erro"] = type(e).__name__
+            raise
+        finally:
+            _local.requisicao = anterior
+            duracao = time.perf_counter() - t0
+            with self._lock:
+                self.requisicoes += 1
+                self.tempo_em_requisicao += duracao
+            self._registrar_resultado(estado["falhou"])
+            _acumular(estado)
+
+    def resetar_estatisticas(self) -> None:
+        with self._lock:
+            self.requisicoes = 0
+            self.falhas = 0
+            self.recusadas = 0
+            self.tempo_em_requisicao = 0.0
+            self.tempo_em_espera = 0.0
+
+    def estatisticas(self) -> Dict:
+        with self._lock:
+            return {
+                "requisicoes": self.requisicoes,
+                "falhas": self.falhas,
+                "recusadas": self.recusadas,
+                "taxa_atual": self.taxa,
+                "circuito_aberto": self._aberto_ate is not None and time.monotonic() < self._aberto_ate,
+                "tempo_em_requisicao": self.tempo_em_requisicao,
+                "tempo_em_espera": self.tempo_em_espera,
+            }
+
+
+# ── Sinalização de falhas (chamada pelos scrapers) ───────────────────────────
+
+def falha_de_fonte(erro: BaseException) -> bool:
+    """True para erros que indicam fonte limitando/fora do ar (não ticker inválido)."""
+    resposta = getattr(erro, "response", None)
+    if getattr(resposta, "status_code", None) in STATUS_FALHA:
+        return True
+    return any(n in cls.__name__ for cls in type(erro).__mro__ for n in _NOMES_FALHA)
+
+
+def registrar_status(status_code: int) -> None:
+    """Status HTTP da requisição em andamento (desta thread); 429/5xx contam como falha."""
+    estado = getattr(_local, "requisicao", None)
+    if estado is not None:
+        estado["status"] = status_code
+        if status_code in STATUS_FALHA:
+            estado["falhou"] = True
+
+
+def registrar_erro(erro: BaseException) -> None:
+    """Erro tratado pelo scraper; conta como falha se for de rede/limitação."""
+    estado = getattr(_local, "requisicao", None)
+    if estado is not None:
+        estado["erro"] = type(erro).__name__
+        if falha_de_fonte(erro):
+            estado["falhou"] = True
+
+
+# ── Agregação das requisições feitas dentro de um scraper ────────────────────
+
+@contextmanager
+def acompanhar():
+    """
+    Agrega as requisições feitas por esta thread dentro do bloco (por scrapers
+    que passam pelo limitador só nas chamadas HTTP). Entrega o dict
+    {"requisicoes", "falhou", "status", "erro", "espera"}: contagem, espera
+    somada e o status/erro mais recente.
+    """
+    anterior = getattr(_local, "acompanhamento", None)
+    resumo = _local.acompanhamento = {
+        "requisicoes": 0, "falhou": False, "status": None, "erro": None, "espera": 0.0,
+    }
+    try:
+        yield resumo
+    finally:
+        _local.acompanhamento = anterior
+
+
+def _acumular(estado: Dict) -> None:
+    resumo = getattr(_local, "acompanhamento", None)
+    if resumo is None:
+        return
+    resumo["requisicoes"] += 1
+    resumo["falhou"] = resumo["falhou"] or estado["falhou"]
+    resumo["espera"] += estado["espera"]
+    for campo in ("status", "erro"):
+        if estado[campo] is not None:
+            resumo[campo] = estado[campo]
+
+
+# ── Registro global (um limitador por fonte, compartilhado entre threads) ────
+
+_limitadores: Dict[str, LimitadorTaxa] = {}
+_registro_lock = threading.Lock()
+
+
+def obter_limitador(nome: str) -> LimitadorTaxa:
+    with _registro_lock:
+        if nome not in _limitadores:
+            _limitadores[nome] = LimitadorTaxa(nome, TAXAS_PADRAO.get(nome, 2.0))
+        return _limitadores[nome]
+
+
+def resetar_estatisticas() -> None:
+    with _registro_lock:
+        limitadores = list(_limitadores.values())
+    for limitador in limitadores:
+        limitador.resetar_estatisticas()
+
+
+def fechar_circuitos() -> None:
+    """Fecha todos os circuitos e restaura as taxas (início de uma nova execução)."""
+    with _registro_lock:
+        limitadores = list(_limitadores.values())
+    for limitador in limitadores:
+        limitador.fechar_circuito()
+
+
+def estatisticas() -> Dict[str, Dict]:
+    with _registro_lock:
+        limitadores = dict(_limitadores)
+    return {nome: lim.estatisticas() for nome, lim in limitadores.items()}
@@ -0,0 +1,167 @@
+"""
+Histórico diário de preços (OHLC) por ação na tabela precos_diarios.
+
+indicadores_fundamentalistas só tem a cotação do dia da coleta, e lacunas de
+coleta (ex: set/2025 → abr/2026, ver CONTEXT.md) deixam datas sem preço. A
+tabela precos_diarios guarda um pregão por linha, (acao, data), baixado do
+Yahoo em lote:
+
+  - ações sem histórico: ANOS_INICIAIS anos de pregões;
+  - demais: só os pregões depois do último já gravado (sincronização
+    incremental); ações com a mesma data de início são baixadas juntas em
+    yf.download multi-ticker de LOTE_DOWNLOAD ações.
+
+Os preços são os negociados (auto_adjust=False), comparáveis à coluna cotacao;
+fechamento_ajustado é o valor ajustado informado pelo Yahoo no dia do download.
+
+Execução standalone:
+    python src/data/precos_diarios.py            # sincroniza as ações de indicadores_fundamentalistas
+    python src/data/precos_diarios.py PETR4 VALE3
+"""
+
+import sys
+from pathlib import Path
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Iterable, List, Optional
+
+import pandas as pd
+import yfinance as yf
+
+from src.core.db_connection import conexao
+from src.core.gravador_lote import GravadorLote
+from src.data.historico_precos import LOTE_DOWNLOAD
+
+TABELA = "precos_diarios"
+ANOS_INICIAIS = 3
+
+_COLUNAS_YF = {
+    "Open": "abertura",
+    "High": "maxima",
+    "Low": "minima",
+    "Close": "fechamento",
+    "Adj Close": "fechamento_ajustado",
+    "Volume": "volume",
+}
+COLUNAS = ["acao", "data"] + list(_COLUNAS_YF.values())
+
+
+def _baixar_ohlc(tickers: List[str], inicio: date, fim: date) -> pd.DataFrame:
+    """Pregões em [inicio, fim) no formato longo (uma linha por acao, data)."""
+    partes = []
+    for i in range(0, len(tickers), LOTE_DOWNLOAD):
+        lote = tickers[i:i + LOTE_DOWNLOAD]
+        try:
+            bruto = yf.download(
+                [t + ".SA" for t in lote],
+                start=inicio.isoformat(),
+                end=fim.isoformat(),
+                auto_adjust=False,
+                actions=False,
+                progress=False,
+                threads=True,
+            )
+        except Exception as e:
+            print(f"⚠️ yf.download falhou para {len(lote)} ticker(s): {e}")
+            continue
+        if bruto is None or bruto.empty:
+            continue
+        if not isinstance(bruto.columns, pd.MultiIndex):
+            bruto.columns = pd.MultiIndex.from_product([bruto.columns, [lote[0] + ".SA"]])
+        longo = bruto.stack(level=1, future_stack=True)
+        longo.index.names = ["data", "acao"]
+        longo = longo.reset_index().rename(columns=_COLUNAS_YF)
+        partes.append(longo.dropna(subset=["fechamento"]))
+
+    if not partes:
+        return pd.DataFrame(columns=COLUNAS)
+    df = pd.concat(partes, ignore_index=True)
+    df["acao"] = df["acao"].astype(str).str.removesuffix(".SA")
+    df["data"] = pd.to_datetime(df["data"]).dt.tz_localize(None).dt.date
+    for col in COLUNAS:
+        if col not in df.columns:
+            df[col] = None
+    return df[COLUNAS]
+
+
+def _ultimas_datas(tickers: Optional[Iterable[str]]) -> dict:
+    """{acao: última data gravada ou None} — padrão: ações de indicadores_fundamentalistas."""
+    with conexao() as conn, conn.cursor() as cur:
+        if tickers is None:
+            cur.execute("SELECT DISTINCT acao FROM indicadores_fundamentalistas")
+            tickers = [r[0] for r in cur.fetchall()]
+        tickers = sorted({t.upper().strip() for t in tickers})
+        cur.execute(
+            f"SELECT acao, MAX(data) FROM {TABELA} WHERE acao = ANY(%s) GROUP BY acao",
+            (tickers,),
+        )
+        ultimas = dict(cur.fetchall())
+    return {t: ultimas.get(t) for t in tickers}
+
+
+def sincronizar_precos_diarios(tickers: Optional[Iterable[str]] = None,
+                               anos_iniciais: int = ANOS_INICIAIS) -> int:
+    """
+    Baixa os pregões que faltam em precos_diarios (até ontem) e grava em lote.
+    Retorna o número de linhas gravadas.
+    """
+    t0 = time.perf_counter()
+    try:
+        ultimas = _ultimas_datas(tickers)
+    except Exception as e:
+        print(f"❌ Erro ao consultar {TABELA}: {e}")
+        return 0
+
+    hoje = date.today()
+    inicio_padrao = hoje - timedelta(days=365 * anos_iniciais)
+    por_inicio = defaultdict(list)
+    for acao, ultima in ultimas.items():
+        inicio = ultima + timedelta(days=1) if ultima else inicio_padrao
+        if inicio < hoje:
+            por_inicio[inicio].append(acao)
+
+    gravador = GravadorLote(TABELA, chave=("acao", "data"), colunas=COLUNAS,
+                            tamanho_lote=20000, intervalo_flush=float("inf"))
+    with gravador:
+        for inicio, acoes in sorted(por_inicio.items()):
+            df = _baixar_ohlc(acoes, inicio, hoje)
+            df["volume"] = [int(v) if pd.notna(v) else None for v in df["volume"]]
+            gravador.adicionar_varias(df.to_dict("records"))
+
+    print(
+        f"✅ {TABELA}: {gravador.linhas_gravadas} pregão(ões) gravado(s); "
+        f"{sum(len(a) for a in por_inicio.values())}/{len(ultimas)} ação(ões) desatualizada(s) "
+        f"em {len(por_inicio)} grupo(s) de data ({time.perf_counter() - t0:.1f}s)."
+    )
+    return gravador.linhas_gravadas
+
+
+def carregar_precos_diarios(tickers: Optional[Iterable[str]] = None,
+                            inicio: Optional[date] = None) -> pd.DataFrame:
+    """acao, data (datetime64) e fechamento de precos_diarios, ordenado por (acao, data)."""
+    filtros, params = [], {}
+    if tickers is not None:
+        filtros.append("acao = ANY(%(tickers)s)")
+        params["tickers"] = sorted({t.upper().strip() for t in tickers})
+    if inicio is not None:
+        filtros.append("data >= %(inicio)s")
+        params["inicio"] = inicio
+    where = f"WHERE {' AND '.join(filtros)}" if filtros else ""
+    with conexao() as conn:
+        df = pd.read_sql_query(
+            f"SELECT acao, data, fechamento FROM {TABELA} {where} ORDER BY acao, data",
+            conn, params=params,
+        )
+    df["data"] = pd.to_datetime(df["data"])
+    df["fechamento"] = pd.to_numeric(df["fechamento"], errors="coerce")
+    return df
+
+
+if __name__ == "__main__":
+    sincronizar_precos_diarios(sys.argv[1:] or None)
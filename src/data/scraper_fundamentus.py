@@ -1,10 +1,11 @@
 import atexit
 import os
 import sys
+import threading
 import time
 from pathlib import Path
-from datetime import date, datetime, timedelta
-from typing import Union, Tuple, Dict
+from datetime import date, datetime
+from typing import Union, Tuple, Dict, Optional
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 _PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
@@ -12,8 +13,9 @@ if str(_PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(_PROJECT_ROOT))
 
 import fundamentus
-import yfinance as yf
 from src.core.db_connection import get_connection
+from src.core.gravador_lote import GravadorLote, gravador_indicadores
+from src.data import historico_precos, limitador_taxa
 
 
 def _limpar_cache_fundamentus():
@@ -65,6 +67,42 @@ COLUNAS_OBRIGATORIAS = ['Ativo', 'Patrim_Liq', 'Lucro_Liquido_12m']
 # Colunas ausentes em bancos/financeiras (estrutura contábil diferente)
 COLUNAS_NAO_BANCOS = ['Div_Liquida', 'EBIT_12m']
 
+# ── Modo em lote: get_resultado (uma tabela com todas as ações) ───────────────
+# Coluna do get_resultado equivalente a cada coluna do get_papel em MAPA_DIRETO.
+# Os valores já chegam numéricos; percentuais como fração (0.066 = 6.6%).
+# Sem equivalente: Marg_Bruta, LPA, VPA, Giro_Ativos (os três últimos são derivados).
+_RESULTADO_PARA_PAPEL = {
+    'Cotacao':        'cotacao',
+    'PL':             'pl',
+    'PVP':            'pvp',
+    'PSR':            'psr',
+    'Div_Yield':      'dy',
+    'PAtivos':        'pa',
+    'PCap_Giro':      'pcg',
+    'PEBIT':          'pebit',
+    'PAtiv_Circ_Liq': 'pacl',
+    'EV_EBIT':        'evebit',
+    'EV_EBITDA':      'evebitda',
+    'Marg_EBIT':      'mrgebit',
+    'Marg_Liquida':   'mrgliq',
+    'Liquidez_Corr':  'liqc',
+    'ROIC':           'roic',
+    'ROE':            'roe',
+    'Div_Br_Patrim':  'divbpatr',
+}
+
+MODO_PADRAO = os.getenv("FUNDAMENTUS_MODO", "lote").strip().lower()
+TTL_RESULTADO = 3600.0   # segundos até baixar o get_resultado de novo (ou tentar de novo após falha)
+
+# As requisições HTTP (get_resultado/get_papel) passam pelo limitador "fundamentus"
+# aqui dentro: no modo lote, a maioria dos tickers é só uma consulta à tabela em memória.
+LIMITADOR_PROPRIO = True
+
+_resultado = None
+_resultado_em = 0.0
+_resultado_falhou_em: Optional[float] = None
+_resultado_lock = threading.Lock()
+
 
 # ── Helpers ───────────────────────────────────────────────────────────────────
 
@@ -98,45 +136,20 @@ def _safe_div(a, b) -> Union[float, None]:
 
 def _variacao_12m(acao: str) -> Union[float, None]:
     """
-    Calcula variação de preço nos últimos 12 meses via yfinance.
-    Retorna percentual (ex: 23.5 para +23.5%) ou None em qualquer falha.
+    Variação de preço (%) nos últimos 12 meses, do painel de preços baixado
+    em lote (src/data/historico_precos.py). None se não houver histórico.
     """
-    try:
-        t = yf.Ticker(acao + '.SA')
-        hist = t.history(
-            start=(datetime.today() - timedelta(days=365)).strftime('%Y-%m-%d'),
-            end=datetime.today().strftime('%Y-%m-%d'),
-        )
-        if hist.empty or len(hist) < 2:
-            return None
-        first = float(hist['Close'].iloc[0])
-        if first == 0.0:
-            return None
-        return (float(hist['Close'].iloc[-1]) / first - 1.0) * 100.0
-    except Exception:
-        return None
+    return historico_precos.variacao_12m(acao)
 
 
-# ── Funções públicas ──────────────────────────────────────────────────────────
-
-def coletar_indicadores(acao: str) -> Union[Tuple[Dict, str], str]:
-    """
-    Coleta indicadores fundamentalistas via biblioteca fundamentus.
-
-    Retorna:
-        (dados_dict, log_string)  — em caso de sucesso
-        error_string              — em caso de falha
-
-    Contrato idêntico ao scraper_investidor10.py.
-    Campos sem equivalente no fundamentus (margem_ebitda, p_ebitda, payout)
-    são gravados como None.
-    """
-    acao = acao.upper().strip()
-
-    try:
-        df = fundamentus.get_papel(acao)
-    except Exception as e:
-        return f"❌ {acao} - fundamentus erro: {e}"
+def _coletar_papel(acao: str) -> Union[Dict, str]:
+    """Indicadores de um ticker via get_papel (uma página por ação)."""
+    with limitador_taxa.obter_limitador("fundamentus").requisicao():
+        try:
+            df = fundamentus.get_papel(acao)
+        except Exception as e:
+            limitador_taxa.registrar_erro(e)
+            return f"❌ {acao} - fundamentus erro: {e}"
 
     if df is None or df.empty:
         return f"❌ {acao} - ticker não encontrado no fundamentus"
@@ -155,11 +168,6 @@ def coletar_indicadores(acao: str) -> Union[Tuple[Dict, str], str]:
     for fnd_col, mode, db_col in MAPA_DIRETO:
         dados[db_col] = _parse_valor(df[fnd_col].iloc[0], mode)
 
-    # Campos não disponíveis no fundamentus → NULL
-    dados['margem_ebitda'] = None   # D&A indisponível
-    dados['p_ebitda']      = None   # EBITDA indisponível
-    dados['payout']        = None   # dividendos por ação indisponível
-
     # Valores financeiros brutos para cálculos
     ativo         = _parse_valor(df['Ativo'].iloc[0],             'fin')
     patrim_liq    = _parse_valor(df['Patrim_Liq'].iloc[0],        'fin')
@@ -183,6 +191,128 @@ def coletar_indicadores(acao: str) -> Union[Tuple[Dict, str], str]:
     dados['patrimonio_ativos'] = _safe_div(patrim_liq, ativo)
     passivo = (ativo - patrim_liq) if (ativo is not None and patrim_liq is not None) else None
     dados['passivos_ativos']   = _safe_div(passivo, ativo)
+    return dados
+
+
+def _resultado_do_dia():
+    """
+    Tabela do get_resultado (todas as ações), baixada no máximo uma vez por
+    TTL_RESULTADO. Depois de uma falha, devolve None (modo papel) até o fim
+    do TTL_RESULTADO, sem repetir o download a cada ticker.
+    """
+    global _resultado, _resultado_em, _resultado_falhou_em
+    with _resultado_lock:
+        agora = time.monotonic()
+        if _resultado is not None and agora - _resultado_em <= TTL_RESULTADO:
+            return _resultado
+        if _resultado_falhou_em is not None and agora - _resultado_falhou_em <= TTL_RESULTADO:
+            return None
+        try:
+            with limitador_taxa.obter_limitador("fundamentus").requisicao():
+                df = fundamentus.get_resultado()
+        except limitador_taxa.CircuitoAberto:
+            raise
+        except Exception:
+            _resultado_falhou_em = time.monotonic()
+            raise
+        _resultado = df[~df.index.duplicated(keep='first')]
+        _resultado_em = time.monotonic()
+        _resultado_falhou_em = None
+        print(f"📥 Fundamentus: get_resultado com {len(_resultado)} ações.")
+        return _resultado
+
+
+def _coletar_resultado(acao: str) -> Optional[Dict]:
+    """
+    Indicadores de um ticker a partir do get_resultado (None se a ação não
+    estiver na tabela). Os campos que dependem de Ativo, Patrim_Liq,
+    Lucro_Liquido_12m, Div_Liquida e EBIT_12m são derivados das razões:
+        vpa = cotacao / pvp                  lpa = cotacao / pl
+        patrimonio_ativos = p_ativo / pvp    roa = roe * patrimonio_ativos
+        giro_ativos = p_ativo / psr          div_liq_ebit = ev_ebit - p_ebit
+        div_liq_patrimonio = div_liq_ebit * pvp / p_ebit
+    margem_bruta não existe no resultado e fica None (o orquestrador completa).
+    """
+    df = _resultado_do_dia()
+    if df is None or acao not in df.index:
+        return None
+    linha = df.loc[acao]
+
+    dados: Dict = {'acao': acao}
+    for fnd_col, mode, db_col in MAPA_DIRETO:
+        col = _RESULTADO_PARA_PAPEL.get(fnd_col)
+        valor = _parse_valor(linha[col], 'direct') if col is not None else None
+        if valor is not None and mode == 'pct':
+            valor *= 100.0   # get_resultado traz percentuais como fração
+        dados[db_col] = valor
+
+    cotacao, pl, pvp = dados['cotacao'], dados['pl'], dados['pvp']
+    p_ativo, psr, p_ebit, ev_ebit = dados['p_ativo'], dados['psr'], dados['p_ebit'], dados['ev_ebit']
+
+    dados['vpa'] = _safe_div(cotacao, pvp)
+    dados['lpa'] = _safe_div(cotacao, pl)
+    dados['giro_ativos'] = _safe_div(p_ativo, psr)
+
+    patrimonio_ativos = _safe_div(p_ativo, pvp)
+    dados['patrimonio_ativos'] = patrimonio_ativos
+    dados['passivos_ativos'] = 1.0 - patrimonio_ativos if patrimonio_ativos is not None else None
+    dados['roa'] = (
+        dados['roe'] * patrimonio_ativos
+        if dados['roe'] is not None and patrimonio_ativos is not None else None
+    )
+
+    # Bancos: EV/EBIT e P/EBIT zerados no resultado → alavancagem NULL, como no get_papel
+    eh_banco = not ev_ebit or not p_ebit
+    div_liq_ebit = None if eh_banco else ev_ebit - p_ebit
+    dados['div_liq_ebit'] = div_liq_ebit
+    dados['div_liq_ebitda'] = _safe_div(div_liq_ebit, 1.15)
+    dados['div_liq_patrimonio'] = (
+        _safe_div(div_liq_ebit * pvp, p_ebit) if div_liq_ebit is not None and pvp is not None else None
+    )
+    return dados
+
+
+# ── Funções públicas ──────────────────────────────────────────────────────────
+
+def coletar_indicadores(acao: str, modo: Optional[str] = None) -> Union[Tuple[Dict, str], str]:
+    """
+    Coleta indicadores fundamentalistas via biblioteca fundamentus.
+
+    Retorna:
+        (dados_dict, log_string)  — em caso de sucesso
+        error_string              — em caso de falha
+
+    Contrato idêntico ao scraper_investidor10.py.
+    Campos sem equivalente no fundamentus (margem_ebitda, p_ebitda, payout)
+    são gravados como None.
+
+    modo (padrão: FUNDAMENTUS_MODO do .env, "lote"):
+        "lote"  — get_resultado, uma requisição para todas as ações do dia;
+                  get_papel só para ações fora da tabela;
+        "papel" — get_papel por ação (inclui margem_bruta e valores exatos
+                  de Ativo/Patrimônio/Lucro/Dívida).
+    """
+    acao = acao.upper().strip()
+    modo = modo or MODO_PADRAO
+
+    dados = None
+    if modo == 'lote':
+        try:
+            dados = _coletar_resultado(acao)
+        except limitador_taxa.CircuitoAberto:
+            raise
+        except Exception as e:
+            print(f"  ⚠ [fundamentus] get_resultado falhou ({e}); usando get_papel "
+                  f"pelas próximas {TTL_RESULTADO / 60:.0f} min.")
+    if dados is None:
+        dados = _coletar_papel(acao)
+        if isinstance(dados, str):
+            return dados
+
+    # Campos não disponíveis no fundamentus → NULL
+    dados['margem_ebitda'] = None   # D&A indisponível
+    dados['p_ebitda']      = None   # EBITDA indisponível
+    dados['payout']        = None   # dividendos por ação indisponível
 
     # Variação 12 meses via yfinance
     dados['variacao_12m'] = _variacao_12m(acao)
@@ -196,12 +326,17 @@ def coletar_indicadores(acao: str) -> Union[Tuple[Dict, str], str]:
     return dados, log_final
 
 
-def salvar_no_banco(dados: Dict) -> None:
+def salvar_no_banco(dados: Dict, gravador: Optional[GravadorLote] = None) -> None:
     """
     Insere ou atualiza os indicadores na tabela indicadores_fundamentalistas.
     ON CONFLICT (acao, data_coleta) → UPDATE de todas as colunas numéricas.
+    Com `gravador`, a linha é apenas enfileirada para o próximo flush em lote.
     """
     dados["data_coleta"] = date.today()
+    dados["atualizado_em"] = datetime.now()
+    if gravador is not None:
+        gravador.adicionar(dados)
+        return
 
     colunas      = ", ".join(dados.keys())
     placeholders = ", ".join(["%s"] * len(dados))
@@ -228,16 +363,19 @@ def salvar_no_banco(dados: Dict) -> None:
         print("❌ Erro ao inserir no banco:", e)
 
 
-def processar_acao(acao: str) -> None:
-    """Worker: coleta, loga e salva um ticker. Inclui sleep para rate limiting."""
-    resultado = coletar_indicadores(acao)
+def processar_acao(acao: str, gravador: Optional[GravadorLote] = None) -> None:
+    """Worker: coleta, loga e salva um ticker (ritmo controlado pelo limitador da fonte)."""
+    try:
+        resultado = coletar_indicadores(acao)
+    except limitador_taxa.CircuitoAberto as e:
+        print(f"⏭️ {acao} - {e}")
+        return
     if isinstance(resultado, tuple):
         dados, log = resultado
         print(log)
-        salvar_no_banco(dados)
+        salvar_no_banco(dados, gravador)
     else:
         print(resultado)  # string de erro
-    time.sleep(1)
 
 
 def main() -> None:
@@ -262,9 +400,10 @@ def main() -> None:
     ]
 
     print(f"\n🚀 Iniciando coleta via fundamentus (4 threads)...\n")
+    historico_precos.preparar(acoes)
 
-    with ThreadPoolExecutor(max_workers=4) as executor:
-        futures = [executor.submit(processar_acao, acao) for acao in acoes]
+    with gravador_indicadores() as gravador, ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(processar_acao, acao, gravador) for acao in acoes]
         for future in as_completed(futures):
             try:
                 future.result()
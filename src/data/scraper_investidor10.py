@@ -6,31 +6,125 @@ _PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
 if str(_PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(_PROJECT_ROOT))
 
+import threading
 import requests
-from bs4 import BeautifulSoup
-from datetime import date
+from bs4 import BeautifulSoup, SoupStrainer
+from datetime import date, datetime
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from src.core.db_connection import get_connection
+from src.core.gravador_lote import gravador_indicadores
+from src.data import limitador_taxa
+
+# lxml monta a árvore bem mais rápido que o html.parser puro do Python;
+# sem ele instalado, o BeautifulSoup continua funcionando com o parser padrão.
+try:
+    import lxml  # noqa: F401
+    PARSER_HTML = "lxml"
+except ImportError:
+    PARSER_HTML = "html.parser"
+
+URL_ACAO = "https://investidor10.com.br/acoes/{}/"
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36"
+}
+TIMEOUT = (5, 30)  # (conexão, leitura) em segundos
+
+# Mapa de indicadores: nome na página → nome da coluna no dicionário
+INDICADORES_MAP = {
+    "P/L": "pl",
+    "P/RECEITA (PSR)": "psr",
+    "P/VP": "pvp",
+    "DIVIDEND YIELD": "dividend_yield",
+    "PAYOUT": "payout",
+    "MARGEM LÍQUIDA": "margem_liquida",
+    "MARGEM BRUTA": "margem_bruta",
+    "MARGEM EBIT": "margem_ebit",
+    "MARGEM EBITDA": "margem_ebitda",
+    "EV/EBITDA": "ev_ebitda",
+    "EV/EBIT": "ev_ebit",
+    "P/EBITDA": "p_ebitda",
+    "P/EBIT": "p_ebit",
+    "P/ATIVO": "p_ativo",
+    "P/CAP.GIRO": "p_cap_giro",
+    "P/ATIVO CIRC LIQ": "p_ativo_circ_liq",
+    "VPA": "vpa",
+    "LPA": "lpa",
+    "GIRO ATIVOS": "giro_ativos",
+    "ROE": "roe",
+    "ROIC": "roic",
+    "ROA": "roa",
+    "DÍVIDA LÍQUIDA / PATRIMÔNIO": "div_liq_patrimonio",
+    "DÍVIDA LÍQUIDA / EBITDA": "div_liq_ebitda",
+    "DÍVIDA LÍQUIDA / EBIT": "div_liq_ebit",
+    "DÍVIDA BRUTA / PATRIMÔNIO": "div_bruta_patrimonio",
+    "PATRIMÔNIO / ATIVOS": "patrimonio_ativos",
+    "PASSIVOS / ATIVOS": "passivos_ativos",
+    "LIQUIDEZ CORRENTE": "liquidez_corrente"
+}
 
 # ETAPA 1: FUNÇÕES PARA EXTRAIR INDICADORES E DADOS DA PÁGINA
 
-def get_valor_indicador(soup, nome_indicador):
-    """
-    Extrai valores numéricos de indicadores (ex.: P/L, ROE etc.) a partir
-    de <span> que contenham o nome do indicador. 
-    """
-    spans = soup.find_all('span')
-    for span in spans:
-        if nome_indicador.upper() in span.get_text(strip=True).upper():
-            parent = span.find_parent('div', class_='cell')
-            if parent:
-                valor_span = parent.find('div', class_='value').find('span')
-                if valor_span:
-                    texto = valor_span.text.strip().replace('%', '').replace('.', '').replace(',', '.')
-                    try:
-                        return float(texto)
-                    except ValueError:
-                        return None
+def _div_relevante(nome, attrs):
+    """Filtro do parser: só monta os <div> de indicadores (cell) e os cards (_card)."""
+    if nome != "div":
+        return False
+    classes = attrs.get("class") or ""
+    if isinstance(classes, list):
+        classes = " ".join(classes)
+    return "cell" in classes.split() or "_card" in classes.split()
+
+
+# A página tem ~500 KB (scripts, gráficos, notícias); só os indicadores e os
+# cards de cotação/variação interessam, então o resto nem vira objeto Python.
+_CONTEUDO_RELEVANTE = SoupStrainer(_div_relevante)
+
+
+def parsear_html(html):
+    """BeautifulSoup só com as partes da página usadas pelos extratores."""
+    return BeautifulSoup(html, PARSER_HTML, parse_only=_CONTEUDO_RELEVANTE)
+
+
+def _para_float(texto):
+    texto = texto.strip().replace('%', '').replace('.', '').replace(',', '.')
+    try:
+        return float(texto)
+    except ValueError:
+        return None
+
+
+def indexar_indicadores(soup):
+    """
+    Percorre uma única vez os <div class="cell"> da página e devolve
+    {RÓTULO: valor}, na ordem em que aparecem (primeira ocorrência vence).
+    """
+    indice = {}
+    for cell in soup.select("div.cell"):
+        valor_div = cell.find("div", class_="value")
+        rotulo_span = cell.find("span")
+        if valor_div is None or rotulo_span is None or any(p is valor_div for p in rotulo_span.parents):
+            continue
+        valor_span = valor_div.find("span")
+        if valor_span is None:
+            continue
+        rotulo = " ".join(rotulo_span.get_text(" ", strip=True).upper().split())
+        indice.setdefault(rotulo, _para_float(valor_span.text))
+    return indice
+
+
+def get_valor_indicador(indice, nome_indicador):
+    """
+    Valor numérico de um indicador (ex.: P/L, ROE) no índice montado por
+    indexar_indicadores (também aceita o soup, como antes). O rótulo igual ao
+    nome tem prioridade; senão vale o primeiro rótulo que contém o nome.
+    """
+    if not isinstance(indice, dict):
+        indice = indexar_indicadores(indice)
+    nome = " ".join(nome_indicador.upper().split())
+    if nome in indice:
+        return indice[nome]
+    for rotulo, valor in indice.items():
+        if nome in rotulo:
+            return valor
     return None
 
 def get_cotacao(soup):
@@ -59,67 +153,51 @@ def get_variacao_12m(soup):
         print(f"❌ Erro ao extrair variação 12M: {e}")
         return None
 
+def extrair_dados(html, acao):
+    """
+    Extrai do HTML da página da ação todos os indicadores mapeados,
+    a cotação e a variação 12M (sem rede — usado também pelo benchmark).
+    """
+    soup = parsear_html(html)
+    indice = indexar_indicadores(soup)
+
+    dados = {"acao": acao}
+    for nome_site, nome_coluna in INDICADORES_MAP.items():
+        dados[nome_coluna] = get_valor_indicador(indice, nome_site)
+
+    dados["cotacao"] = get_cotacao(soup)
+    dados["variacao_12m"] = get_variacao_12m(soup)
+    return dados
+
+
+# Uma sessão por thread: reaproveita a conexão TLS (keep-alive) entre as
+# páginas coletadas pela mesma thread, sem compartilhar o Session entre threads.
+_local = threading.local()
+
+
+def _sessao():
+    sessao = getattr(_local, "sessao", None)
+    if sessao is None:
+        sessao = requests.Session()
+        sessao.headers.update(HEADERS)
+        _local.sessao = sessao
+    return sessao
+
 def coletar_indicadores(acao):
     """
     Faz requisição ao site, extrai todos os indicadores mapeados,
     além da cotação e variação 12M. Retorna um dicionário com os
     dados e uma string de log formatado.
     """
-    url = f"https://investidor10.com.br/acoes/{acao.lower()}/"
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36"
-    }
+    url = URL_ACAO.format(acao.lower())
 
     try:
-        resp = requests.get(url, headers=headers)
+        resp = _sessao().get(url, timeout=TIMEOUT)
+        limitador_taxa.registrar_status(resp.status_code)
         if resp.status_code != 200:
             return f"❌ {acao} - erro ao acessar site (status {resp.status_code})"
 
-        soup = BeautifulSoup(resp.text, "html.parser")
-
-        # Mapa de indicadores: nome na página → nome da coluna no dicionário
-        indicadores_map = {
-            "P/L": "pl",
-            "P/RECEITA (PSR)": "psr",
-            "P/VP": "pvp",
-            "DIVIDEND YIELD": "dividend_yield",
-            "PAYOUT": "payout",
-            "MARGEM LÍQUIDA": "margem_liquida",
-            "MARGEM BRUTA": "margem_bruta",
-            "MARGEM EBIT": "margem_ebit",
-            "MARGEM EBITDA": "margem_ebitda",
-            "EV/EBITDA": "ev_ebitda",
-            "EV/EBIT": "ev_ebit",
-            "P/EBITDA": "p_ebitda",
-            "P/EBIT": "p_ebit",
-            "P/ATIVO": "p_ativo",
-            "P/CAP.GIRO": "p_cap_giro",
-            "P/ATIVO CIRC LIQ": "p_ativo_circ_liq",
-            "VPA": "vpa",
-            "LPA": "lpa",
-            "GIRO ATIVOS": "giro_ativos",
-            "ROE": "roe",
-            "ROIC": "roic",
-            "ROA": "roa",
-            "DÍVIDA LÍQUIDA / PATRIMÔNIO": "div_liq_patrimonio",
-            "DÍVIDA LÍQUIDA / EBITDA": "div_liq_ebitda",
-            "DÍVIDA LÍQUIDA / EBIT": "div_liq_ebit",
-            "DÍVIDA BRUTA / PATRIMÔNIO": "div_bruta_patrimonio",
-            "PATRIMÔNIO / ATIVOS": "patrimonio_ativos",
-            "PASSIVOS / ATIVOS": "passivos_ativos",
-            "LIQUIDEZ CORRENTE": "liquidez_corrente"
-        }
-
-        # Cria dicionário base
-        dados = {"acao": acao}
-
-        # Extrai todos os indicadores mapeados
-        for nome_site, nome_coluna in indicadores_map.items():
-            dados[nome_coluna] = get_valor_indicador(soup, nome_site)
-
-        # Extrai cotação e variação
-        dados["cotacao"] = get_cotacao(soup)
-        dados["variacao_12m"] = get_variacao_12m(soup)
+        dados = extrair_dados(resp.text, acao)
 
         # Monta um log organizado para exibição
         linhas = [f"\n📊 Dados coletados: {acao}"]
@@ -130,16 +208,22 @@ def coletar_indicadores(acao):
         return dados, log_final
 
     except Exception as e:
+        limitador_taxa.registrar_erro(e)
         return f"❌ {acao} - erro inesperado: {e}"
 
 # ETAPA 2: SALVAR NO BANCO DE DADOS
 
-def salvar_no_banco(dados):
+def salvar_no_banco(dados, gravador=None):
     """
     Insere (ou atualiza via ON CONFLICT) os dados extraídos na tabela
     indicadores_fundamentalistas, adicionando a data de coleta.
+    Se um GravadorLote for passado, a linha é enfileirada para gravação em lote.
     """
     dados["data_coleta"] = date.today()
+    dados["atualizado_em"] = datetime.now()
+    if gravador is not None:
+        gravador.adicionar(dados)
+        return
 
     colunas = ", ".join(dados.keys())
     placeholders = ", ".join(["%s"] * len(dados))
@@ -169,17 +253,23 @@ def salvar_no_banco(dados):
 
 # ETAPA 3: LÓGICA PARA PROCESSAR CADA AÇÃO E RODAR EM PARALELO
 
-def processar_acao(acao):
+def processar_acao(acao, gravador=None):
     """
     Função que coleta os indicadores da ação, mostra o log,
-    e salva no banco.
+    e salva no banco (ou no GravadorLote, se fornecido).
+    O ritmo de requisições é controlado pelo limitador da fonte.
     """
-    resultado = coletar_indicadores(acao)
+    try:
+        with limitador_taxa.obter_limitador("investidor10").requisicao():
+            resultado = coletar_indicadores(acao)
+    except limitador_taxa.CircuitoAberto as e:
+        print(f"⏭️ {acao} - {e}")
+        return
     # Se for uma tuple, veio (dados, log). Se for string, é erro.
     if isinstance(resultado, tuple):
         dados, log = resultado
         print(log)
-        salvar_no_banco(dados)
+        salvar_no_banco(dados, gravador)
     else:
         print(resultado)  # mensagem de erro como string
 
@@ -212,8 +302,8 @@ def main():
     max_workers = max(1, os.cpu_count() - 1)
     print(f"\n🚀 Iniciando scraping paralelo com {max_workers} threads...\n")
 
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = [executor.submit(processar_acao, acao) for acao in acoes]
+    with gravador_indicadores() as gravador, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(processar_acao, acao, gravador) for acao in acoes]
         for future in as_completed(futures):
             try:
                 future.result()
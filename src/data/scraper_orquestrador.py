@@ -9,16 +9,31 @@ Ordem de preferência (fallback em cascata):
 Para cada campo, o primeiro valor não-None encontrado na ordem acima é mantido.
 O resultado final é salvo UMA vez no banco (evita duplicatas).
 
+Na rotina diária, uma fonte é pulada quando todas as colunas que ela já
+devolveu para o ticker estão preenchidas pelas fontes anteriores (mapa de
+disponibilidade, src/data/disponibilidade_campos.py) — ex.: Yahoo e
+Investidor10 para bancos, que nunca têm p_ebitda/margem_ebitda.
+
+Os tickers são processados em paralelo (ThreadPoolExecutor), mas cada fonte
+tem o seu próprio limitador de taxa (src/data/limitador_taxa.py): enquanto o
+Fundamentus atende o ticker N+1, o Yahoo pode estar atendendo o ticker N, e
+nenhum site recebe mais requisições do que recebia no modo sequencial. Uma
+fonte que começa a limitar (429/5xx/timeout) tem a taxa reduzida e, depois de
+várias falhas seguidas, é pulada pelo resto da execução (circuit breaker).
+
 Execução standalone:
     python src/data/scraper_orquestrador.py
+    python src/data/scraper_orquestrador.py --benchmark --limite 30
 """
 
+import argparse
 import os
 import sys
 import time
 from pathlib import Path
-from datetime import date
+from datetime import date, datetime
 from typing import Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
 _PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
 if str(_PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(_PROJECT_ROOT))
@@ -27,6 +42,10 @@ import src.data.scraper_fundamentus  as s_fund
 import src.data.scraper_yahoo        as s_yahoo
 import src.data.scraper_investidor10 as s_inv10
 from src.core.db_connection import get_connection
+from src.core.gravador_lote import GravadorLote, gravador_indicadores
+from src.models import feature_store
+from src.data import cache_coleta, historico_precos, limitador_taxa, precos_diarios, telemetria_coleta
+from src.data.disponibilidade_campos import MapaDisponibilidade
 
 
 # ── Todas as colunas numéricas da tabela ─────────────────────────────────────
@@ -44,15 +63,61 @@ COLUNAS_INDICADORES = [
 
 # ── Helpers ───────────────────────────────────────────────────────────────────
 
-def _coletar_fonte(scraper_module, acao: str) -> Optional[Dict]:
-    """Chama coletar_indicadores de um scraper e retorna o dict ou None."""
+def _coletar_fonte(scraper_module, acao: str, nome: Optional[str] = None,
+                   usar_cache: bool = True) -> Optional[Dict]:
+    """
+    Chama coletar_indicadores de um scraper e retorna o dict ou None.
+    A chamada passa pelo limitador de taxa da fonte `nome` (com o circuito
+    aberto, a fonte é pulada na hora) — ou, em scrapers com LIMITADOR_PROPRIO,
+    só as requisições HTTP que o scraper de fato faz; resultados recentes de
+    (acao, fonte) vêm do cache de coleta (src/data/cache_coleta.py), exceto
+    com usar_cache=False. Cada chamada é registrada na telemetria
+    (src/data/telemetria_coleta.py).
+    """
+    nome = nome or scraper_module.__name__.split('.')[-1]
+    chamada: Dict = {}
+
+    def _buscar():
+        t_espera = time.perf_counter()
+        if getattr(scraper_module, "LIMITADOR_PROPRIO", False):
+            with limitador_taxa.acompanhar() as estado:
+                chamada["estado"] = estado
+                resultado = scraper_module.coletar_indicadores(acao)
+            chamada["espera"] = estado["espera"]
+            chamada["latencia"] = time.perf_counter() - t_espera - estado["espera"]
+        else:
+            with limitador_taxa.obter_limitador(nome).requisicao() as estado:
+                t_requisicao = time.perf_counter()
+                chamada["estado"] = estado
+                chamada["espera"] = t_requisicao - t_espera
+                resultado = scraper_module.coletar_indicadores(acao)
+                chamada["latencia"] = time.perf_counter() - t_requisicao
+        return resultado[0] if isinstance(resultado, tuple) else None
+
+    iniciado_em, t0 = datetime.now(), time.perf_counter()
+    dados, erro = None, None
     try:
-        resultado = scraper_module.coletar_indicadores(acao)
-        if isinstance(resultado, tuple):
-            return resultado[0]
+        dados = cache_coleta.obter_ou_coletar(nome, acao, _buscar) if usar_cache else _buscar()
+    except limitador_taxa.CircuitoAberto:
+        erro = "CircuitoAberto"
+        print(f"  ⏭️ [{nome}] circuito aberto — fonte pulada para {acao}")
     except Exception as e:
-        print(f"  ⚠ [{scraper_module.__name__.split('.')[-1]}] erro em {acao}: {e}")
-    return None
+        erro = type(e).__name__
+        print(f"  ⚠ [{nome}] erro em {acao}: {e}")
+
+    estado = chamada.get("estado", {})
+    if erro is None and dados is None:
+        erro = estado.get("erro") or "SemDados"
+    telemetria_coleta.registrar(
+        nome, acao, iniciado_em,
+        latencia_ms=chamada.get("latencia", time.perf_counter() - t0) * 1000.0,
+        espera_ms=chamada.get("espera", 0.0) * 1000.0,
+        status_http=estado.get("status"),
+        campos_preenchidos=sum(dados.get(c) is not None for c in COLUNAS_INDICADORES) if dados else 0,
+        erro_classe=erro,
+        do_cache=erro is None and "estado" not in chamada,
+    )
+    return dados
 
 
 def _mesclar(base: Dict, fallback: Dict) -> Dict:
@@ -79,11 +144,17 @@ def _contar_nulos(dados: Dict) -> int:
 
 # ── Função principal de coleta orquestrada ───────────────────────────────────
 
-def coletar_com_fallback(acao: str) -> Dict:
+def coletar_com_fallback(acao: str, disponibilidade: Optional[MapaDisponibilidade] = None,
+                         usar_cache: bool = True) -> Dict:
     """
     Coleta indicadores para um ticker usando fallback em cascata:
     Fundamentus → Yahoo → Investidor10.
 
+    Com `disponibilidade`, fontes cujas colunas conhecidas já estão todas
+    preenchidas são puladas, e as colunas devolvidas por cada fonte
+    consultada são registradas no mapa. usar_cache=False ignora o cache de
+    coleta (benchmark: toda fonte consultada faz a requisição de verdade).
+
     Retorna dict com todas as colunas (None para campos não encontrados em nenhuma fonte).
     """
     acao = acao.upper().strip()
@@ -99,9 +170,16 @@ def coletar_com_fallback(acao: str) -> Dict:
         nulos_antes = _contar_nulos(dados)
         if nulos_antes == 0:
             break  # todos os campos preenchidos
+        if disponibilidade is not None and disponibilidade.pode_pular(acao, nome, dados):
+            print(f"  [{nome}] {acao}: pulada (campos que a fonte fornece já preenchidos)")
+            continue
 
         print(f"  [{nome}] coletando {acao}...")
-        parcial = _coletar_fonte(modulo, acao)
+        parcial = _coletar_fonte(modulo, acao, nome, usar_cache)
+        if parcial and disponibilidade is not None:
+            disponibilidade.registrar(
+                acao, nome, [col for col in COLUNAS_INDICADORES if parcial.get(col) is not None]
+            )
         if parcial:
             dados = _mesclar(dados, parcial)
             nulos_depois = _contar_nulos(dados)
@@ -110,6 +188,8 @@ def coletar_com_fallback(acao: str) -> Dict:
         else:
             print(f"  [{nome}] {acao}: sem dados")
 
+    if not telemetria_coleta.execucao_ativa():
+        telemetria_coleta.flush()  # coleta avulsa (dashboard/API): grava já
     return dados
 
 
@@ -125,9 +205,17 @@ def _sanitizar_valores(dados: Dict) -> Dict:
     }
 
 
-def salvar_no_banco(dados: Dict) -> None:
+def salvar_no_banco(dados: Dict, gravador: Optional[GravadorLote] = None) -> None:
+    """
+    Upsert de um ticker em indicadores_fundamentalistas.
+    Com `gravador`, a linha é enfileirada e gravada no próximo flush em lote.
+    """
     dados_save = _sanitizar_valores(dict(dados))
     dados_save["data_coleta"] = date.today()
+    dados_save["atualizado_em"] = datetime.now()
+    if gravador is not None:
+        gravador.adicionar(dados_save)
+        return
     colunas      = ", ".join(dados_save.keys())
     placeholders = ", ".join(["%s"] * len(dados_save))
     update_exprs = [
@@ -150,48 +238,135 @@ def salvar_no_banco(dados: Dict) -> None:
         print(f"  ❌ Erro ao salvar {dados_save.get('acao')}: {e}")
 
 
-def processar_acao(acao: str) -> None:
+def processar_acao(
+    acao: str,
+    salvar: bool = True,
+    gravador: Optional[GravadorLote] = None,
+    disponibilidade: Optional[MapaDisponibilidade] = None,
+    usar_cache: bool = True,
+) -> Dict:
+    """
+    Coleta (com fallback) e salva um ticker.
+    O rate limiting é feito por fonte dentro de _coletar_fonte.
+    """
     print(f"\n{'─'*50}")
     print(f"  Processando: {acao}")
-    dados = coletar_com_fallback(acao)
+    dados = coletar_com_fallback(acao, disponibilidade, usar_cache)
     nulos_final = _contar_nulos(dados)
     print(f"  → Resultado final: {len(COLUNAS_INDICADORES) - nulos_final}/{len(COLUNAS_INDICADORES)} campos preenchidos")
-    salvar_no_banco(dados)
-    time.sleep(0.5)  # rate limiting geral
-
-
-def main() -> None:
-    acoes = [
-        "PETR4", "VALE3", "ITUB4", "BBDC4", "B3SA3", "ABEV3", "BBAS3", "BRFS3", "LREN3", "EGIE3",
-        "JBSS3", "WEGE3", "RENT3", "GGBR4", "HAPV3", "CSAN3", "BRKM5", "MRVE3", "CPLE6", "RAIL3",
-        "CMIG4", "ASAI3", "PRIO3", "EMBR3", "HYPE3", "ELET3", "ELET6", "ENBR3", "PETZ3", "ALPA4",
-        "TIMS3", "AZUL4", "GOLL4", "NTCO3", "CVCB3", "DXCO3", "MGLU3", "CIEL3", "COGN3", "YDUQ3",
-        "CRFB3", "BRML3", "SOMA3", "TOTS3", "LWSA3", "SUZB3", "KLBN11", "RAIZ4", "QUAL3", "SMTO3",
-        "BPAC11", "CPFE3", "CYRE3", "MULT3", "EQTL3", "SLCE3", "VIVT3", "NEOE3", "MOVI3", "BEEF3",
-        "ARZZ3", "CASH3", "TRPL4", "RRRP3", "VAMO3", "RANI3", "PARD3", "RECV3",
-        "MEAL3", "TEND3", "MRFG3", "MDIA3", "TASA4", "GMAT3", "GFSA3", "BPAN4", "CEAB3",
-        "DIRR3", "ENGI11", "GRND3", "IRBR3", "SEQL3", "UNIP6", "USIM5", "BRSR6", "SLED4", "STBP3",
-        "CEPE5", "CBEE3", "MTSA4", "EZTC3", "AVLL3", "IGTI11", "BRPR3", "IGTA3", "TUPY3", "CGAS5",
-        "FRAS3", "AERI3", "BLAU3", "LJQQ3", "LOGG3", "OFSA3", "ORVR3", "PNVL3",
-        "POSI3", "POMO4", "PTBL3", "RAPT4", "SAPR4", "SBSP3", "TAEE11", "TGMA3", "TRIS3",
-        "VIVA3", "VLID3", "WIZC3", "BRAP4", "BMIN3", "JHSF3", "EVEN3", "GUAR3", "HETA4", "VULC3",
-        "MTRE3", "BMOB3", "ENAT3", "OIBR3", "CEGR3", "BALM4", "SMLS3", "SHOW3", "MODL11", "CBAV3",
-        "ITSA4", "SANB11", "BBSE3", "RDOR3", "CXSE3", "PSSA3", "CEEB3", "TFCO4", "MRSA3B",
-        "ALUP11", "UGPA3", "VBBR3", "ENEV3", "ISAE4", "EQPA3", "REDE3",
-    ]
+    if salvar:
+        salvar_no_banco(dados, gravador)
+    return dados
 
-    print(f"\n🚀 Orquestrador iniciado — {len(acoes)} tickers (sequencial com fallback)\n")
-    print("Ordem de fontes: Fundamentus → Yahoo Finance → Investidor10\n")
 
-    # Sequencial (não paralelo) para respeitar rate limits das 3 fontes simultaneamente
-    for acao in acoes:
-        try:
-            processar_acao(acao)
-        except Exception as e:
-            print(f"❌ Erro inesperado em {acao}: {e}")
+def _imprimir_benchmark(tempo_total: float, n_acoes: int) -> None:
+    """Resumo de desempenho: tempo de parede e requisições/s por fonte."""
+    tickers_s = n_acoes / tempo_total if tempo_total > 0 else 0.0
+    print(f"\n📊 Benchmark — {n_acoes} tickers em {tempo_total:.1f}s ({tickers_s:.2f} tickers/s)")
+    print(f"  {'fonte':<14}{'reqs':>6}{'req/s':>9}{'lat. média':>12}{'espera':>10}{'falhas':>8}{'puladas':>9}  circuito")
+    for nome, est in limitador_taxa.estatisticas().items():
+        reqs = est["requisicoes"]
+        req_s = reqs / tempo_total if tempo_total > 0 else 0.0
+        lat = est["tempo_em_requisicao"] / reqs if reqs else 0.0
+        circuito = "aberto" if est["circuito_aberto"] else "fechado"
+        print(f"  {nome:<14}{reqs:>6}{req_s:>9.2f}{lat:>11.2f}s{est['tempo_em_espera']:>9.1f}s"
+              f"{est['falhas']:>8}{est['recusadas']:>9}  {circuito}")
+
+
+# Tickers coletados na rotina diária
+ACOES_MONITORADAS = [
+    "PETR4", "VALE3", "ITUB4", "BBDC4", "B3SA3", "ABEV3", "BBAS3", "BRFS3", "LREN3", "EGIE3",
+    "JBSS3", "WEGE3", "RENT3", "GGBR4", "HAPV3", "CSAN3", "BRKM5", "MRVE3", "CPLE6", "RAIL3",
+    "CMIG4", "ASAI3", "PRIO3", "EMBR3", "HYPE3", "ELET3", "ELET6", "ENBR3", "PETZ3", "ALPA4",
+    "TIMS3", "AZUL4", "GOLL4", "NTCO3", "CVCB3", "DXCO3", "MGLU3", "CIEL3", "COGN3", "YDUQ3",
+    "CRFB3", "BRML3", "SOMA3", "TOTS3", "LWSA3", "SUZB3", "KLBN11", "RAIZ4", "QUAL3", "SMTO3",
+    "BPAC11", "CPFE3", "CYRE3", "MULT3", "EQTL3", "SLCE3", "VIVT3", "NEOE3", "MOVI3", "BEEF3",
+    "ARZZ3", "CASH3", "TRPL4", "RRRP3", "VAMO3", "RANI3", "PARD3", "RECV3",
+    "MEAL3", "TEND3", "MRFG3", "MDIA3", "TASA4", "GMAT3", "GFSA3", "BPAN4", "CEAB3",
+    "DIRR3", "ENGI11", "GRND3", "IRBR3", "SEQL3", "UNIP6", "USIM5", "BRSR6", "SLED4", "STBP3",
+    "CEPE5", "CBEE3", "MTSA4", "EZTC3", "AVLL3", "IGTI11", "BRPR3", "IGTA3", "TUPY3", "CGAS5",
+    "FRAS3", "AERI3", "BLAU3", "LJQQ3", "LOGG3", "OFSA3", "ORVR3", "PNVL3",
+    "POSI3", "POMO4", "PTBL3", "RAPT4", "SAPR4", "SBSP3", "TAEE11", "TGMA3", "TRIS3",
+    "VIVA3", "VLID3", "WIZC3", "BRAP4", "BMIN3", "JHSF3", "EVEN3", "GUAR3", "HETA4", "VULC3",
+    "MTRE3", "BMOB3", "ENAT3", "OIBR3", "CEGR3", "BALM4", "SMLS3", "SHOW3", "MODL11", "CBAV3",
+    "ITSA4", "SANB11", "BBSE3", "RDOR3", "CXSE3", "PSSA3", "CEEB3", "TFCO4", "MRSA3B",
+    "ALUP11", "UGPA3", "VBBR3", "ENEV3", "ISAE4", "EQPA3", "REDE3",
+]
+
+
+def main(
+    acoes: Optional[List[str]] = None,
+    max_workers: int = 3,
+    benchmark: bool = False,
+) -> None:
+    """
+    Coleta todos os tickers em paralelo.
+
+    Args:
+        acoes: lista de tickers (padrão: ACOES_MONITORADAS).
+        max_workers: tickers processados simultaneamente. Com 3 workers cada
+            fonte tende a ficar ocupada o tempo todo (uma por etapa do fallback).
+        benchmark: não grava no banco, não usa o cache de coleta (mede a
+            coleta de verdade) e imprime tempo de parede e requisições/s por
+            fonte ao final.
+    """
+    acoes = list(acoes or ACOES_MONITORADAS)
+
+    modo = "benchmark, sem gravar no banco" if benchmark else f"{max_workers} workers"
+    print(f"\n🚀 Orquestrador iniciado — {len(acoes)} tickers ({modo})\n")
+    print("Ordem de fontes: Fundamentus → Yahoo Finance → Investidor10\n")
 
-    print("\n✅ Coleta orquestrada concluída.")
+    limitador_taxa.resetar_estatisticas()
+    limitador_taxa.fechar_circuitos()
+    execucao_id = telemetria_coleta.iniciar_execucao()
+    print(f"📡 Telemetria da execução: {execucao_id}\n")
+    inicio = time.perf_counter()
+
+    # variacao_12m de todos os tickers em poucos yf.download multi-ticker
+    historico_precos.preparar(acoes)
+
+    # Quais colunas cada fonte já forneceu para cada ticker (fontes redundantes são puladas)
+    disponibilidade = MapaDisponibilidade.carregar(acoes)
+
+    # Todas as linhas da noite vão para o banco em um (ou poucos) INSERTs em lote
+    with gravador_indicadores() as gravador, \
+         ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = {
+            executor.submit(processar_acao, acao, not benchmark, gravador, disponibilidade,
+                            not benchmark): acao
+            for acao in acoes
+        }
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"❌ Erro inesperado em {futures[future]}: {e}")
+
+    tempo_total = time.perf_counter() - inicio
+    telemetria_coleta.finalizar_execucao()
+    print(f"\n⏭️ {disponibilidade.puladas} consulta(s) a fontes redundantes evitadas.")
+    if benchmark:
+        _imprimir_benchmark(tempo_total, len(acoes))
+    else:
+        disponibilidade.salvar()
+
+    print(f"\n✅ Coleta orquestrada concluída em {tempo_total:.1f}s.")
+
+    if not benchmark:
+        # Deixa as features da nova data prontas para os treinos
+        for universo in (feature_store.UNIVERSO_COMPLETO, feature_store.UNIVERSO_COTACAO_MIN_1):
+            feature_store.atualizar_feature_store(universo)
+        # Pregões que faltam em precos_diarios (um download em lote por data de início)
+        precos_diarios.sincronizar_precos_diarios(acoes)
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Coleta orquestrada de indicadores.")
+    parser.add_argument("--workers", type=int, default=3, help="Tickers simultâneos. Padrão: 3.")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Não grava no banco nem usa o cache de coleta; reporta tempo total e req/s por fonte.")
+    parser.add_argument("--limite", type=int, default=None,
+                        help="Processa apenas os N primeiros tickers (útil com --benchmark).")
+    args = parser.parse_args()
+    _acoes = ACOES_MONITORADAS[:args.limite] if args.limite else ACOES_MONITORADAS
+    main(acoes=_acoes, max_workers=args.workers, benchmark=args.benchmark)
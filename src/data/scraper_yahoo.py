@@ -7,10 +7,9 @@ Pontos fracos  : snapshot sem histórico, alguns campos ausentes para FIIs/banco
 
 import os
 import sys
-import time
 from pathlib import Path
-from datetime import date, datetime, timedelta
-from typing import Union, Tuple, Dict
+from datetime import date, datetime
+from typing import Union, Tuple, Dict, Optional
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 _PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
@@ -19,6 +18,8 @@ if str(_PROJECT_ROOT) not in sys.path:
 
 import yfinance as yf
 from src.core.db_connection import get_connection
+from src.core.gravador_lote import GravadorLote, gravador_indicadores
+from src.data import historico_precos, limitador_taxa
 
 
 # ── Mapeamento yfinance .info → coluna DB ────────────────────────────────────
@@ -70,20 +71,11 @@ def _safe_float(v, mult=None) -> Union[float, None]:
 
 
 def _variacao_12m(acao: str) -> Union[float, None]:
-    try:
-        t = yf.Ticker(acao + '.SA')
-        hist = t.history(
-            start=(datetime.today() - timedelta(days=365)).strftime('%Y-%m-%d'),
-            end=datetime.today().strftime('%Y-%m-%d'),
-        )
-        if hist.empty or len(hist) < 2:
-            return None
-        first = float(hist['Close'].iloc[0])
-        if first == 0.0:
-            return None
-        return (float(hist['Close'].iloc[-1]) / first - 1.0) * 100.0
-    except Exception:
-        return None
+    """
+    Variação de preço (%) nos últimos 12 meses, do painel de preços baixado
+    em lote (src/data/historico_precos.py). None se não houver histórico.
+    """
+    return historico_precos.variacao_12m(acao)
 
 
 # ── Funções públicas ──────────────────────────────────────────────────────────
@@ -102,6 +94,7 @@ def coletar_indicadores(acao: str) -> Union[Tuple[Dict, str], str]:
         ticker_obj = yf.Ticker(acao + '.SA')
         info = ticker_obj.info
     except Exception as e:
+        limitador_taxa.registrar_erro(e)
         return f"❌ {acao} [yahoo] - erro ao buscar .info: {e}"
 
     if not info or info.get('regularMarketPrice') is None:
@@ -143,8 +136,12 @@ def coletar_indicadores(acao: str) -> Union[Tuple[Dict, str], str]:
     return dados, log_final
 
 
-def salvar_no_banco(dados: Dict) -> None:
+def salvar_no_banco(dados: Dict, gravador: Optional[GravadorLote] = None) -> None:
     dados["data_coleta"] = date.today()
+    dados["atualizado_em"] = datetime.now()
+    if gravador is not None:
+        gravador.adicionar(dados)
+        return
     colunas      = ", ".join(dados.keys())
     placeholders = ", ".join(["%s"] * len(dados))
     update_exprs = [
@@ -167,15 +164,19 @@ def salvar_no_banco(dados: Dict) -> None:
         print("❌ Erro ao inserir no banco:", e)
 
 
-def processar_acao(acao: str) -> None:
-    resultado = coletar_indicadores(acao)
+def processar_acao(acao: str, gravador: Optional[GravadorLote] = None) -> None:
+    try:
+        with limitador_taxa.obter_limitador("yahoo").requisicao():
+            resultado = coletar_indicadores(acao)
+    except limitador_taxa.CircuitoAberto as e:
+        print(f"⏭️ {acao} - {e}")
+        return
     if isinstance(resultado, tuple):
         dados, log = resultado
         print(log)
-        salvar_no_banco(dados)
+        salvar_no_banco(dados, gravador)
     else:
         print(resultado)
-    time.sleep(0.5)
 
 
 def main() -> None:
@@ -199,8 +200,9 @@ def main() -> None:
     ]
 
     print(f"\n🚀 Iniciando coleta via Yahoo Finance (4 threads)...\n")
-    with ThreadPoolExecutor(max_workers=4) as executor:
-        futures = [executor.submit(processar_acao, a) for a in acoes]
+    historico_precos.preparar(acoes)
+    with gravador_indicadores() as gravador, ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(processar_acao, a, gravador) for a in acoes]
         for future in as_completed(futures):
             try:
                 future.result()
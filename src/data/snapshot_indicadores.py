@@ -0,0 +1,85 @@
+"""
+Fonte "do banco" para o recomendador.
+
+A rotina noturna (scraper_orquestrador) grava em indicadores_fundamentalistas
+os mesmos tickers que a recomendação em lote avalia logo depois. Em vez de
+raspar os três sites de novo, o recomendador lê a linha mais recente de cada
+ticker numa única consulta e só coleta ao vivo os que não têm linha de hoje ou
+cuja linha tem mais de `max_idade_horas` horas (coluna atualizado_em).
+
+Configuração (.env):
+    RECOMENDACAO_MAX_IDADE_HORAS   idade máxima aceita (padrão 12; 0 desliga)
+"""
+
+import sys
+from pathlib import Path
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+import os
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, Optional
+
+from src.core.db_connection import conexao
+from src.data.scraper_orquestrador import COLUNAS_INDICADORES
+
+MAX_IDADE_HORAS_PADRAO = float(os.getenv("RECOMENDACAO_MAX_IDADE_HORAS", "12"))
+
+
+def _para_float(valor):
+    return float(valor) if isinstance(valor, Decimal) else valor
+
+
+def carregar_snapshot(
+    tickers: Iterable[str],
+    max_idade_horas: Optional[float] = None,
+) -> Dict[str, Dict]:
+    """
+    Linha mais recente de indicadores_fundamentalistas de cada ticker, desde
+    que seja de hoje e tenha no máximo `max_idade_horas` horas.
+
+    Retorna {ticker: dict no formato de coletar_com_fallback}; tickers ausentes
+    precisam ser coletados ao vivo. Em caso de erro no banco, retorna {}.
+    """
+    if max_idade_horas is None:
+        max_idade_horas = MAX_IDADE_HORAS_PADRAO
+    tickers = sorted({t.upper().strip() for t in tickers})
+    if not tickers or max_idade_horas <= 0:
+        return {}
+
+    colunas = ", ".join(COLUNAS_INDICADORES)
+    query = f"""
+        SELECT DISTINCT ON (acao)
+               acao, data_coleta,
+               COALESCE(atualizado_em, data_coleta::timestamp) AS atualizado_em,
+               {colunas}
+        FROM indicadores_fundamentalistas
+        WHERE acao = ANY(%s)
+        ORDER BY acao, data_coleta DESC
+    """
+    try:
+        with conexao() as conn, conn.cursor() as cur:
+            cur.execute(query, (tickers,))
+            nomes = [d[0] for d in cur.description]
+            linhas = cur.fetchall()
+    except Exception as e:
+        print(f"⚠️ Snapshot de indicadores indisponível ({e}); coletando ao vivo.")
+        return {}
+
+    limite = datetime.now() - timedelta(hours=max_idade_horas)
+    hoje = date.today()
+    snapshot = {}
+    for linha in linhas:
+        registro = dict(zip(nomes, linha))
+        if registro["data_coleta"] != hoje or registro["atualizado_em"] < limite:
+            continue
+        if registro.get("cotacao") is None:
+            continue
+        snapshot[registro["acao"]] = {
+            "acao": registro["acao"],
+            **{col: _para_float(registro[col]) for col in COLUNAS_INDICADORES},
+        }
+    return snapshot
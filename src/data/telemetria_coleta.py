@@ -0,0 +1,238 @@
+"""
+Telemetria das coletas por fonte.
+
+Cada chamada de _coletar_fonte (orquestrador) vira um registro com fonte,
+ticker, latência da requisição, espera no limitador de taxa, status HTTP,
+campos preenchidos, classe do erro e se veio do cache de coleta. Os registros
+são agrupados por execução (um id por chamada de scraper_orquestrador.main;
+coletas avulsas do dashboard/API usam "avulsa") e gravados em lote:
+
+  - banco (padrão): tabela coleta_execucoes, via GravadorLote;
+  - jsonl: uma linha JSON por registro em TELEMETRIA_COLETA_ARQUIVO;
+  - desligado.
+
+resumo_por_fonte() devolve p50/p95/p99 de latência, histograma e taxa de
+preenchimento por fonte nas últimas N execuções (endpoint
+GET /coleta/telemetria da API).
+
+Configuração (.env):
+    TELEMETRIA_COLETA_DESTINO   banco | jsonl | desligado (padrão banco)
+    TELEMETRIA_COLETA_ARQUIVO   caminho do JSONL (padrão <raiz>/.cache/coleta_execucoes.jsonl)
+"""
+
+import sys
+from pathlib import Path
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+import json
+import os
+import threading
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.core.db_connection import conexao
+from src.core.gravador_lote import ErroGravacaoLote, GravadorLote
+
+TABELA = "coleta_execucoes"
+DESTINO = os.getenv("TELEMETRIA_COLETA_DESTINO", "banco").lower()
+ARQUIVO_JSONL = Path(os.getenv("TELEMETRIA_COLETA_ARQUIVO", _PROJECT_ROOT / ".cache" / "coleta_execucoes.jsonl"))
+EXECUCAO_AVULSA = "avulsa"
+
+COLUNAS = [
+    "execucao_id", "fonte", "acao", "iniciado_em", "latencia_ms", "espera_ms",
+    "status_http", "campos_preenchidos", "erro_classe", "do_cache",
+]
+# Limites (ms) das faixas do histograma de latência
+FAIXAS_MS = [100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+
+
+class _Telemetria:
+    """Buffer thread-safe dos registros da execução em andamento."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.execucao_id = EXECUCAO_AVULSA
+        self._latencias: Dict[str, List[float]] = defaultdict(list)
+        self._gravador = GravadorLote(TABELA, chave=("execucao_id", "fonte", "acao", "iniciado_em"),
+                                      colunas=COLUNAS, atualizar=[])
+        self._jsonl: List[Dict] = []
+
+    def iniciar(self) -> str:
+        with self._lock:
+            self.execucao_id = datetime.now().strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+            self._latencias.clear()
+            return self.execucao_id
+
+    def registrar(self, registro: Dict) -> None:
+        with self._lock:
+            registro = {"execucao_id": self.execucao_id, **registro}
+            if not registro["do_cache"]:
+                self._latencias[registro["fonte"]].append(registro["latencia_ms"])
+            if DESTINO == "jsonl":
+                self._jsonl.append(registro)
+                return
+        if DESTINO == "banco":
+            self._gravador.adicionar(registro)
+
+    def flush(self) -> None:
+        if DESTINO == "banco":
+            try:
+                self._gravador.flush()
+            except ErroGravacaoLote as e:
+                # Telemetria não deve derrubar a coleta; as linhas boas já foram gravadas
+                print(f"⚠️ Telemetria da coleta: {e}")
+            return
+        with self._lock:
+            linhas, self._jsonl = self._jsonl, []
+        if not linhas:
+            return
+        try:
+            ARQUIVO_JSONL.parent.mkdir(parents=True, exist_ok=True)
+            with ARQUIVO_JSONL.open("a", encoding="utf-8") as f:
+                for linha in linhas:
+                    f.write(json.dumps(linha, default=str, ensure_ascii=False) + "\n")
+        except OSError as e:
+            print(f"⚠️ Não foi possível gravar a telemetria em {ARQUIVO_JSONL}: {e}")
+
+    def finalizar(self) -> None:
+        """Grava o que falta e imprime a latência por fonte desta execução."""
+        self.flush()
+        with self._lock:
+            latencias = {f: np.array(v) for f, v in self._latencias.items() if v}
+            self.execucao_id = EXECUCAO_AVULSA
+        if not latencias:
+            return
+        print(f"\n⏱️ Latência por fonte (ms, sem cache):")
+        print(f"  {'fonte':<14}{'chamadas':>9}{'p50':>9}{'p95':>9}{'p99':>9}")
+        for fonte, v in sorted(latencias.items()):
+            p50, p95, p99 = np.percentile(v, [50, 95, 99])
+            print(f"  {fonte:<14}{len(v):>9}{p50:>9.0f}{p95:>9.0f}{p99:>9.0f}")
+
+
+_telemetria = _Telemetria()
+
+
+# ── API pública (coleta) ─────────────────────────────────────────────────────
+
+def iniciar_execucao() -> str:
+    """Abre uma execução; os registros seguintes levam o id retornado."""
+    return _telemetria.iniciar()
+
+
+def finalizar_execucao() -> None:
+    _telemetria.finalizar()
+
+
+def execucao_ativa() -> bool:
+    return _telemetria.execucao_id != EXECUCAO_AVULSA
+
+
+def registrar(fonte: str, acao: str, iniciado_em: datetime, latencia_ms: float,
+              espera_ms: float = 0.0, status_http: Optional[int] = None, campos_preenchidos: int = 0,
+              erro_classe: Optional[str] = None, do_cache: bool = False) -> None:
+    if DESTINO == "desligado":
+        return
+    _telemetria.registrar({
+        "fonte": fonte, "acao": acao, "iniciado_em": iniciado_em,
+        "latencia_ms": round(latencia_ms, 1), "espera_ms": round(espera_ms, 1),
+        "status_http": status_http,
+        "campos_preenchidos": campos_preenchidos, "erro_classe": erro_classe,
+        "do_cache": do_cache,
+    })
+
+
+def flush() -> None:
+    _telemetria.flush()
+
+
+# ── Consulta ─────────────────────────────────────────────────────────────────
+
+def _carregar_registros(execucoes: int) -> pd.DataFrame:
+    if DESTINO == "jsonl":
+        if not ARQUIVO_JSONL.exists():
+            return pd.DataFrame(columns=COLUNAS)
+        df = pd.read_json(ARQUIVO_JSONL, lines=True)
+        df = df[df["execucao_id"] != EXECUCAO_AVULSA]
+        ultimas = (df.groupby("execucao_id")["iniciado_em"].max()
+                   .sort_values(ascending=False).index[:execucoes])
+        return df[df["execucao_id"].isin(ultimas)]
+
+    query = f"""
+        WITH ultimas AS (
+            SELECT execucao_id FROM {TABELA}
+            WHERE execucao_id <> %(avulsa)s
+            GROUP BY execucao_id
+            ORDER BY MAX(iniciado_em) DESC
+            LIMIT %(n)s
+        )
+        SELECT {", ".join(COLUNAS)} FROM {TABELA}
+        WHERE execucao_id IN (SELECT execucao_id FROM ultimas)
+    """
+    with conexao() as conn:
+        return pd.read_sql_query(query, conn, params={"avulsa": EXECUCAO_AVULSA, "n": execucoes})
+
+
+def resumo_por_fonte(execucoes: int = 5, total_campos: int = 31) -> Dict:
+    """
+    Latência (p50/p95/p99 e histograma, só chamadas fora do cache), espera
+    média no limitador de taxa, taxa de erro e taxa de preenchimento
+    (campos preenchidos / total_campos) por fonte nas últimas `execucoes`
+    execuções.
+    """
+    df = _carregar_registros(execucoes)
+    if df.empty:
+        return {"execucoes": [], "fontes": {}}
+
+    df["iniciado_em"] = pd.to_datetime(df["iniciado_em"])
+    df["latencia_ms"] = pd.to_numeric(df["latencia_ms"], errors="coerce")
+    df["espera_ms"] = pd.to_numeric(df["espera_ms"], errors="coerce")
+    df["do_cache"] = df["do_cache"].astype(bool)
+
+    por_execucao = (
+        df.groupby("execucao_id")
+        .agg(inicio=("iniciado_em", "min"), fim=("iniciado_em", "max"), chamadas=("fonte", "size"))
+        .sort_values("inicio", ascending=False)
+        .reset_index()
+    )
+    rotulos = [f"<{FAIXAS_MS[0]}"] + [f"{a}-{b}" for a, b in zip(FAIXAS_MS, FAIXAS_MS[1:])] + [f">={FAIXAS_MS[-1]}"]
+
+    fontes = {}
+    for fonte, grupo in df.groupby("fonte"):
+        rede = grupo.loc[~grupo["do_cache"], "latencia_ms"].dropna().to_numpy()
+        p50, p95, p99 = np.percentile(rede, [50, 95, 99]) if len(rede) else (None, None, None)
+        contagem = np.bincount(np.searchsorted(FAIXAS_MS, rede, side="right"), minlength=len(rotulos))
+        fontes[fonte] = {
+            "chamadas": int(len(grupo)),
+            "do_cache": int(grupo["do_cache"].sum()),
+            "latencia_ms": {
+                "p50": None if p50 is None else round(float(p50), 1),
+                "p95": None if p95 is None else round(float(p95), 1),
+                "p99": None if p99 is None else round(float(p99), 1),
+            },
+            "histograma_ms": dict(zip(rotulos, contagem.tolist())),
+            "espera_media_ms": round(float(grupo["espera_ms"].mean()), 1),
+            "taxa_erro": round(float(grupo["erro_classe"].notna().mean()), 4),
+            "erros": {k: int(v) for k, v in grupo["erro_classe"].value_counts().items()},
+            "taxa_preenchimento": round(float(grupo["campos_preenchidos"].mean()) / total_campos, 4),
+        }
+
+    return {
+        "execucoes": [
+            {
+                "execucao_id": r.execucao_id,
+                "inicio": r.inicio.isoformat(),
+                "fim": r.fim.isoformat(),
+                "chamadas": int(r.chamadas),
+            }
+            for r in por_execucao.itertuples()
+        ],
+        "fontes": fontes,
+    }
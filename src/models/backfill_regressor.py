@@ -0,0 +1,316 @@
+"""
+Backfill do regressor de preços (executar_pipeline_regressor) por intervalo de datas.
+
+Em vez de rodar uma RandomizedSearchCV completa para cada dia do calendário,
+o backfill:
+  1. pula datas que não trazem dado novo: mesmo conjunto de treino, mesmas
+     linhas de teste e mesma data-alvo da data anterior (ex: domingo após um
+     sábado sem coleta) — a previsão seria idêntica;
+  2. reaproveita os hiperparâmetros encontrados por `janela_hiperparametros`
+     dias antes de refazer a busca;
+  3. com os mesmos hiperparâmetros e uma janela de treino que só cresceu,
+     reaproveita a floresta anterior com warm_start e treina apenas algumas
+     árvores novas (a floresta é reconstruída ao dobrar de tamanho);
+  4. opcionalmente distribui blocos contíguos de datas entre processos
+     (cada bloco faz a própria busca inicial).
+
+Os resultados são gravados em resultados_precos em ordem cronológica via
+GravadorLote, preservando o "última data_calculo vence" do loop antigo. Toda
+data processada — inclusive as puladas e as sem treino, que não geram
+previsão — fica registrada em backfill_regressor_datas; ultima_data_processada
+combina as duas tabelas para o --pendente não recomeçar das datas puladas.
+
+Uso:
+    from src.models.backfill_regressor import executar_backfill_regressor
+    executar_backfill_regressor(date(2026, 1, 1), date(2026, 3, 31), n_dias=10)
+"""
+
+import sys
+from pathlib import Path
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+from pandas.tseries.offsets import BDay
+from sklearn.ensemble import RandomForestRegressor
+
+from src.core.db_connection import conexao
+from src.core.gravador_lote import GravadorLote
+from src.models.regressor_preco import (
+    criar_busca_rf,
+    mascaras_treino_teste,
+    montar_comparacao,
+    preparar_dados_cache,
+)
+
+# Fração de árvores novas a cada data em que a janela de treino cresce
+FRACAO_ARVORES_WARM_START = 0.1
+
+TABELA_DATAS = "backfill_regressor_datas"
+
+
+class _EstadoBloco:
+    """Modelo e hiperparâmetros vigentes ao longo de um bloco cronológico de datas."""
+
+    def __init__(self, janela_hiperparametros: int, warm_start: bool, n_jobs: int):
+        self.janela_hiperparametros = janela_hiperparametros
+        self.warm_start = warm_start
+        self.n_jobs = n_jobs
+        self.params = None
+        self.data_busca = None
+        self.model = None
+        self.n_estimators_base = 0
+        self.n_treino = -1
+
+    def _params_expirados(self, data_calculo) -> bool:
+        return (
+            self.params is None
+            or (data_calculo - self.data_busca).days >= self.janela_hiperparametros
+        )
+
+    def treinar(self, X_train, y_train, data_calculo) -> str:
+        """Atualiza self.model para a data; retorna a etapa usada."""
+        n_treino = len(X_train)
+
+        if self._params_expirados(data_calculo):
+            search = criar_busca_rf(n_treino, n_jobs=self.n_jobs)
+            search.fit(X_train, y_train)
+            self.params, self.data_busca = search.best_params_, data_calculo
+            self.model = search.best_estimator_
+            self.model.set_params(n_jobs=self.n_jobs)
+            self.n_estimators_base = self.model.n_estimators
+            self.n_treino = n_treino
+            return "busca"
+
+        if self.model is not None and n_treino == self.n_treino:
+            # Janela de treino idêntica (ex: segunda-feira após fim de semana)
+            return "reuso"
+
+        # Janelas são prefixos no tempo: se cresceu, o treino anterior está contido no atual
+        pode_crescer = (
+            self.warm_start
+            and self.model is not None
+            and n_treino > self.n_treino
+            and self.model.n_estimators < 2 * self.n_estimators_base
+        )
+        if pode_crescer:
+            incremento = max(1, int(round(self.n_estimators_base * FRACAO_ARVORES_WARM_START)))
+            self.model.set_params(warm_start=True, n_estimators=self.model.n_estimators + incremento)
+            self.model.fit(X_train, y_train)
+            etapa = "warm_start"
+        else:
+            self.model = RandomForestRegressor(random_state=42, n_jobs=self.n_jobs, **self.params)
+            self.model.fit(X_train, y_train)
+            self.n_estimators_base = self.model.n_estimators
+            etapa = "reajuste"
+        self.n_treino = n_treino
+        return etapa
+
+
+def _assinatura(mask_train, mask_test, data_calculo, n_dias) -> tuple:
+    # Máscaras de treino são prefixos no tempo → a contagem identifica o conjunto
+    return (
+        int(mask_train.sum()),
+        tuple(np.flatnonzero(mask_test.to_numpy())),
+        (pd.Timestamp(data_calculo) + BDay(n_dias)).date(),
+    )
+
+
+def _processar_bloco(datas, dados_cache, n_dias, sem_vazamento_temporal,
+                     janela_hiperparametros, warm_start, n_jobs) -> list[dict]:
+    """Processa datas (em ordem cronológica). Função de módulo para rodar em processo."""
+    X, y, dates, acoes, ultima_real_date, acoes_validas = dados_cache
+    estado = _EstadoBloco(janela_hiperparametros, warm_start, n_jobs)
+    assinatura_anterior = None
+    resultados = []
+
+    for data_calculo in datas:
+        t0 = time.perf_counter()
+        mask_train, mask_test = mascaras_treino_teste(
+            dates, data_calculo, ultima_real_date, n_dias, sem_vazamento_temporal, avisar=False
+        )
+        assinatura = _assinatura(mask_train, mask_test, data_calculo, n_dias)
+        if assinatura == assinatura_anterior:
+            resultados.append({"data_calculo": data_calculo, "etapa": "pulada",
+                               "segundos": time.perf_counter() - t0, "comp": None})
+            print(f"⏭️  {data_calculo}: sem data_coleta nova — pulada.")
+            continue
+        assinatura_anterior = assinatura
+
+        X_train, y_train = X[mask_train], y[mask_train]
+        if X_train.empty:
+            resultados.append({"data_calculo": data_calculo, "etapa": "sem_treino",
+                               "segundos": time.perf_counter() - t0, "comp": None})
+            print(f"⚠️ {data_calculo}: sem dados de treino.")
+            continue
+
+        etapa = estado.treinar(X_train, y_train, data_calculo)
+        comp = montar_comparacao(
+            estado.model, X, y, acoes, mask_train, mask_test, acoes_validas,
+            data_calculo, n_dias, avisar=False,
+        )
+        segundos = time.perf_counter() - t0
+        resultados.append({"data_calculo": data_calculo, "etapa": etapa,
+                           "segundos": segundos, "comp": comp})
+        print(f"✅ {data_calculo}: {etapa:<10} {segundos:6.1f}s  "
+              f"({len(X_train)} linhas de treino, {estado.model.n_estimators} árvores)")
+    return resultados
+
+
+def _dividir_em_blocos(datas: list, n_blocos: int) -> list[list]:
+    n_blocos = max(1, min(n_blocos, len(datas)))
+    return [list(bloco) for bloco in np.array_split(np.array(datas, dtype=object), n_blocos) if len(bloco)]
+
+
+def _gravar(gravador, resultados, tickers_upper) -> None:
+    for r in resultados:
+        comp = r["comp"]
+        if comp is None or comp.empty:
+            continue
+        if tickers_upper:
+            comp = comp[comp['acao'].isin(tickers_upper)]
+        gravador.adicionar_varias(
+            {
+                "acao": row.acao,
+                "data_calculo": r["data_calculo"],
+                "data_previsao": row.data_previsao,
+                "preco_previsto": float(row.preco_previsto),
+            }
+            for row in comp.itertuples(index=False)
+        )
+
+
+def _registrar_datas(resultados, n_dias) -> None:
+    with GravadorLote(TABELA_DATAS, chave=("data_calculo",),
+                      colunas=["data_calculo", "n_dias", "etapa", "previsoes", "processado_em"],
+                      tamanho_lote=5000) as gravador:
+        agora = pd.Timestamp.now().to_pydatetime()
+        gravador.adicionar_varias(
+            {
+                "data_calculo": r["data_calculo"],
+                "n_dias": n_dias,
+                "etapa": r["etapa"],
+                "previsoes": 0 if r["comp"] is None else len(r["comp"]),
+                "processado_em": agora,
+            }
+            for r in resultados
+        )
+
+
+def ultima_data_processada() -> date | None:
+    """Última data_calculo já coberta: com previsão em resultados_precos ou registrada pelo backfill."""
+    with conexao() as conn, conn.cursor() as cur:
+        cur.execute(
+            f"SELECT GREATEST((SELECT MAX(data_calculo) FROM resultados_precos), "
+            f"(SELECT MAX(data_calculo) FROM {TABELA_DATAS}))"
+        )
+        ultima = cur.fetchone()[0]
+    return pd.Timestamp(ultima).date() if ultima is not None else None
+
+
+def executar_backfill_regressor(
+    data_inicio: date,
+    data_fim: date,
+    n_dias: int = 10,
+    save_to_db: bool = True,
+    tickers: list[str] | None = None,
+    sem_vazamento_temporal: bool = False,
+    janela_hiperparametros: int = 30,
+    warm_start: bool = True,
+    processos: int = 1,
+    dados_cache: tuple | None = None,
+) -> pd.DataFrame:
+    """
+    Executa o regressor para cada data_calculo em [data_inicio, data_fim].
+
+    Args:
+        n_dias, tickers, sem_vazamento_temporal: como em executar_pipeline_regressor.
+        janela_hiperparametros: dias (calendário) em que os hiperparâmetros da
+            última busca são reaproveitados. 0 → busca em toda data processada.
+        warm_start: cresce a floresta anterior em vez de reajustar do zero.
+        processos: blocos de datas processados em paralelo (o orçamento de
+            núcleos é dividido entre eles).
+        dados_cache: saída de preparar_dados_cache(n_dias) (carregada se None).
+
+    Returns:
+        DataFrame com data_calculo, etapa (busca/warm_start/reajuste/reuso/
+        pulada/sem_treino), segundos e previsoes por data.
+    """
+    if data_inicio > data_fim:
+        raise ValueError("data_inicio não pode ser maior que data_fim.")
+
+    inicio_total = time.perf_counter()
+    if dados_cache is None:
+        print("[backfill] Pré-carregando e processando dados (uma única vez)...")
+        dados_cache = preparar_dados_cache(n_dias=n_dias)
+
+    datas = [data_inicio + timedelta(days=i) for i in range((data_fim - data_inicio).days + 1)]
+    blocos = _dividir_em_blocos(datas, processos)
+    nucleos = os.cpu_count() or 1
+    n_jobs = max(1, nucleos // len(blocos)) if len(blocos) > 1 else -1
+    print(f"[backfill] {len(datas)} data(s) de {data_inicio} a {data_fim} em {len(blocos)} bloco(s) "
+          f"| janela de hiperparâmetros: {janela_hiperparametros} dia(s) | warm_start: {warm_start}")
+
+    tickers_upper = [t.upper() for t in tickers] if tickers else None
+    gravador = GravadorLote(
+        "resultados_precos",
+        chave=("acao", "data_previsao"),
+        colunas=["acao", "data_calculo", "data_previsao", "preco_previsto"],
+        tamanho_lote=5000,
+    )
+    args = (n_dias, sem_vazamento_temporal, janela_hiperparametros, warm_start, n_jobs)
+
+    resultados = []
+    if len(blocos) == 1:
+        resultados = _processar_bloco(blocos[0], dados_cache, *args)
+        if save_to_db:
+            _gravar(gravador, resultados, tickers_upper)
+    else:
+        # Blocos terminam fora de ordem; a gravação segue a ordem cronológica
+        # para que a previsão da data_calculo mais recente prevaleça.
+        por_bloco = {}
+        proximo = 0
+        with ProcessPoolExecutor(max_workers=len(blocos),
+                                 mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = {
+                executor.submit(_processar_bloco, bloco, dados_cache, *args): i
+                for i, bloco in enumerate(blocos)
+            }
+            for future in as_completed(futures):
+                por_bloco[futures[future]] = future.result()
+                while proximo in por_bloco:
+                    if save_to_db:
+                        _gravar(gravador, por_bloco[proximo], tickers_upper)
+                    resultados.extend(por_bloco.pop(proximo))
+                    proximo += 1
+
+    if save_to_db:
+        gravador.fechar()
+        # Só o backfill completo (sem filtro de tickers) conta como data processada;
+        # registrado depois das previsões para não marcar datas cuja gravação falhou.
+        if not tickers_upper:
+            _registrar_datas(resultados, n_dias)
+
+    resumo = pd.DataFrame([
+        {
+            "data_calculo": r["data_calculo"],
+            "etapa": r["etapa"],
+            "segundos": round(r["segundos"], 2),
+            "previsoes": 0 if r["comp"] is None else len(r["comp"]),
+        }
+        for r in resultados
+    ])
+    tempo_total = time.perf_counter() - inicio_total
+    print("\n📊 Backfill por etapa:")
+    print(resumo.groupby("etapa")["segundos"].agg(["count", "sum", "mean"]).round(2).to_string())
+    print(f"\n✅ Backfill concluído em {tempo_total:.1f}s.")
+    return resumo
@@ -12,12 +12,10 @@ from sklearn.model_selection import TimeSeriesSplit, RandomizedSearchCV
 from pandas.tseries.offsets import BDay
 from src.core.db_connection import get_connection
 from src.models.feature_engineering import (
-    calcular_features_graham_estrito,
-    adicionar_delta_features,
-    adicionar_features_relativas,
     preparar_X,
     FEATURES_CLASSIFICADOR,
 )
+from src.models.feature_store import carregar_indicadores_com_features, UNIVERSO_COTACAO_MIN_1
 
 
 def carregar_dados_completos_do_banco():
@@ -39,6 +37,53 @@ def carregar_dados_completos_do_banco():
         if conn:
             conn.close() #
 
+# Mínimo de retornos válidos num dia para calcular quantis
+MIN_AMOSTRAS_QUANTIL = 4
+
+
+def _rotular_por_quantis_diarios(datas, retornos, q_inferior, q_superior):
+    """
+    Rótulo 0 para retornos <= quantil inferior do dia e 1 para >= quantil
+    superior; NaN no meio e em dias sem amostras suficientes.
+
+    Os dias são agrupados por quantidade de amostras e cada grupo vira uma
+    matriz (dias x n) passada de uma vez a np.percentile(axis=1) — o mesmo
+    cálculo que Series.quantile faz por baixo, então os quantis são idênticos
+    bit a bit aos do antigo loop por data, sem filtrar o DataFrame a cada dia.
+    """
+    rotulos = np.full(len(retornos), np.nan)
+    validos = retornos.notna().to_numpy()
+    if not validos.any():
+        return rotulos
+
+    valores = retornos.to_numpy(dtype=float)[validos]
+    _, codigo_dia = np.unique(datas.to_numpy()[validos], return_inverse=True)
+
+    # Cada dia vira um bloco contíguo em `ordem`
+    ordem = np.argsort(codigo_dia, kind='stable')
+    tamanhos = np.bincount(codigo_dia)
+    inicios = np.concatenate(([0], np.cumsum(tamanhos)[:-1]))
+
+    q_inf = np.full(len(tamanhos), np.nan)
+    q_sup = np.full(len(tamanhos), np.nan)
+    for n in np.unique(tamanhos[tamanhos >= MIN_AMOSTRAS_QUANTIL]):
+        dias = np.flatnonzero(tamanhos == n)
+        blocos = valores[ordem[inicios[dias][:, None] + np.arange(n)]]
+        # Series.quantile chama np.percentile com q * 100
+        q_inf[dias], q_sup[dias] = np.percentile(
+            blocos, [q_inferior * 100.0, q_superior * 100.0], axis=1
+        )
+
+    linha_inf = q_inf[codigo_dia]
+    linha_sup = q_sup[codigo_dia]
+    dia_ok = ~np.isnan(linha_inf) & (linha_inf != linha_sup)
+    rotulo_validos = np.full(len(valores), np.nan)
+    rotulo_validos[dia_ok & (valores <= linha_inf)] = 0
+    rotulo_validos[dia_ok & (valores >= linha_sup)] = 1
+    rotulos[validos] = rotulo_validos
+    return rotulos
+
+
 def calcular_rotulos_desempenho_futuro(df_input, n_dias=10, q_inferior=0.25, q_superior=0.75):
     """
     Calcula os rótulos de desempenho futuro relativo de forma robusta, usando datas.
@@ -96,30 +141,11 @@ def calcular_rotulos_desempenho_futuro(df_input, n_dias=10, q_inferior=0.25, q_s
         np.nan
     )
 
-    # A lógica de cálculo dos quantis para cada dia permanece a mesma, pois é robusta
-    df['rotulo_desempenho_futuro'] = np.nan
-    datas_com_retorno_valido = df.dropna(subset=['retorno_futuro_N_dias'])['data_coleta'].unique()
-
-    for data_atual in datas_com_retorno_valido:
-        # Filtra o dia, garantindo que o retorno seja válido
-        dia_df = df[(df['data_coleta'] == data_atual) & (df['retorno_futuro_N_dias'].notna())].copy()
-
-        if dia_df.empty:
-            continue
-
-        # Verifica se há dados suficientes para calcular quantis
-        if len(dia_df['retorno_futuro_N_dias'].dropna()) < 4: # Precisa de pelo menos 4 pontos para quantis
-            continue
-
-        quantil_inf = dia_df['retorno_futuro_N_dias'].quantile(q_inferior)
-        quantil_sup = dia_df['retorno_futuro_N_dias'].quantile(q_superior)
-
-        indices_dia = dia_df.index
-        
-        # Atribui rótulos apenas se os quantis forem diferentes para evitar classificar tudo igual
-        if quantil_inf != quantil_sup:
-            df.loc[indices_dia[dia_df['retorno_futuro_N_dias'] <= quantil_inf], 'rotulo_desempenho_futuro'] = 0
-            df.loc[indices_dia[dia_df['retorno_futuro_N_dias'] >= quantil_sup], 'rotulo_desempenho_futuro'] = 1
+    # Quantis por dia, vetorizados (mesmas regras do antigo loop por data):
+    # só dias com >= 4 retornos válidos e quantil inferior != superior.
+    df['rotulo_desempenho_futuro'] = _rotular_por_quantis_diarios(
+        df['data_coleta'], df['retorno_futuro_N_dias'], q_inferior, q_superior
+    )
 
     # Remove colunas auxiliares
     df.drop(columns=['data_futura_alvo', 'preco_futuro_N_dias'], inplace=True, errors='ignore')
@@ -197,7 +223,9 @@ def treinar_avaliar_e_salvar_modelo(X_train, y_train, X_colunas_nomes, modelo_ba
     # Salvar o modelo
     modelo_path = os.path.join(modelo_base_path, "modelo_classificador_desempenho.pkl")
     os.makedirs(modelo_base_path, exist_ok=True)
-    joblib.dump(modelo, modelo_path)
+    # Troca atômica: a API pode estar lendo (ou com mmap de) o modelo anterior
+    joblib.dump(modelo, modelo_path + ".tmp")
+    os.replace(modelo_path + ".tmp", modelo_path)
     print(f"\n✅ Modelo final (tuneado) salvo em {modelo_path}")
 
     return modelo
@@ -206,16 +234,17 @@ def executar_pipeline_classificador():
     """Executa todo o pipeline de classificação, com split temporal hold-out antes do tuning."""
     print("Iniciando pipeline do classificador…")
     
-    # 1) Carrega dados
-    df_bruto = carregar_dados_completos_do_banco()
-    if df_bruto.empty:
+    # 1) Carrega dados com Graham, delta features e features relativas (feature store)
+    try:
+        df_com_graham = carregar_indicadores_com_features(UNIVERSO_COTACAO_MIN_1)
+    except (Exception, psycopg2.Error) as error:
+        print(f"Erro ao carregar dados do banco: {error}")
+        df_com_graham = pd.DataFrame()
+    if df_com_graham.empty:
         print("Pipeline encerrado devido à falha no carregamento dos dados.")
         return
 
-    # 2) Calcula Graham, delta features, features relativas e rótulos
-    df_com_graham = calcular_features_graham_estrito(df_bruto)
-    df_com_graham = adicionar_delta_features(df_com_graham, janela_dias=7)
-    df_com_graham = adicionar_features_relativas(df_com_graham)
+    # 2) Calcula rótulos
     df_com_rotulos = calcular_rotulos_desempenho_futuro(df_com_graham, n_dias=10, q_inferior=0.25, q_superior=0.75)
 
     # Qualquer ação com PL ou ROE negativos vira rótulo 0
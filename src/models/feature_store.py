@@ -0,0 +1,227 @@
+"""
+Feature store incremental das features derivadas de feature_engineering.
+
+A tabela features_indicadores guarda, por (universo, acao, data_coleta), as
+colunas calculadas por aplicar_todas_features (Graham, deltas de 7 registros e
+razões vs. mediana diária). Os pipelines de treino leem as features prontas em
+vez de recalcular todo o histórico a cada execução.
+
+Universos: as features relativas (mediana do dia) e os deltas (N registros
+atrás) dependem de quais linhas entram no cálculo. Como o classificador e o
+regressor multi-dia filtram cotacao >= 1.0 e o regressor de um horizonte usa
+todas as linhas, cada filtro tem o seu próprio conjunto de features:
+    UNIVERSO_COMPLETO       → todas as linhas de indicadores_fundamentalistas
+    UNIVERSO_COTACAO_MIN_1  → apenas linhas com cotacao >= 1.0
+
+Atualização incremental (atualizar_feature_store):
+    1. data_inicio = menor data_coleta com linha ainda sem features
+       (ou, se não houver, a última data já gravada — recoletas do mesmo dia
+       sobrescrevem indicadores e mudam a mediana daquele dia);
+    2. carrega as linhas com data_coleta >= data_inicio e, como contexto,
+       os JANELA_DELTA registros anteriores de cada ação;
+    3. recalcula só essa janela e grava via GravadorLote (upsert);
+    4. remove features de linhas que saíram do universo.
+"""
+
+import sys
+from pathlib import Path
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+import time
+
+import pandas as pd
+
+from src.core.db_connection import conexao
+from src.core.gravador_lote import GravadorLote
+from src.models.feature_engineering import (
+    aplicar_todas_features,
+    _COLS_DELTA,
+    _COLS_RELATIVAS,
+    FEATURES_GRAHAM,
+    FEATURES_DELTA_7D,
+    FEATURES_RELATIVAS,
+)
+
+TABELA = "features_indicadores"
+JANELA_DELTA = 7
+
+UNIVERSO_COMPLETO = "completo"
+UNIVERSO_COTACAO_MIN_1 = "cotacao_min_1"
+
+# Filtro SQL aplicado em indicadores_fundamentalistas (alias i) por universo
+_FILTROS_UNIVERSO = {
+    UNIVERSO_COMPLETO: "TRUE",
+    UNIVERSO_COTACAO_MIN_1: "i.cotacao >= 1.0",
+}
+
+# Colunas persistidas (mesma ordem em que aplicar_todas_features as cria)
+FEATURES_DERIVADAS = ['vi_graham'] + FEATURES_GRAHAM + FEATURES_DELTA_7D + FEATURES_RELATIVAS
+
+# Colunas de entrada que aplicar_todas_features lê (e converte para numérico)
+_COLS_ENTRADA = list(dict.fromkeys(['lpa', 'vpa', 'cotacao'] + _COLS_DELTA + _COLS_RELATIVAS))
+
+
+def _filtro(universo: str) -> str:
+    if universo not in _FILTROS_UNIVERSO:
+        raise ValueError(f"Universo desconhecido: {universo!r} (use {list(_FILTROS_UNIVERSO)})")
+    return _FILTROS_UNIVERSO[universo]
+
+
+def _data_inicio_pendente(cur, universo: str):
+    """Primeira data a recalcular, ou None se o universo não tem dados."""
+    cur.execute(
+        f"""
+        SELECT MIN(i.data_coleta)
+        FROM indicadores_fundamentalistas i
+        LEFT JOIN {TABELA} f
+          ON f.universo = %s AND f.acao = i.acao AND f.data_coleta = i.data_coleta
+        WHERE f.acao IS NULL AND {_filtro(universo)}
+        """,
+        (universo,),
+    )
+    primeira_faltante = cur.fetchone()[0]
+    cur.execute(f"SELECT MAX(data_coleta) FROM {TABELA} WHERE universo = %s", (universo,))
+    ultima_gravada = cur.fetchone()[0]
+    candidatas = [d for d in (primeira_faltante, ultima_gravada) if d is not None]
+    return min(candidatas) if candidatas else None
+
+
+def _carregar_janela(conn, universo: str, data_inicio) -> pd.DataFrame:
+    """Linhas a partir de data_inicio + JANELA_DELTA registros anteriores por ação."""
+    colunas = ", ".join(f"i.{c}" for c in ['acao', 'data_coleta'] + _COLS_ENTRADA)
+    filtro = _filtro(universo)
+    query = f"""
+        SELECT {colunas}
+        FROM indicadores_fundamentalistas i
+        WHERE i.data_coleta >= %(inicio)s AND {filtro}
+        UNION ALL
+        SELECT {", ".join(['acao', 'data_coleta'] + _COLS_ENTRADA)}
+        FROM (
+            SELECT {colunas},
+                   ROW_NUMBER() OVER (PARTITION BY i.acao ORDER BY i.data_coleta DESC) AS rn
+            FROM indicadores_fundamentalistas i
+            WHERE i.data_coleta < %(inicio)s AND {filtro}
+        ) contexto
+        WHERE rn <= %(janela)s
+    """
+    df = pd.read_sql_query(query, conn, params={"inicio": data_inicio, "janela": JANELA_DELTA})
+    df['data_coleta'] = pd.to_datetime(df['data_coleta'])
+    return df.sort_values(['acao', 'data_coleta']).reset_index(drop=True)
+
+
+def atualizar_feature_store(universo: str = UNIVERSO_COTACAO_MIN_1, tamanho_lote: int = 5000) -> int:
+    """
+    Calcula e grava as features das datas de coleta ainda não processadas.
+    Retorna o número de linhas gravadas (0 se já estava em dia ou em caso de erro).
+    """
+    t0 = time.perf_counter()
+    try:
+        with conexao() as conn:
+            with conn.cursor() as cur:
+                data_inicio = _data_inicio_pendente(cur, universo)
+            if data_inicio is None:
+                return 0
+            df = _carregar_janela(conn, universo, data_inicio)
+    except Exception as e:
+        print(f"❌ Erro ao consultar feature store ({universo}): {e}")
+        return 0
+
+    df = aplicar_todas_features(df, janela_delta=JANELA_DELTA)
+    df = df[df['data_coleta'] >= pd.Timestamp(data_inicio)]
+    linhas = df[['acao', 'data_coleta'] + FEATURES_DERIVADAS].copy()
+    linhas['data_coleta'] = linhas['data_coleta'].dt.date
+    linhas.insert(0, 'universo', universo)
+
+    gravador = GravadorLote(
+        TABELA,
+        chave=("universo", "acao", "data_coleta"),
+        colunas=list(linhas.columns),
+        tamanho_lote=tamanho_lote,
+        intervalo_flush=float("inf"),
+    )
+    with gravador:
+        gravador.adicionar_varias(linhas.to_dict("records"))
+
+    try:
+        with conexao() as conn, conn.cursor() as cur:
+            cur.execute(
+                f"""
+                DELETE FROM {TABELA} f
+                WHERE f.universo = %s AND f.data_coleta >= %s
+                  AND NOT EXISTS (
+                      SELECT 1 FROM indicadores_fundamentalistas i
+                      WHERE i.acao = f.acao AND i.data_coleta = f.data_coleta
+                        AND {_filtro(universo)}
+                  )
+                """,
+                (universo, data_inicio),
+            )
+    except Exception as e:
+        print(f"⚠️ Não foi possível limpar features obsoletas ({universo}): {e}")
+
+    print(
+        f"✅ Feature store '{universo}': {gravador.linhas_gravadas} linha(s) desde "
+        f"{data_inicio} em {time.perf_counter() - t0:.1f}s."
+    )
+    return gravador.linhas_gravadas
+
+
+def carregar_indicadores_com_features(
+    universo: str = UNIVERSO_COTACAO_MIN_1, atualizar: bool = True
+) -> pd.DataFrame:
+    """
+    Retorna indicadores_fundamentalistas do universo + features derivadas,
+    ordenado por (acao, data_coleta) — equivalente a
+    aplicar_todas_features(SELECT * ... ORDER BY acao, data_coleta).
+
+    Se a feature store estiver incompleta (ou indisponível), calcula as
+    features em memória para o histórico inteiro, como antes.
+    """
+    if atualizar:
+        atualizar_feature_store(universo)
+
+    cols_features = ", ".join(f"f.{c}" for c in FEATURES_DERIVADAS)
+    query = f"""
+        SELECT i.*, {cols_features}, f.acao AS _acao_feature
+        FROM indicadores_fundamentalistas i
+        LEFT JOIN {TABELA} f
+          ON f.universo = %(universo)s AND f.acao = i.acao AND f.data_coleta = i.data_coleta
+        WHERE {_filtro(universo)}
+        ORDER BY i.acao, i.data_coleta
+    """
+    try:
+        with conexao() as conn:
+            df = pd.read_sql_query(query, conn, params={"universo": universo})
+    except Exception as e:
+        print(f"⚠️ Feature store indisponível ({e}); calculando features em memória.")
+        with conexao() as conn:
+            df = pd.read_sql_query(
+                f"SELECT i.* FROM indicadores_fundamentalistas i WHERE {_filtro(universo)} "
+                "ORDER BY i.acao, i.data_coleta;",
+                conn,
+            )
+        df['data_coleta'] = pd.to_datetime(df['data_coleta'])
+        return aplicar_todas_features(df, janela_delta=JANELA_DELTA)
+
+    df['data_coleta'] = pd.to_datetime(df['data_coleta'])
+    faltantes = df['_acao_feature'].isna()
+    df = df.drop(columns=['_acao_feature'])
+
+    if faltantes.any():
+        print(f"⚠️ {int(faltantes.sum())} linha(s) sem features na store; calculando em memória.")
+        return aplicar_todas_features(df.drop(columns=FEATURES_DERIVADAS), janela_delta=JANELA_DELTA)
+
+    # Mesmas conversões que aplicar_todas_features faz nas colunas de entrada
+    for col in _COLS_ENTRADA + FEATURES_DERIVADAS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    print(f"✅ Indicadores + features carregados da feature store '{universo}'. Shape: {df.shape}")
+    return df
+
+
+if __name__ == "__main__":
+    for _universo in _FILTROS_UNIVERSO:
+        atualizar_feature_store(_universo)
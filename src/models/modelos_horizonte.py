@@ -0,0 +1,184 @@
+"""
+Artefatos versionados dos modelos por horizonte do regressor multi-dia.
+
+executar_pipeline_multidia treina uma floresta por horizonte (1..N dias úteis)
+e, ao final, grava em modelo/regressor_multidia/ um artefato com:
+
+    modelos             {n: modelo ajustado}
+    indices_saida       {n: coluna da saída} (modo "multi_saida": um modelo, N saídas)
+    entradas            {n: DataFrame com o registro mais recente de cada ação
+                         (índice = ação), o mesmo usado na previsão do treino}
+    features            lista de features, na ordem do treino
+    data_treino         data_calculo do treino (corte do conjunto de treino)
+    ultima_data_coleta  data_coleta mais recente entre os dados de treino
+    modo_treino, criado_em
+
+Nome do arquivo: v<ultima_data_coleta>-<criado_em>-h<N>-<modo_treino>.pkl —
+a ordem alfabética é a ordem de atualidade. A escrita é atômica (.tmp +
+os.replace). Ficam em disco as últimas VERSOES_MANTIDAS e, além delas, a mais
+recente de cada (horizontes, modo_treino) — um treino avulso com poucos dias
+não apaga o artefato de 10 dias do treino noturno.
+
+Um artefato é reaproveitado (previsão sem treino) quando cobre os horizontes
+pedidos e sua ultima_data_coleta é a data_coleta mais recente do banco até a
+data de cálculo — ou seja, retreinar usaria exatamente os mesmos dados. Com
+`modo_treino`, só serve um artefato treinado nesse modo (o pipeline noturno
+não reaproveita um modelo mais barato). O carregamento passa pelo
+registro_modelos (uma vez por processo e versão).
+
+Configuração (.env):
+    REGRESSOR_MULTIDIA_VERSOES   versões mantidas em disco (padrão 3)
+"""
+
+import sys
+from pathlib import Path
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+import os
+import re
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+import joblib
+import pandas as pd
+from pandas.tseries.offsets import BDay
+
+from src.core.db_connection import conexao
+from src.models.registro_modelos import obter_modelo, invalidar
+
+DIRETORIO = _PROJECT_ROOT / "modelo" / "regressor_multidia"
+VERSOES_MANTIDAS = int(os.getenv("REGRESSOR_MULTIDIA_VERSOES", "3"))
+
+_PADRAO_NOME = re.compile(r"^v(\d{8})-(\d{8}T\d{6})-h(\d+)-([a-z_]+)\.pkl$")
+
+
+def _versoes() -> List[tuple]:
+    """[(ultima_data_coleta, max_dias, modo_treino, caminho)] da mais recente para a mais antiga."""
+    if not DIRETORIO.is_dir():
+        return []
+    versoes = []
+    for caminho in sorted(DIRETORIO.glob("v*.pkl"), key=lambda c: c.name, reverse=True):
+        m = _PADRAO_NOME.match(caminho.name)
+        if m:
+            versoes.append((datetime.strptime(m.group(1), "%Y%m%d").date(),
+                            int(m.group(3)), m.group(4), caminho))
+    return versoes
+
+
+def salvar(
+    modelos: Dict[int, object],
+    entradas: Dict[int, pd.DataFrame],
+    features: List[str],
+    data_treino: date,
+    ultima_data_coleta: date,
+    modo_treino: str,
+    indices_saida: Optional[Dict[int, int]] = None,
+) -> Path:
+    """Grava uma nova versão do artefato e remove as excedentes; devolve o caminho."""
+    criado_em = datetime.now()
+    artefato = {
+        "modelos": modelos,
+        "indices_saida": indices_saida or {},
+        "entradas": entradas,
+        "features": list(features),
+        "data_treino": data_treino,
+        "ultima_data_coleta": ultima_data_coleta,
+        "modo_treino": modo_treino,
+        "criado_em": criado_em,
+    }
+    DIRETORIO.mkdir(parents=True, exist_ok=True)
+    caminho = DIRETORIO / (
+        f"v{ultima_data_coleta:%Y%m%d}-{criado_em:%Y%m%dT%H%M%S}-h{max(modelos)}-{modo_treino}.pkl"
+    )
+    joblib.dump(artefato, str(caminho) + ".tmp")
+    os.replace(str(caminho) + ".tmp", caminho)
+    print(f"✅ Modelos por horizonte salvos em {caminho}")
+    _remover_excedentes()
+    return caminho
+
+
+def _remover_excedentes() -> None:
+    versoes = _versoes()
+    manter = {caminho for *_, caminho in versoes[:max(1, VERSOES_MANTIDAS)]}
+    vistos = set()
+    for _, horizontes, modo, caminho in versoes:
+        if (horizontes, modo) not in vistos:
+            vistos.add((horizontes, modo))
+            manter.add(caminho)
+    for *_, antigo in versoes:
+        if antigo not in manter:
+            invalidar(antigo)
+            antigo.unlink(missing_ok=True)
+
+
+def ultima_data_coleta_banco(data_calculo: date) -> Optional[date]:
+    """data_coleta mais recente (universo cotacao >= 1) até data_calculo."""
+    with conexao() as conn, conn.cursor() as cur:
+        cur.execute(
+            "SELECT MAX(data_coleta) FROM indicadores_fundamentalistas "
+            "WHERE cotacao >= 1.0 AND data_coleta <= %s",
+            (data_calculo,),
+        )
+        ultima = cur.fetchone()[0]
+    return pd.Timestamp(ultima).date() if ultima is not None else None
+
+
+def carregar_vigente(max_dias: int, data_calculo: date,
+                     modo_treino: Optional[str] = None) -> Optional[Dict]:
+    """
+    Artefato que serve a previsão de 1..max_dias em data_calculo sem retreinar,
+    ou None se não houver um atualizado (nenhum salvo, horizontes insuficientes,
+    outro modo de treino ou dados novos no banco desde o treino).
+    """
+    candidatos = [
+        (ultima, caminho) for ultima, horizontes, modo, caminho in _versoes()
+        if horizontes >= max_dias and ultima <= data_calculo
+        and (modo_treino is None or modo == modo_treino)
+    ]
+    if not candidatos:
+        return None
+    ultima, caminho = candidatos[0]
+    if ultima != ultima_data_coleta_banco(data_calculo):
+        print(f"⚠️ Modelos por horizonte desatualizados (treinados com dados até {ultima}).")
+        return None
+    return obter_modelo(caminho)
+
+
+def prever(artefato: Dict, max_dias: int, data_calculo: date,
+           tickers: Optional[List[str]] = None) -> pd.DataFrame:
+    """Previsões de 1..max_dias no formato de executar_pipeline_multidia, só com predict."""
+    tickers_upper = [t.upper() for t in tickers] if tickers else None
+    previsoes = []
+    for n in range(1, max_dias + 1):
+        entradas = artefato["entradas"].get(n)
+        if entradas is None:
+            continue
+        if tickers_upper is not None:
+            entradas = entradas[entradas.index.isin(tickers_upper)]
+        if entradas.empty:
+            continue
+        preds = artefato["modelos"][n].predict(entradas[artefato["features"]])
+        if n in artefato["indices_saida"]:
+            preds = preds[:, artefato["indices_saida"][n]]
+        previsoes.append(pd.DataFrame({
+            'acao': entradas.index.values,
+            'data_previsao': [(pd.Timestamp(data_calculo) + BDay(n)).date()] * len(entradas),
+            'preco_previsto': preds,
+            'dias_a_frente': n,
+        }))
+    if not previsoes:
+        return pd.DataFrame()
+    return pd.concat(previsoes, ignore_index=True).sort_values(['acao', 'dias_a_frente'])
+
+
+def prever_com_modelos_salvos(max_dias: int, data_calculo: date,
+                              tickers: Optional[List[str]] = None,
+                              modo_treino: Optional[str] = None) -> Optional[pd.DataFrame]:
+    """Atalho: previsão pelo artefato vigente (de qualquer modo, se None), ou None se for preciso treinar."""
+    artefato = carregar_vigente(max_dias, data_calculo, modo_treino)
+    if artefato is None:
+        return None
+    return prever(artefato, max_dias, data_calculo, tickers)
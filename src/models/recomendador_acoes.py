@@ -1,4 +1,4 @@
-import os, sys, pandas as pd, numpy as np, joblib
+import sys, pandas as pd, numpy as np
 from pathlib import Path
 
 _PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
@@ -14,8 +14,13 @@ def coletar_indicadores(ticker: str):
         return f"❌ {ticker} - sem dados em nenhuma fonte"
     log = "\n".join(f"  {k}: {v}" for k, v in dados.items())
     return dados, log
-from src.core.db_connection import get_connection
-from concurrent.futures import ProcessPoolExecutor, as_completed
+import time
+from datetime import date
+from src.core.gravador_lote import GravadorLote
+from src.data import historico_precos
+from src.data.snapshot_indicadores import carregar_snapshot
+from src.models import registro_modelos, snapshot_recomendacoes
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 
 # Lista de features EXATAMENTE como o modelo foi treinado
 FEATURES_ESPERADAS_PELO_MODELO = [
@@ -51,7 +56,8 @@ def calcular_preco_sobre_graham_para_recomendacao(dados_acao_dict):
     return dados_copy
 
 def carregar_artefatos_modelo():
-    modelo_path = _PROJECT_ROOT / "modelo" / "modelo_classificador_desempenho.pkl"
+    """Modelo do classificador, em cache no processo (ver registro_modelos)."""
+    modelo_path = registro_modelos.CAMINHO_CLASSIFICADOR
     if not modelo_path.is_file():
         raise FileNotFoundError(
             "Modelo de classificação ainda não foi gerado.\n\n"
@@ -63,8 +69,115 @@ def carregar_artefatos_modelo():
             "  bash:\n"
             "    PYTHONPATH=. python src/models/classificador.py\n"
         )
-    modelo = joblib.load(str(modelo_path))
-    return modelo
+    return registro_modelos.obter_modelo(modelo_path)
+
+
+def justificativas_por_regras(valores):
+    """
+    Pontos positivos e de atenção (regras heurísticas com filtros de sanidade)
+    para os indicadores em `valores` (dict ou Series: coluna → valor).
+    Retorna (justificativas_positivas, justificativas_negativas).
+    """
+    justificativas_positivas = []
+    justificativas_negativas = []
+
+    def _v(col):
+        return pd.to_numeric(valores.get(col, np.nan), errors='coerce')
+
+    pl = _v('pl')
+    pvp = _v('pvp')
+    dy = _v('dividend_yield')
+    roe = _v('roe')
+    psg = _v('preco_sobre_graham')
+    var12m = _v('variacao_12m')
+    margem_liq = _v('margem_liquida')
+    p_ebit = _v('p_ebit')
+
+    # P/L (Preço/Lucro)
+    if pd.notna(pl):
+        if pl <= 0:
+            justificativas_negativas.append(f"Empresa com prejuízo (P/L={pl:.2f}).")
+        elif 0 < pl < 2:
+            justificativas_negativas.append(f"P/L excessivamente baixo ({pl:.2f}), pode indicar alto risco ou distorções.")
+        elif 2 <= pl < 10:
+            justificativas_positivas.append(f"P/L baixo ({pl:.2f}), pode indicar subavaliação.")
+        elif 10 <= pl < 20:
+            justificativas_positivas.append(f"P/L em nível razoável ({pl:.2f}).")
+        elif pl >= 20:
+            justificativas_negativas.append(f"P/L elevado ({pl:.2f}).")
+
+    # P/VP (Preço/Valor Patrimonial)
+    if pd.notna(pvp):
+        if pvp <= 0:
+            justificativas_negativas.append(f"Patrimônio líquido negativo ou zero (P/VP={pvp:.2f}).")
+        elif 0 < pvp < 1:
+            justificativas_positivas.append(f"P/VP < 1 ({pvp:.2f}), pode estar descontada em relação ao VPA.")
+        elif 1 <= pvp < 2:
+            justificativas_positivas.append(f"P/VP razoável ({pvp:.2f}).")
+        elif pvp >= 2:
+            justificativas_negativas.append(f"P/VP pode ser considerado alto ({pvp:.2f}).")
+
+    # Dividend Yield
+    if pd.notna(dy):
+        if dy >= 6:
+            justificativas_positivas.append(f"Excelente Dividend Yield ({dy:.2f}%).")
+        elif 4 <= dy < 6:
+            justificativas_positivas.append(f"Bom Dividend Yield ({dy:.2f}%).")
+        elif 0 <= dy < 2:
+            justificativas_negativas.append(f"Dividend Yield baixo ({dy:.2f}%).")
+        elif dy < 0:
+            justificativas_negativas.append(f"Dividend Yield negativo ({dy:.2f}%), requer atenção.")
+
+    # ROE (Retorno sobre Patrimônio)
+    if pd.notna(roe):
+        if roe > 50:
+            justificativas_negativas.append(f"ROE extremamente alto ({roe:.2f}%), pode indicar distorção contábil ou patrimônio muito baixo.")
+        elif 20 <= roe <= 50:
+            justificativas_positivas.append(f"Excelente rentabilidade (ROE {roe:.2f}%).")
+        elif 15 <= roe < 20:
+            justificativas_positivas.append(f"Boa rentabilidade (ROE {roe:.2f}%).")
+        elif 0 <= roe < 10:
+            justificativas_negativas.append(f"Rentabilidade (ROE {roe:.2f}%) pode ser melhorada.")
+        elif roe < 0:
+            justificativas_negativas.append(f"Rentabilidade negativa (ROE {roe:.2f}%).")
+
+    # Preço sobre Valor de Graham
+    if pd.notna(psg):
+        if psg < 0.75:
+            justificativas_positivas.append(f"Preço atrativo pelo Valor de Graham (P/VG {psg:.2f}).")
+        elif 0.75 <= psg < 1.2:
+            justificativas_positivas.append(f"Preço razoável pelo Valor de Graham (P/VG {psg:.2f}).")
+        elif psg >= 1.5:
+            justificativas_negativas.append(f"Preço elevado pelo Valor de Graham (P/VG {psg:.2f}).")
+
+    # Variação 12 meses
+    if pd.notna(var12m):
+        if var12m > 15:
+            justificativas_positivas.append(f"Boa valorização recente (Variação 12M: {var12m:.2f}%).")
+        elif var12m < -15:
+            justificativas_negativas.append(f"Desvalorização considerável recente (Variação 12M: {var12m:.2f}%).")
+
+    # Margem Líquida
+    if pd.notna(margem_liq):
+        if margem_liq > 40:
+            justificativas_negativas.append(f"Margem líquida extremamente alta ({margem_liq:.2f}%), pode indicar lucro não recorrente.")
+        elif 15 < margem_liq <= 40:
+            justificativas_positivas.append(f"Excelente margem líquida ({margem_liq:.2f}%).")
+        elif 5 <= margem_liq <= 15:
+            justificativas_positivas.append(f"Margem líquida razoável ({margem_liq:.2f}%).")
+        elif margem_liq < 5:
+            justificativas_negativas.append(f"Margem líquida apertada ou negativa ({margem_liq:.2f}%).")
+
+    # P/EBIT
+    if pd.notna(p_ebit):
+        if p_ebit <= 0:
+            justificativas_negativas.append(f"EBIT negativo ou zero (P/EBIT={p_ebit:.2f}).")
+        elif 0 < p_ebit < 10:
+            justificativas_positivas.append(f"P/EBIT atrativo ({p_ebit:.2f}).")
+        elif p_ebit >= 15:
+            justificativas_negativas.append(f"P/EBIT elevado ({p_ebit:.2f}).")
+
+    return justificativas_positivas, justificativas_negativas
 
 
 def gerar_justificativas(dados_acao_df, predicao_modelo):
@@ -72,101 +185,9 @@ def gerar_justificativas(dados_acao_df, predicao_modelo):
     justificativas_negativas = []
 
     try:
-        # Função auxiliar para extrair features numericamente de forma segura
-        def get_numeric_feature(df, col_name):
-            if col_name not in df.columns: # Verificação para evitar KeyErrors
-                return np.nan
-            return pd.to_numeric(df[col_name].iloc[0], errors='coerce')
-
-        pl = get_numeric_feature(dados_acao_df, 'pl')
-        pvp = get_numeric_feature(dados_acao_df, 'pvp')
-        dy = get_numeric_feature(dados_acao_df, 'dividend_yield')
-        roe = get_numeric_feature(dados_acao_df, 'roe')
-        psg = get_numeric_feature(dados_acao_df, 'preco_sobre_graham')
-        var12m = get_numeric_feature(dados_acao_df, 'variacao_12m')
-        margem_liq = get_numeric_feature(dados_acao_df, 'margem_liquida')
-        p_ebit = get_numeric_feature(dados_acao_df,'p_ebit')
-
-        # ================== LÓGICA DE JUSTIFICATIVAS REFINADA COM FILTROS DE SANIDADE ==================
-        
-        # P/L (Preço/Lucro)
-        if pd.notna(pl):
-            if pl <= 0:
-                justificativas_negativas.append(f"Empresa com prejuízo (P/L={pl:.2f}).")
-            # Filtro de Sanidade: P/L muito baixo pode ser um sinal de risco.
-            elif 0 < pl < 2:
-                justificativas_negativas.append(f"P/L excessivamente baixo ({pl:.2f}), pode indicar alto risco ou distorções.")
-            elif 2 <= pl < 10:
-                justificativas_positivas.append(f"P/L baixo ({pl:.2f}), pode indicar subavaliação.")
-            elif 10 <= pl < 20:
-                justificativas_positivas.append(f"P/L em nível razoável ({pl:.2f}).")
-            elif pl >= 20:
-                justificativas_negativas.append(f"P/L elevado ({pl:.2f}).")
-
-        # P/VP (Preço/Valor Patrimônio)
-        if pd.notna(pvp):
-            if pvp <= 0:
-                justificativas_negativas.append(f"Patrimônio líquido negativo ou zero (P/VP={pvp:.2f}).")
-            elif 0 < pvp < 1:
-                justificativas_positivas.append(f"P/VP < 1 ({pvp:.2f}), pode estar descontada em relação ao VPA.")
-            elif 1 <= pvp < 2:
-                justificativas_positivas.append(f"P/VP razoável ({pvp:.2f}).")
-            elif pvp >= 2:
-                justificativas_negativas.append(f"P/VP pode ser considerado alto ({pvp:.2f}).")
-
-        # Dividend Yield (em %)
-        if pd.notna(dy):
-            if dy >= 6: justificativas_positivas.append(f"Excelente Dividend Yield ({dy:.2f}%).")
-            elif 4 <= dy < 6: justificativas_positivas.append(f"Bom Dividend Yield ({dy:.2f}%).")
-            elif 0 <= dy < 2: justificativas_negativas.append(f"Dividend Yield baixo ({dy:.2f}%).")
-            elif dy < 0: justificativas_negativas.append(f"Dividend Yield negativo ({dy:.2f}%), requer atenção.")
-
-        # ROE (Retorno sobre o Patrimônio Líquido, em %)
-        if pd.notna(roe):
-            # Filtro de Sanidade: ROE muito alto é suspeito.
-            if roe > 50:
-                justificativas_negativas.append(f"ROE extremamente alto ({roe:.2f}%), pode indicar distorção contábil ou patrimônio muito baixo.")
-            elif 20 <= roe <= 50:
-                justificativas_positivas.append(f"Excelente rentabilidade (ROE {roe:.2f}%).")
-            elif 15 <= roe < 20:
-                justificativas_positivas.append(f"Boa rentabilidade (ROE {roe:.2f}%).")
-            elif 0 <= roe < 10:
-                justificativas_negativas.append(f"Rentabilidade (ROE {roe:.2f}%) pode ser melhorada.")
-            elif roe < 0:
-                justificativas_negativas.append(f"Rentabilidade negativa (ROE {roe:.2f}%).")
-
-        # Preco_Sobre_Graham
-        if pd.notna(psg):
-            if psg < 0.75: justificativas_positivas.append(f"Preço atrativo pelo Valor de Graham (P/VG {psg:.2f}).")
-            elif 0.75 <= psg < 1.2: justificativas_positivas.append(f"Preço razoável pelo Valor de Graham (P/VG {psg:.2f}).")
-            elif psg >= 1.5: justificativas_negativas.append(f"Preço elevado pelo Valor de Graham (P/VG {psg:.2f}).")
-
-        # Variacao_12m (em %)
-        if pd.notna(var12m):
-            if var12m > 15: justificativas_positivas.append(f"Boa valorização recente (Variação 12M: {var12m:.2f}%).")
-            elif var12m < -15: justificativas_negativas.append(f"Desvalorização considerável recente (Variação 12M: {var12m:.2f}%).")
-        
-        # Margem Líquida (em %)
-        if pd.notna(margem_liq):
-            # Filtro de Sanidade: Margem muito alta é suspeita.
-            if margem_liq > 40:
-                justificativas_negativas.append(f"Margem líquida extremamente alta ({margem_liq:.2f}%), pode indicar lucro não recorrente.")
-            elif 15 < margem_liq <= 40:
-                justificativas_positivas.append(f"Excelente margem líquida ({margem_liq:.2f}%).")
-            elif 5 <= margem_liq <= 15:
-                justificativas_positivas.append(f"Margem líquida razoável ({margem_liq:.2f}%).")
-            elif margem_liq < 5:
-                justificativas_negativas.append(f"Margem líquida apertada ou negativa ({margem_liq:.2f}%).")
-
-        # P/EBIT
-        if pd.notna(p_ebit):
-            if p_ebit <= 0:
-                justificativas_negativas.append(f"EBIT negativo ou zero (P/EBIT={p_ebit:.2f}).")
-            elif 0 < p_ebit < 10:
-                justificativas_positivas.append(f"P/EBIT atrativo ({p_ebit:.2f}).")
-            elif p_ebit >= 15:
-                justificativas_negativas.append(f"P/EBIT elevado ({p_ebit:.2f}).")
-
+        justificativas_positivas, justificativas_negativas = justificativas_por_regras(
+            dados_acao_df.iloc[0]
+        )
     except Exception as e:
         print(f"Erro ao gerar justificativas: {e}")
 
@@ -192,128 +213,291 @@ def gerar_justificativas(dados_acao_df, predicao_modelo):
     else:
         print("\nNenhum ponto negativo/de atenção destacado pelas regras heurísticas atuais para esta ação.")
 
-def _processar_ticker(ticker):
+# Tickers avaliados na recomendação em lote
+ACOES_RECOMENDACAO = [
+    "AALR3","ABCB4","ABEV3","ADHM3","AERI3","AESB3","AFLT3","AGRO3","AGXY3","AHEB3","AHEB5","AHEB6","ALLD3","ALOS3","ALPA3",
+    "ALPA4","ALPK3","ALUP11","ALUP3","ALUP4","AMAR3","AMBP3","AMER3","AMOB3","ANIM3","APER3","APTI3","APTI4","ARML3","ASAI3",
+    "AURA33","AURE3","AVLL3","AZEV3","AZEV4","AZTE3","AZUL4","AZZA3","B3SA3","BAHI3","BALM3","BALM4","BAUH3","BAUH4","BAZA3",
+    "BBAS3","BBDC3","BBDC4","BBML3","BBSE3","BDLL3","BDLL4","BEEF3","BEES3","BEES4","BFRE11","BFRE12","BGIP3","BGIP4","BHIA3",
+    "BIDI11","BIDI3","BIDI4","BIOM3","BLAU3","BLUT3","BLUT4","BMEB3","BMEB4","BMGB4","BMIN3","BMIN4","BMKS3","BMOB3","BNBR3",
+    "BOAS3","BOBR3","BOBR4","BPAC11","BPAC3","BPAC5","BPAN4","BPAR3","BPAT33","BPHA3","BRAP3","BRAP4","BRAV3","BRBI11","BRBI3",
+    "BRBI4","BRFS3","BRGE11","BRGE12","BRGE3","BRGE5","BRGE6","BRGE7","BRGE8","BRIV3","BRIV4","BRKM3","BRKM5","BRKM6","BRML3",
+    "BRPR3","BRQB3","BRSR3","BRSR5","BRSR6","BRST3","BSEV3","BSLI3","BSLI4","BTTL4","CALI3","CALI4","CAMB3","CAMB4","CAML3",
+    "CASH3","CASN3","CASN4","CATA3","CATA4","CBAV3","CBEE3","CCXC3","CEAB3","CEBR3","CEBR5","CEBR6","CEDO3","CEDO4","CEEB3",
+    "CEEB5","CEEB6","CEED3","CEED4","CEGR3","CEPE3","CEPE5","CEPE6","CESP3","CESP5","CESP6","CGAS3","CGAS5","CGRA3","CGRA4",
+    "CIEL3","CLSA3","CLSC3","CLSC4","CMIG3","CMIG4","CMIN3","CMSA3","CMSA4","CNSY3","COCE3","COCE5","COCE6","COGN3","CORR3",
+    "CORR4","CPFE3","CPLE3","CPLE5","CPLE6","CPRE3","CREM3","CRFB3","CRIV3","CRIV4","CRPG3","CRPG5","CRPG6","CSAB3","CSAB4",
+    "CSAN3","CSED3","CSMG3","CSNA3","CSRN3","CSRN5","CSRN6","CSUD3","CTAX3","CTCA3","CTKA3","CTKA4","CTNM3","CTNM4","CTSA3",
+    "CTSA4","CTSA8","CURY3","CVCB3","CXSE3","CYRE3","DASA3","DESK3","DEXP3","DEXP4","DIRR3","DMMO3","DMVF3","DOHL3","DOHL4",
+    "DOTZ3","DTCY3","DTCY4","DXCO3","EALT3","EALT4","ECOR3","ECPR3","ECPR4","EEEL3","EEEL4","EGIE3","EKTR3","EKTR4","ELEK3",
+    "ELEK4","ELET3","ELET5","ELET6","ELMD3","ELPL3","EMAE3","EMAE4","EMBR3","ENAT3","ENBR3","ENEV3","ENGI11","ENGI3","ENGI4",
+    "ENJU3","ENMA3B","ENMA6B","ENMT3","ENMT4","EPAR3","EQPA3","EQPA5","EQPA6","EQPA7","EQTL3","ESPA3","ESTR3","ESTR4","ETER3",
+    "EUCA3","EUCA4","EVEN3","EZTC3","FBMC3","FBMC4","FESA3","FESA4","FHER3","FICT3","FIEI3","FIGE3","FIGE4","FIQE3","FLEX3",
+    "FLRY3","FNCN3","FRAS3","FRIO3","FRTA3","FTRT3B","G2DI33","GBIO33","GEPA3","GEPA4","GETT11","GETT3","GETT4","GFSA3","GGBR3",
+    "GGBR4","GGPS3","GMAT3","GNDI3","GOAU3","GOAU4","GOLL4","GPAR3","GPIV33","GRAO3","GRND3","GSHP3","GUAR3","HAGA3","HAGA4",
+    "HAPV3","HBOR3","HBRE3","HBSA3","HBTS3","HBTS5","HBTS6","HETA3","HETA4","HGTX3","HOOT3","HOOT4","HYPE3","IDVL3","IDVL4",
+    "IFCM3","IGBR3","IGSN3","IGTA3","IGTI11","IGTI3","IGTI4","INEP3","INEP4","INNT3","INTB3","IRBR3","ISAE3","ISAE4","ITEC3",
+    "ITSA3","ITSA4","ITUB3","ITUB4","JALL3","JBSS3","JFEN3","JHSF3","JOPA3","JOPA4","JSLG3","KEPL3","KLBN11","KLBN3","KLBN4",
+    "KRSA3","LAME3","LAME4","LAND3","LAVV3","LCAM3","LEVE3","LHER3","LHER4","LIGT3","LINX3","LIPR3","LJQQ3","LOGG3","LOGN3",
+    "LPSB3","LREN3","LTEL3B","LUPA3","LUXM3","LUXM4","LVTC3","LWSA3","MAPT3","MAPT4","MATD3","MDIA3","MDNE3","MEAL3","MELK3",
+    "MERC3","MERC4","MGEL3","MGEL4","MGLU3","MILS3","MLAS3","MMXM3","MNDL3","MNPR3","MOAR3","MODL11","MODL3","MODL4","MOSI3",
+    "MOTV3","MOVI3","MRFG3","MRSA3B","MRSA5B","MRSA6B","MRVE3","MSPA3","MSPA4","MSRO3","MTIG3","MTIG4","MTRE3","MTSA3","MTSA4",
+    "MULT3","MWET3","MWET4","MYPK3","NAFG3","NAFG4","NATU3","NEMO3","NEMO4","NEMO5","NEMO6","NEOE3","NEXP3","NGRD3","NORD3",
+    "NRTQ3","NTCO3","NUTR3","ODER3","ODER4","ODPV3","OFSA3","OGXP3","OIBR3","OIBR4","OMGE3","ONCO3","OPCT3","ORVR3","OSXB3",
+    "PARD3","PATI3","PATI4","PCAR3","PCAR4","PDGR3","PDTC3","PEAB3","PEAB4","PETR3","PETR4","PETZ3","PFRM3","PGMN3","PINE3",
+    "PINE4","PLAS3","PLPL3","PMAM3","PNVL3","PNVL4","POMO3","POMO4","PORT3","POSI3","POWE3","PPAR3","PPAR4","PPLA11","PRIO3",
+    "PRNR3","PSSA3","PTBL3","PTCA11","PTCA3","PTNT3","PTNT4","QUAL3","QUSW3","QVQP3B","RADL3","RAIL3","RAIZ4","RANI3","RANI4",
+    "RAPT3","RAPT4","RCSL3","RCSL4","RDNI3","RDOR3","REAG3","RECV3","REDE3","RENT3","RLOG3","RNEW11","RNEW3","RNEW4","ROMI3",
+    "RPAD3","RPAD5","RPAD6","RPMG3","RSID3","RSUL3","RSUL4","SANB11","SANB3","SANB4","SAPR11","SAPR3","SAPR4","SBFG3","SBSP3",
+    "SCAR3","SEDU3","SEER3","SEQL3","SGPS3","SHOW3","SHUL3","SHUL4","SIMH3","SLCE3","SLED3","SLED4","SMFT3","SMLS3","SMTO3",
+    "SNSY3","SNSY5","SNSY6","SOJA3","SOMA3","SOND3","SOND5","SOND6","SPRT3B","SQIA3","SRNA3","STBP3","STKF3","STTR3","SULA11",
+    "SULA3","SULA4","SUZB3","SYNE3","TAEE11","TAEE3","TAEE4","TASA3","TASA4","TCNO3","TCNO4","TCSA3","TECN3","TEKA3","TEKA4",
+    "TELB3","TELB4","TEND3","TESA3","TFCO4","TGMA3","TIET11","TIET3","TIET4","TIMS3","TKNO3","TKNO4","TOKY3","TOTS3","TOYB3",
+    "TOYB4","TPIS3","TRAD3","TRIS3","TTEN3","TUPY3","TXRX3","TXRX4","UCAS3","UGPA3","UNIP3","UNIP5","UNIP6","USIM3","USIM5",
+    "USIM6","VALE3","VAMO3","VBBR3","VITT3","VIVA3","VIVR3","VIVT3","VIVT4","VLID3","VSPT3","VSPT4","VSTE3","VTRU3","VULC3",
+    "VVEO3","WEGE3","WEST3","WHRL3","WHRL4","WIZC3","WLMM3","WLMM4","YDUQ3","ZAMP3"
+]
+
+
+def texto_recomendacao(prob_sim: float) -> str:
+    """Faixa de recomendação gravada em recomendacoes_acoes.resultado."""
+    if prob_sim >= 0.75:
+        return "FORTEMENTE RECOMENDADA PARA COMPRA!"
+    if prob_sim >= 0.60:
+        return "RECOMENDADA PARA COMPRA"
+    if prob_sim >= 0.50:
+        return "PARCIALMENTE RECOMENDADA (Viés positivo)"
+    if prob_sim >= 0.40:
+        return "PARCIALMENTE NÃO RECOMENDADA (Viés negativo)"
+    if prob_sim >= 0.25:
+        return "NÃO RECOMENDADA PARA COMPRA"
+    return "FORTEMENTE NÃO RECOMENDADA PARA COMPRA"
+
+
+def texto_resultado_exibicao(prob_sim: float) -> str:
+    """Faixa de recomendação devolvida pela API (/recomendacao)."""
+    if prob_sim >= 0.75:
+        return "FORTEMENTE RECOMENDADA para compra"
+    if prob_sim >= 0.60:
+        return "RECOMENDADA para compra"
+    if prob_sim >= 0.50:
+        return "PARCIALMENTE RECOMENDADA (Viés positivo)"
+    if prob_sim >= 0.40:
+        return "PARCIALMENTE NÃO RECOMENDADA (Viés negativo)"
+    if prob_sim >= 0.25:
+        return "NÃO RECOMENDADA para compra"
+    return "FORTEMENTE NÃO RECOMENDADA para compra"
+
+
+def montar_resposta_recomendacao(ticker, prob_sim, prob_nao, valores):
     """
-    Função worker para processar um único ticker e inserir no banco.
-    Retorna uma tupla (ticker, sucesso, mensagem).
+    Payload de /recomendacao (sem explicacao_ia) para uma linha de features
+    do modelo (`valores`: dict ou Series). Usado pela API e pelo snapshot
+    noturno (recomendacoes_snapshot).
     """
+    justificativas_positivas, justificativas_negativas = justificativas_por_regras(valores)
+    indicadores_chave = {}
+    for feat in FEATURES_CHAVE_PARA_EXIBIR_E_JUSTIFICAR:
+        val = pd.to_numeric(valores.get(feat), errors='coerce')
+        indicadores_chave[feat] = None if pd.isna(val) or not np.isfinite(val) else float(val)
+
+    return {
+        "ticker": ticker,
+        "resultado": texto_resultado_exibicao(prob_sim),
+        "probabilidades": {
+            "nao_recomendada": float(prob_nao),
+            "recomendada": float(prob_sim),
+        },
+        "indicadores_chave": indicadores_chave,
+        "justificativas_positivas": justificativas_positivas,
+        "justificativas_negativas": justificativas_negativas,
+    }
+
+
+def montar_matriz_features(lista_dados: list[dict]) -> pd.DataFrame:
+    """
+    Matriz X (uma linha por dict) com FEATURES_ESPERADAS_PELO_MODELO, na ordem
+    do treino; valores não numéricos ou ausentes viram 0.
+    """
+    df = pd.DataFrame.from_records(
+        [calcular_preco_sobre_graham_para_recomendacao(d) for d in lista_dados]
+    ).reindex(columns=FEATURES_ESPERADAS_PELO_MODELO)
+    return df.apply(pd.to_numeric, errors='coerce').astype(float).fillna(0)
+
+
+def _coletar_ticker(ticker):
+    """Etapa de coleta (I/O) de um ticker. Retorna (ticker, dados ou None, mensagem)."""
     try:
         resultado = coletar_indicadores(ticker)
         if not resultado or isinstance(resultado, str):
-            return ticker, False, "scraper falhou"
-
-        dados_brutos, _ = resultado
-        dados = calcular_preco_sobre_graham_para_recomendacao(dados_brutos)
-        df = pd.DataFrame([dados])
-
-        # Prepara X_final
-        X = pd.DataFrame(columns=FEATURES_ESPERADAS_PELO_MODELO, index=[0])
-        for col in FEATURES_ESPERADAS_PELO_MODELO:
-            if col in df.columns:
-                X.loc[0, col] = pd.to_numeric(df.loc[0, col], errors='coerce')
-        X_final = X.fillna(0)[FEATURES_ESPERADAS_PELO_MODELO]
-
-        # Carrega o modelo e faz a previsão
-        modelo = carregar_artefatos_modelo()
-        proba = modelo.predict_proba(X_final)[0]
-        prob_nao, prob_sim = proba[0], proba[1]
-        # converte de numpy.float64 para float
-        prob_nao = float(prob_nao)
-        prob_sim = float(prob_sim)
-
-        # Define o texto do resultado
-        if prob_sim >= 0.75:
-            texto = "FORTEMENTE RECOMENDADA PARA COMPRA!"
-        elif prob_sim >= 0.60:
-            texto = "RECOMENDADA PARA COMPRA"
-        elif prob_sim >= 0.50:
-            texto = "PARCIALMENTE RECOMENDADA (Viés positivo)"
-        elif prob_sim >= 0.40:
-            texto = "PARCIALMENTE NÃO RECOMENDADA (Viés negativo)"
-        elif prob_sim >= 0.25:
-            texto = "NÃO RECOMENDADA PARA COMPRA"
-        else:
-            texto = "FORTEMENTE NÃO RECOMENDADA PARA COMPRA"
-
-        # Insere no PostgreSQL (upsert: uma linha por acao por dia)
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute(
-            """
-            INSERT INTO public.recomendacoes_acoes
-               (acao, recomendada, nao_recomendada, resultado, data_recomendacao)
-            VALUES (%s, %s, %s, %s, CURRENT_DATE)
-            ON CONFLICT (acao, data_recomendacao) DO UPDATE SET
-                recomendada     = EXCLUDED.recomendada,
-                nao_recomendada = EXCLUDED.nao_recomendada,
-                resultado       = EXCLUDED.resultado
-            """,
-            (ticker, prob_sim, prob_nao, texto)
-        )
-        conn.commit()
-        cur.close()
-        conn.close()
-
-        return ticker, True, f"{prob_sim:.2%}"
+            return ticker, None, "scraper falhou"
+        return ticker, resultado[0], ""
     except Exception as e:
-        return ticker, False, str(e)
+        return ticker, None, str(e)
+
 
-def recomendar_varias_acoes(conn):
+def recomendar_varias_acoes(conn=None, tickers=None, max_workers=8, max_idade_horas=None):
     """
-    Executa recomendação em paralelo para todos os tickers
-    usando (n_cores - 1) workers.
+    Recomendação em lote, em três etapas:
+      1. indicadores: linha de hoje em indicadores_fundamentalistas quando
+         tem no máximo `max_idade_horas` horas (ver snapshot_indicadores;
+         0 força a coleta ao vivo); os demais tickers são coletados de forma
+         concorrente (threads; cada fonte respeita o próprio limitador de taxa);
+      2. uma única chamada a predict_proba com a matriz de todos os tickers;
+      3. um único upsert em lote em recomendacoes_acoes e outro em
+         recomendacoes_snapshot (payload da API pronto para servir).
+
+    `conn` é ignorado (mantido por compatibilidade de assinatura): a coleta e
+    a gravação pegam conexões do pool só quando precisam — não passe uma
+    conexão emprestada, ela ficaria ocupada a execução inteira. Retorna um
+    DataFrame com as recomendações geradas.
     """
-    tickers = [
-        "AALR3","ABCB4","ABEV3","ADHM3","AERI3","AESB3","AFLT3","AGRO3","AGXY3","AHEB3","AHEB5","AHEB6","ALLD3","ALOS3","ALPA3",
-        "ALPA4","ALPK3","ALUP11","ALUP3","ALUP4","AMAR3","AMBP3","AMER3","AMOB3","ANIM3","APER3","APTI3","APTI4","ARML3","ASAI3",
-        "AURA33","AURE3","AVLL3","AZEV3","AZEV4","AZTE3","AZUL4","AZZA3","B3SA3","BAHI3","BALM3","BALM4","BAUH3","BAUH4","BAZA3",
-        "BBAS3","BBDC3","BBDC4","BBML3","BBSE3","BDLL3","BDLL4","BEEF3","BEES3","BEES4","BFRE11","BFRE12","BGIP3","BGIP4","BHIA3",
-        "BIDI11","BIDI3","BIDI4","BIOM3","BLAU3","BLUT3","BLUT4","BMEB3","BMEB4","BMGB4","BMIN3","BMIN4","BMKS3","BMOB3","BNBR3",
-        "BOAS3","BOBR3","BOBR4","BPAC11","BPAC3","BPAC5","BPAN4","BPAR3","BPAT33","BPHA3","BRAP3","BRAP4","BRAV3","BRBI11","BRBI3",
-        "BRBI4","BRFS3","BRGE11","BRGE12","BRGE3","BRGE5","BRGE6","BRGE7","BRGE8","BRIV3","BRIV4","BRKM3","BRKM5","BRKM6","BRML3",
-        "BRPR3","BRQB3","BRSR3","BRSR5","BRSR6","BRST3","BSEV3","BSLI3","BSLI4","BTTL4","CALI3","CALI4","CAMB3","CAMB4","CAML3",
-        "CASH3","CASN3","CASN4","CATA3","CATA4","CBAV3","CBEE3","CCXC3","CEAB3","CEBR3","CEBR5","CEBR6","CEDO3","CEDO4","CEEB3",
-        "CEEB5","CEEB6","CEED3","CEED4","CEGR3","CEPE3","CEPE5","CEPE6","CESP3","CESP5","CESP6","CGAS3","CGAS5","CGRA3","CGRA4",
-        "CIEL3","CLSA3","CLSC3","CLSC4","CMIG3","CMIG4","CMIN3","CMSA3","CMSA4","CNSY3","COCE3","COCE5","COCE6","COGN3","CORR3",
-        "CORR4","CPFE3","CPLE3","CPLE5","CPLE6","CPRE3","CREM3","CRFB3","CRIV3","CRIV4","CRPG3","CRPG5","CRPG6","CSAB3","CSAB4",
-        "CSAN3","CSED3","CSMG3","CSNA3","CSRN3","CSRN5","CSRN6","CSUD3","CTAX3","CTCA3","CTKA3","CTKA4","CTNM3","CTNM4","CTSA3",
-        "CTSA4","CTSA8","CURY3","CVCB3","CXSE3","CYRE3","DASA3","DESK3","DEXP3","DEXP4","DIRR3","DMMO3","DMVF3","DOHL3","DOHL4",
-        "DOTZ3","DTCY3","DTCY4","DXCO3","EALT3","EALT4","ECOR3","ECPR3","ECPR4","EEEL3","EEEL4","EGIE3","EKTR3","EKTR4","ELEK3",
-        "ELEK4","ELET3","ELET5","ELET6","ELMD3","ELPL3","EMAE3","EMAE4","EMBR3","ENAT3","ENBR3","ENEV3","ENGI11","ENGI3","ENGI4",
-        "ENJU3","ENMA3B","ENMA6B","ENMT3","ENMT4","EPAR3","EQPA3","EQPA5","EQPA6","EQPA7","EQTL3","ESPA3","ESTR3","ESTR4","ETER3",
-        "EUCA3","EUCA4","EVEN3","EZTC3","FBMC3","FBMC4","FESA3","FESA4","FHER3","FICT3","FIEI3","FIGE3","FIGE4","FIQE3","FLEX3",
-        "FLRY3","FNCN3","FRAS3","FRIO3","FRTA3","FTRT3B","G2DI33","GBIO33","GEPA3","GEPA4","GETT11","GETT3","GETT4","GFSA3","GGBR3",
-        "GGBR4","GGPS3","GMAT3","GNDI3","GOAU3","GOAU4","GOLL4","GPAR3","GPIV33","GRAO3","GRND3","GSHP3","GUAR3","HAGA3","HAGA4",
-        "HAPV3","HBOR3","HBRE3","HBSA3","HBTS3","HBTS5","HBTS6","HETA3","HETA4","HGTX3","HOOT3","HOOT4","HYPE3","IDVL3","IDVL4",
-        "IFCM3","IGBR3","IGSN3","IGTA3","IGTI11","IGTI3","IGTI4","INEP3","INEP4","INNT3","INTB3","IRBR3","ISAE3","ISAE4","ITEC3",
-        "ITSA3","ITSA4","ITUB3","ITUB4","JALL3","JBSS3","JFEN3","JHSF3","JOPA3","JOPA4","JSLG3","KEPL3","KLBN11","KLBN3","KLBN4",
-        "KRSA3","LAME3","LAME4","LAND3","LAVV3","LCAM3","LEVE3","LHER3","LHER4","LIGT3","LINX3","LIPR3","LJQQ3","LOGG3","LOGN3",
-        "LPSB3","LREN3","LTEL3B","LUPA3","LUXM3","LUXM4","LVTC3","LWSA3","MAPT3","MAPT4","MATD3","MDIA3","MDNE3","MEAL3","MELK3",
-        "MERC3","MERC4","MGEL3","MGEL4","MGLU3","MILS3","MLAS3","MMXM3","MNDL3","MNPR3","MOAR3","MODL11","MODL3","MODL4","MOSI3",
-        "MOTV3","MOVI3","MRFG3","MRSA3B","MRSA5B","MRSA6B","MRVE3","MSPA3","MSPA4","MSRO3","MTIG3","MTIG4","MTRE3","MTSA3","MTSA4",
-        "MULT3","MWET3","MWET4","MYPK3","NAFG3","NAFG4","NATU3","NEMO3","NEMO4","NEMO5","NEMO6","NEOE3","NEXP3","NGRD3","NORD3",
-        "NRTQ3","NTCO3","NUTR3","ODER3","ODER4","ODPV3","OFSA3","OGXP3","OIBR3","OIBR4","OMGE3","ONCO3","OPCT3","ORVR3","OSXB3",
-        "PARD3","PATI3","PATI4","PCAR3","PCAR4","PDGR3","PDTC3","PEAB3","PEAB4","PETR3","PETR4","PETZ3","PFRM3","PGMN3","PINE3",
-        "PINE4","PLAS3","PLPL3","PMAM3","PNVL3","PNVL4","POMO3","POMO4","PORT3","POSI3","POWE3","PPAR3","PPAR4","PPLA11","PRIO3",
-        "PRNR3","PSSA3","PTBL3","PTCA11","PTCA3","PTNT3","PTNT4","QUAL3","QUSW3","QVQP3B","RADL3","RAIL3","RAIZ4","RANI3","RANI4",
-        "RAPT3","RAPT4","RCSL3","RCSL4","RDNI3","RDOR3","REAG3","RECV3","REDE3","RENT3","RLOG3","RNEW11","RNEW3","RNEW4","ROMI3",
-        "RPAD3","RPAD5","RPAD6","RPMG3","RSID3","RSUL3","RSUL4","SANB11","SANB3","SANB4","SAPR11","SAPR3","SAPR4","SBFG3","SBSP3",
-        "SCAR3","SEDU3","SEER3","SEQL3","SGPS3","SHOW3","SHUL3","SHUL4","SIMH3","SLCE3","SLED3","SLED4","SMFT3","SMLS3","SMTO3",
-        "SNSY3","SNSY5","SNSY6","SOJA3","SOMA3","SOND3","SOND5","SOND6","SPRT3B","SQIA3","SRNA3","STBP3","STKF3","STTR3","SULA11",
-        "SULA3","SULA4","SUZB3","SYNE3","TAEE11","TAEE3","TAEE4","TASA3","TASA4","TCNO3","TCNO4","TCSA3","TECN3","TEKA3","TEKA4",
-        "TELB3","TELB4","TEND3","TESA3","TFCO4","TGMA3","TIET11","TIET3","TIET4","TIMS3","TKNO3","TKNO4","TOKY3","TOTS3","TOYB3",
-        "TOYB4","TPIS3","TRAD3","TRIS3","TTEN3","TUPY3","TXRX3","TXRX4","UCAS3","UGPA3","UNIP3","UNIP5","UNIP6","USIM3","USIM5",
-        "USIM6","VALE3","VAMO3","VBBR3","VITT3","VIVA3","VIVR3","VIVT3","VIVT4","VLID3","VSPT3","VSPT4","VSTE3","VTRU3","VULC3",
-        "VVEO3","WEGE3","WEST3","WHRL3","WHRL4","WIZC3","WLMM3","WLMM4","YDUQ3","ZAMP3"
-    ]
-
-    n_workers = max(os.cpu_count() - 1, 1)
-    with ProcessPoolExecutor(max_workers=n_workers) as executor:
-        futuros = {executor.submit(_processar_ticker, t): t for t in tickers}
+    tickers = [t.upper().strip() for t in (tickers or ACOES_RECOMENDACAO)]
+    tempos = {}
+
+    # 1) Coleta (banco primeiro, scraping só para os que faltam)
+    t0 = time.perf_counter()
+    coletados = carregar_snapshot(tickers, max_idade_horas)
+    do_banco = len(coletados)
+    pendentes = [t for t in tickers if t not in coletados]
+    falhas = {}
+    print(f"🗄️  {do_banco} ticker(s) do banco; {len(pendentes)} a coletar ao vivo.")
+    if pendentes:
+        historico_precos.preparar(pendentes)
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futuros = [executor.submit(_coletar_ticker, t) for t in pendentes]
         for fut in as_completed(futuros):
-            ticker, sucesso, msg = fut.result()
-            status = "OK" if sucesso else "ERRO"
-            print(f"{ticker}: {status} ({msg})")
+            ticker, dados, msg = fut.result()
+            if dados is None:
+                falhas[ticker] = msg
+                print(f"{ticker}: ERRO ({msg})")
+            else:
+                coletados[ticker] = dados
+    tempos["coleta"] = time.perf_counter() - t0
+
+    if not coletados:
+        print("❌ Nenhum ticker coletado; nada a recomendar.")
+        return pd.DataFrame(columns=["acao", "recomendada", "nao_recomendada", "resultado"])
+
+    # 2) Predição (N linhas de uma vez)
+    t0 = time.perf_counter()
+    acoes = [t for t in tickers if t in coletados]
+    X = montar_matriz_features([coletados[t] for t in acoes])
+    modelo = carregar_artefatos_modelo()
+    proba = modelo.predict_proba(X)
+    df_rec = pd.DataFrame({
+        "acao": acoes,
+        "recomendada": proba[:, 1].astype(float),
+        "nao_recomendada": proba[:, 0].astype(float),
+    })
+    df_rec["resultado"] = df_rec["recomendada"].map(texto_recomendacao)
+    tempos["predicao"] = time.perf_counter() - t0
+
+    # 3) Gravação (upsert: uma linha por acao por dia)
+    t0 = time.perf_counter()
+    gravador = GravadorLote(
+        "public.recomendacoes_acoes",
+        chave=("acao", "data_recomendacao"),
+        colunas=["acao", "recomendada", "nao_recomendada", "resultado", "data_recomendacao"],
+        tamanho_lote=len(df_rec),
+        intervalo_flush=float("inf"),
+    )
+    hoje = date.today()
+    with gravador:
+        gravador.adicionar_varias(
+            {**linha, "data_recomendacao": hoje} for linha in df_rec.to_dict("records")
+        )
+    # Payload completo de /recomendacao/{ticker}, servido pela API sem recalcular
+    modelo_hash = registro_modelos.hash_classificador()
+    with snapshot_recomendacoes.gravador_snapshot(tamanho_lote=len(df_rec)) as gravador_snapshot:
+        for linha, features in zip(df_rec.itertuples(index=False), X.to_dict("records")):
+            payload = montar_resposta_recomendacao(
+                linha.acao, linha.recomendada, linha.nao_recomendada, features
+            )
+            gravador_snapshot.adicionar(snapshot_recomendacoes.linha_snapshot(payload, features, modelo_hash, hoje))
+    tempos["gravacao"] = time.perf_counter() - t0
+
+    for linha in df_rec.itertuples(index=False):
+        print(f"{linha.acao}: OK ({linha.recomendada:.2%})")
+    print(
+        f"\n📊 Recomendação em lote: {len(df_rec)}/{len(tickers)} tickers "
+        f"({do_banco} do banco, {len(falhas)} falha(s)) | coleta {tempos['coleta']:.1f}s | "
+        f"predição {tempos['predicao']:.2f}s | gravação {tempos['gravacao']:.2f}s "
+        f"({gravador.linhas_gravadas} linha(s) gravadas)"
+    )
+    return df_rec
+
+def recomendar_em_fluxo(tickers, modelo=None, max_workers=8, max_idade_horas=None):
+    """
+    Gera a recomendação de cada ticker assim que ela fica pronta (usado pelo
+    endpoint POST /recomendacao/lote):
+      - tickers com linha recente no banco (snapshot_indicadores) saem
+        primeiro, numa única chamada a predict_proba;
+      - os demais são coletados de forma concorrente e previstos em lote a
+        cada leva de coletas concluídas.
+
+    Cada item é {"ticker", "origem" ("banco"/"coleta"), "prob_sim",
+    "prob_nao", "features" (linha da matriz do modelo)} ou {"ticker", "erro"}.
+    Nada é gravado no banco.
+    """
+    modelo = modelo if modelo is not None else carregar_artefatos_modelo()
+    tickers = list(dict.fromkeys(t.upper().strip() for t in tickers if t and t.strip()))
+
+    def _prever_lote(itens):
+        X = montar_matriz_features([dados for _, dados in itens])
+        return X.to_dict("records"), modelo.predict_proba(X)
+
+    def _prever(itens, origem):
+        try:
+            linhas, proba = _prever_lote(itens)
+        except Exception as e:
+            # Uma linha ruim não derruba a leva: refaz ticker a ticker
+            print(f"⚠️ Predição em lote falhou ({e}); repetindo por ticker.")
+            for item in itens:
+                try:
+                    (linha,), (p,) = _prever_lote([item])
+                except Exception as e_ticker:
+                    yield {"ticker": item[0], "erro": f"falha na predição: {e_ticker}"}
+                    continue
+                yield {"ticker": item[0], "origem": origem, "prob_sim": float(p[1]),
+                       "prob_nao": float(p[0]), "features": linha}
+            return
+        for (ticker, _), linha, p in zip(itens, linhas, proba):
+            yield {
+                "ticker": ticker,
+                "origem": origem,
+                "prob_sim": float(p[1]),
+                "prob_nao": float(p[0]),
+                "features": linha,
+            }
+
+    snapshot = carregar_snapshot(tickers, max_idade_horas)
+    do_banco = [(t, snapshot[t]) for t in tickers if t in snapshot]
+    if do_banco:
+        yield from _prever(do_banco, "banco")
+
+    pendentes = [t for t in tickers if t not in snapshot]
+    if not pendentes:
+        return
+    historico_precos.preparar(pendentes)
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pendentes))))
+    try:
+        futuros = {executor.submit(_coletar_ticker, t) for t in pendentes}
+        while futuros:
+            concluidos, futuros = wait(futuros, return_when=FIRST_COMPLETED)
+            coletados = []
+            for fut in concluidos:
+                ticker, dados, msg = fut.result()
+                if dados is None:
+                    yield {"ticker": ticker, "erro": msg or "sem dados"}
+                else:
+                    coletados.append((ticker, dados))
+            if coletados:
+                yield from _prever(coletados, "coleta")
+    finally:
+        # Cliente desconectou (gerador fechado): não espera as coletas restantes
+        executor.shutdown(wait=False, cancel_futures=True)
+
 
 def recomendar_acao(ticker):
     resultado_scraper = coletar_indicadores(ticker)
@@ -410,8 +594,7 @@ if __name__ == "__main__":
             print("Nenhum ticker fornecido.")
 
     elif opcao == "2":
-        conn = get_connection()
-        recomendar_varias_acoes(conn)
+        recomendar_varias_acoes()
 
     else:
         print("Opção inválida. Execute novamente e escolha 1 ou 2.")
\ No newline at end of file
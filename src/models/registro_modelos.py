@@ -0,0 +1,147 @@
+"""
+Registro de modelos em memória (um carregamento por processo).
+
+joblib.load de uma RandomForest grande leva segundos; antes ele rodava a cada
+ticker em recomendar_varias_acoes e a cada requisição de /recomendacao/{ticker}.
+O registro guarda o modelo carregado e só o recarrega quando o arquivo muda:
+
+  - a cada obter() compara (mtime, tamanho, inode) do arquivo com os do
+    carregamento — um os.stat, custo de microssegundos;
+  - se mudou, calcula o SHA-256 do arquivo; se o conteúdo é o mesmo (ex:
+    reenvio do mesmo .pkl), mantém o modelo em memória;
+  - invalidar() força o recarregamento (usado após /modelo/upload);
+  - hash_modelo() identifica a versão do arquivo (SHA-256) sem carregá-lo —
+    o snapshot de recomendações só serve linhas geradas com a versão atual.
+
+Opcionalmente (MODELO_MMAP=1 no .env) o modelo é carregado com
+joblib.load(mmap_mode='r'): os arrays numpy do artefato ficam mapeados do
+arquivo e processos filhos compartilham as mesmas páginas. (As árvores do
+sklearn copiam seus nós para memória própria ao desserializar, então para a
+RandomForest o ganho principal vem de carregar uma única vez por processo —
+e, antes de um fork, deixar o copy-on-write compartilhar o modelo.)
+Exige que o .pkl seja substituído de forma atômica (os.replace), como fazem
+/modelo/upload e o classificador — nunca sobrescrito no lugar.
+"""
+
+import sys
+from pathlib import Path
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+import hashlib
+import os
+import threading
+import time
+
+import joblib
+
+CAMINHO_CLASSIFICADOR = _PROJECT_ROOT / "modelo" / "modelo_classificador_desempenho.pkl"
+
+
+def _usar_mmap() -> bool:
+    return os.getenv("MODELO_MMAP", "0").strip().lower() in ("1", "true", "sim")
+
+
+def _assinatura_arquivo(caminho: Path) -> tuple:
+    st = caminho.stat()
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _hash_arquivo(caminho: Path) -> str:
+    h = hashlib.sha256()
+    with caminho.open("rb") as f:
+        for bloco in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+class _Entrada:
+    __slots__ = ("modelo", "assinatura", "hash", "carregado_em")
+
+    def __init__(self, modelo, assinatura, hash_, carregado_em):
+        self.modelo = modelo
+        self.assinatura = assinatura
+        self.hash = hash_
+        self.carregado_em = carregado_em
+
+
+_entradas: dict[Path, _Entrada] = {}
+_hashes: dict[Path, tuple] = {}   # {caminho: (assinatura, hash)} de arquivos não carregados
+_lock = threading.Lock()
+_stats = {"carregamentos": 0, "acertos": 0, "tempo_carregamento_total": 0.0}
+
+
+def obter_modelo(caminho: Path | str):
+    """Modelo do arquivo `caminho`, carregado no máximo uma vez por versão do arquivo."""
+    caminho = Path(caminho)
+    assinatura = _assinatura_arquivo(caminho)   # FileNotFoundError se não existir
+
+    with _lock:
+        entrada = _entradas.get(caminho)
+        if entrada is not None and entrada.assinatura == assinatura:
+            _stats["acertos"] += 1
+            return entrada.modelo
+
+        hash_atual = _hash_arquivo(caminho)
+        if entrada is not None and entrada.hash == hash_atual:
+            # Arquivo tocado/reenviado com o mesmo conteúdo
+            entrada.assinatura = assinatura
+            _stats["acertos"] += 1
+            return entrada.modelo
+
+        t0 = time.perf_counter()
+        modelo = joblib.load(str(caminho), mmap_mode="r" if _usar_mmap() else None)
+        duracao = time.perf_counter() - t0
+        _entradas[caminho] = _Entrada(modelo, assinatura, hash_atual, time.time())
+        _stats["carregamentos"] += 1
+        _stats["tempo_carregamento_total"] += duracao
+        print(f"✅ Modelo carregado de {caminho.name} em {duracao:.2f}s"
+              f"{' (mmap)' if _usar_mmap() else ''}.")
+        return modelo
+
+
+def hash_modelo(caminho: Path | str) -> str:
+    """SHA-256 do arquivo `caminho`, recalculado só quando o arquivo muda."""
+    caminho = Path(caminho)
+    assinatura = _assinatura_arquivo(caminho)   # FileNotFoundError se não existir
+    with _lock:
+        entrada = _entradas.get(caminho)
+        if entrada is not None and entrada.assinatura == assinatura:
+            return entrada.hash
+        em_cache = _hashes.get(caminho)
+        if em_cache is not None and em_cache[0] == assinatura:
+            return em_cache[1]
+    hash_atual = _hash_arquivo(caminho)
+    with _lock:
+        _hashes[caminho] = (assinatura, hash_atual)
+    return hash_atual
+
+
+def invalidar(caminho: Path | str | None = None) -> None:
+    """Descarta o modelo em cache (ou todos, se caminho=None)."""
+    with _lock:
+        if caminho is None:
+            _entradas.clear()
+            _hashes.clear()
+        else:
+            _entradas.pop(Path(caminho), None)
+            _hashes.pop(Path(caminho), None)
+
+
+def estatisticas() -> dict:
+    with _lock:
+        stats = dict(_stats)
+        stats["modelos_em_memoria"] = [str(c) for c in _entradas]
+    return stats
+
+
+def obter_classificador():
+    """Atalho para o modelo do classificador de recomendações."""
+    return obter_modelo(CAMINHO_CLASSIFICADOR)
+
+
+def hash_classificador() -> str:
+    """Atalho: versão (SHA-256) do arquivo do classificador de recomendações."""
+    return hash_modelo(CAMINHO_CLASSIFICADOR)
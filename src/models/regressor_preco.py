@@ -5,6 +5,10 @@ _PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
 if str(_PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(_PROJECT_ROOT))
 
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 import pandas as pd, numpy as np
 from datetime import datetime, timedelta, date
 from sklearn.ensemble import RandomForestRegressor
@@ -19,6 +23,13 @@ from src.models.feature_engineering import (
     preparar_X,
     FEATURES_REGRESSOR,
 )
+from src.data.precos_diarios import carregar_precos_diarios
+from src.models import modelos_horizonte
+from src.models.feature_store import (
+    carregar_indicadores_com_features,
+    UNIVERSO_COMPLETO,
+    UNIVERSO_COTACAO_MIN_1,
+)
 
 # 1) Carrega o histórico
 def carregar_dados_do_banco():
@@ -46,55 +57,115 @@ def obter_data_calculo_maxima():
 
 
 # 2) Calcula preco_futuro_N_dias
-def adicionar_preco_futuro(df, n_dias):
+# Descarta matches muito distantes da data-alvo.
+# direction='forward' pode atravessar lacunas longas de dados (ex: 7 meses sem coleta),
+# atribuindo o preco de muito no futuro como se fosse o alvo de 10 dias.
+# Tolerância de 30 dias cobre fins de semana + feriados prolongados sem silenciar dados legítimos.
+TOLERANCIA_ALVO = pd.Timedelta(days=30)
+
+
+def coluna_preco_futuro(n_dias: int) -> str:
+    return f'preco_futuro_{n_dias}d'
+
+
+def adicionar_precos_futuros(df, horizontes, precos=None) -> pd.DataFrame:
     """
-    Calcula o preço alvo N dias úteis à frente (BDay), evitando inconsistências
-    causadas por fins de semana/feriados que acontecem com dias calendário.
+    Calcula o preço alvo de vários horizontes (dias úteis, BDay) em uma única
+    passada: adiciona uma coluna preco_futuro_{n}d para cada n em `horizontes`.
+
+    Para cada linha e horizonte, o alvo é a cotação da primeira coleta da mesma
+    ação com data_coleta >= data_coleta + BDay(n) (equivalente ao merge_asof
+    'forward' por ação), descartada se estiver a mais de TOLERANCIA_ALVO da
+    data-alvo.
+
+    Com `precos` (acao, data, fechamento — ex: carregar_precos_diarios()), o
+    alvo é buscado na série diária densa de fechamentos em vez das próprias
+    coletas, o que elimina os alvos perdidos em lacunas de coleta. A coleta
+    noturna grava em data_coleta D a cotação do pregão anterior, enquanto
+    precos_diarios grava cada fechamento na data do próprio pregão: cada
+    fechamento é carimbado um pregão à frente (data + BDay(1)) antes da busca,
+    para o alvo ser o mesmo preço que a coleta da data-alvo teria gravado.
+    Ações sem nenhum fechamento válido em `precos` usam as próprias coletas.
+
+    Implementação: as linhas são ordenadas por (acao, data_coleta) e cada busca
+    vira um np.searchsorted sobre a chave composta (código da ação, posto da
+    data), sem groupby/apply nem merge por ticker.
+
+    Retorna o DataFrame ordenado por (acao, data_coleta), índice preservado.
     """
-    df = df.copy()
-    df['data_futura_alvo'] = df['data_coleta'] + BDay(n_dias)
-
-    def _por_acao(grp, acao_key):
-        grp = grp.sort_values('data_coleta')
-        grp['acao'] = acao_key
-        left = grp[['data_futura_alvo']].copy().sort_values('data_futura_alvo')
-        right = grp[['data_coleta', 'cotacao']].copy().sort_values('data_coleta')
-
-        # merge_asof exige dtypes idênticos nas chaves de data
-        left['data_futura_alvo'] = pd.to_datetime(left['data_futura_alvo']).astype('datetime64[ns]')
-        right['data_coleta'] = pd.to_datetime(right['data_coleta']).astype('datetime64[ns]')
-
-        merged = pd.merge_asof(
-            left=left, right=right,
-            left_on='data_futura_alvo', right_on='data_coleta',
-            direction='forward'
-        )
-        # Descarta matches muito distantes da data-alvo.
-        # direction='forward' pode atravessar lacunas longas de dados (ex: 7 meses sem coleta),
-        # atribuindo o preco de muito no futuro como se fosse o alvo de 10 dias.
-        # Tolerância de 30 dias cobre fins de semana + feriados prolongados sem silenciar dados legítimos.
-        _tolerance = pd.Timedelta(days=30)
-        _too_far = (merged['data_coleta'] - merged['data_futura_alvo']) > _tolerance
-        cotacao_filtrada = merged['cotacao'].where(~_too_far, other=np.nan)
-        grp = grp.assign(preco_futuro_N_dias=cotacao_filtrada.values)
-        return grp
-
-    df = df.groupby('acao', group_keys=False, dropna=False).apply(
-        lambda grp: _por_acao(grp, grp.name)
-    )
-    df = df.drop(columns=['data_futura_alvo'])
+    df = df.sort_values(['acao', 'data_coleta'], kind='stable').copy()
+    horizontes = list(horizontes)
+    if df.empty:
+        for n in horizontes:
+            df[coluna_preco_futuro(n)] = np.nan
+        return df
 
-    # Em algumas versões/cenários de pandas, 'acao' pode virar nível de índice
-    if 'acao' not in df.columns:
-        if isinstance(df.index, pd.MultiIndex) and 'acao' in df.index.names:
-            df = df.reset_index(level='acao')
-        elif df.index.name == 'acao':
-            df = df.reset_index()
+    datas = pd.DatetimeIndex(pd.to_datetime(df['data_coleta'])).astype('datetime64[ns]')
+
+    # Série de referência onde os alvos são buscados: os fechamentos de precos
+    # (alinhados ao carimbo da coleta) e, para ações sem nenhum, as próprias coletas
+    referencia = pd.DataFrame({
+        'acao': df['acao'].to_numpy(),
+        'data': datas,
+        'valor': pd.to_numeric(df['cotacao'], errors='coerce').to_numpy(dtype=float),
+    })
+    if precos is not None:
+        precos = precos.dropna(subset=['fechamento'])
+        if not precos.empty:
+            densa = pd.DataFrame({
+                'acao': precos['acao'].to_numpy(),
+                'data': pd.DatetimeIndex(pd.to_datetime(precos['data'])) + BDay(1),
+                'valor': pd.to_numeric(precos['fechamento'], errors='coerce').to_numpy(dtype=float),
+            })
+            referencia = pd.concat(
+                [densa, referencia[~referencia['acao'].isin(densa['acao'])]], ignore_index=True
+            )
+    referencia = referencia.sort_values(['acao', 'data'], kind='stable')
+    todos_codigos, _ = pd.factorize(
+        pd.concat([df['acao'], referencia['acao']], ignore_index=True), sort=True, use_na_sentinel=False
+    )
+    codigos, ref_codigos = todos_codigos[:len(df)], todos_codigos[len(df):]
+    ref_datas = pd.DatetimeIndex(referencia['data']).astype('datetime64[ns]')
+    ref_valores = referencia['valor'].to_numpy(dtype=float)
+
+    alvos = {n: (datas + BDay(n)).astype('datetime64[ns]') for n in horizontes}
+
+    # Posto de cada data no conjunto (datas de referência ∪ datas-alvo): chave int64 exata
+    todas = np.concatenate([ref_datas.asi8] + [a.asi8 for a in alvos.values()])
+    _, postos = np.unique(todas, return_inverse=True)
+    base = int(postos.max()) + 1
+    codigos = codigos.astype(np.int64)
+    ref_codigos = ref_codigos.astype(np.int64)
+    n_ref = len(ref_datas)
+    chave = ref_codigos * base + postos[:n_ref]   # já ordenada (acao, data)
+
+    tolerancia = TOLERANCIA_ALVO.value
+    for i, n in enumerate(horizontes):
+        postos_alvo = postos[n_ref + i * len(datas):n_ref + (i + 1) * len(datas)]
+        pos = np.searchsorted(chave, codigos * base + postos_alvo, side='left')
+        pos_ok = np.minimum(pos, n_ref - 1)
+        encontrado = (pos < n_ref) & (ref_codigos[pos_ok] == codigos)
+        distancia = ref_datas.asi8[pos_ok] - alvos[n].asi8
+        valido = encontrado & (distancia <= tolerancia)
+        df[coluna_preco_futuro(n)] = np.where(valido, ref_valores[pos_ok], np.nan)
 
     return df
 
+
+def adicionar_preco_futuro(df, n_dias):
+    """
+    Calcula o preço alvo N dias úteis à frente (BDay), evitando inconsistências
+    causadas por fins de semana/feriados que acontecem com dias calendário.
+    """
+    df = adicionar_precos_futuros(df, [n_dias])
+    return df.rename(columns={coluna_preco_futuro(n_dias): 'preco_futuro_N_dias'})
+
 # 3) Prepara X, y, dates
-def preparar_dados_regressao(df, n_dias):
+def preparar_dados_regressao(df, n_dias, features_prontas: bool = False):
+    """
+    features_prontas: df já vem com as features derivadas (feature store);
+    pula o recálculo de Graham/deltas/relativas.
+    """
     # Fallback caso 'acao' seja movida para índice durante transformações
     acao_fallback = None
     if 'acao' in df.columns:
@@ -109,9 +180,10 @@ def preparar_dados_regressao(df, n_dias):
         acao_fallback = pd.Series(df.index, index=df.index, name='acao')
 
     # Pipeline de feature engineering completo
-    df = calcular_features_graham_estrito(df)
-    df = adicionar_delta_features(df, janela_dias=7)
-    df = adicionar_features_relativas(df)
+    if not features_prontas:
+        df = calcular_features_graham_estrito(df)
+        df = adicionar_delta_features(df, janela_dias=7)
+        df = adicionar_features_relativas(df)
     df = adicionar_preco_futuro(df, n_dias)
     df = df.dropna(subset=['preco_futuro_N_dias']).copy()
 
@@ -199,68 +271,45 @@ def preparar_dados_cache(n_dias: int = 10) -> tuple:
     passar a executar_pipeline_regressor via _dados_cache.
     acoes_validas: set de tickers com cotação atual >= R$1 (exclui penny stocks).
     """
-    conn = get_connection()
-    df = pd.read_sql_query(
-        "SELECT * FROM indicadores_fundamentalistas ORDER BY acao, data_coleta;",
-        conn
-    )
-    conn.close()
-    df['data_coleta'] = pd.to_datetime(df['data_coleta'])
+    df = carregar_indicadores_com_features(UNIVERSO_COMPLETO)
     ultima_real_date = df['data_coleta'].max().date()
     # Conjunto de ações com cotação atual >= R$1
     cotacao_mais_recente = df.sort_values('data_coleta').groupby('acao')['cotacao'].last()
     acoes_validas = set(cotacao_mais_recente[cotacao_mais_recente >= 1.0].index.tolist())
-    X, y, dates, acoes = preparar_dados_regressao(df, n_dias)
+    X, y, dates, acoes = preparar_dados_regressao(df, n_dias, features_prontas=True)
     return X, y, dates, acoes, ultima_real_date, acoes_validas
 
 
-# 5b) Pipeline completo
-def executar_pipeline_regressor(
-    n_dias: int = 10,
-    data_calculo: date | None = None,
-    save_to_db: bool = True,
-    tickers: list[str] | None = None,
-    sem_vazamento_temporal: bool = False,
-    _dados_cache: tuple | None = None,
-) -> tuple[RandomForestRegressor, pd.DataFrame]:
-    """
-    Executa o pipeline de regressão para previsão de preços.
-    Args:
-        n_dias: número de dias futuros para prever.
-        data_calculo: data base para cálculo (se None, usa hoje).
-        save_to_db: se True, persiste em resultados_precos.
-        tickers: lista de ações para filtrar o resultado (ou None para todas).
-        sem_vazamento_temporal: quando True, treina apenas com linhas cujo alvo
-            (preço em n_dias à frente) já seria conhecido na data_calculo.
-        _dados_cache: tupla (X, y, dates, acoes, ultima_real_date) pré-computada
-            para evitar recarregar e reprocessar dados em chamadas repetidas (backfill).
-    Returns:
-        model: RandomForestRegressor treinado.
-        comp: DataFrame com colunas ['acao','data_previsao','real','preco_previsto','erro_pct'].
-    """
-    if data_calculo is None:
-        data_calculo = date.today()
+# 5b) Peças do pipeline de um horizonte (reaproveitadas pelo backfill)
+PARAM_DIST_RF = {
+    'n_estimators': [100, 200, 300],
+    'max_depth': [5, 10, 15, None],
+    'min_samples_leaf': [2, 5, 10],
+    'max_features': ['sqrt', 'log2', 0.5],
+}
 
-    if _dados_cache is not None:
-        X, y, dates, acoes, ultima_real_date, acoes_validas = _dados_cache
-    else:
-        # 1) Carrega histórico de indicadores
-        conn = get_connection()
-        df = pd.read_sql_query(
-            "SELECT * FROM indicadores_fundamentalistas ORDER BY acao, data_coleta;", conn
-        )
-        conn.close()
-        df['data_coleta'] = pd.to_datetime(df['data_coleta'])
-        ultima_real_date = df['data_coleta'].max().date()
-        cotacao_recente = df.sort_values('data_coleta').groupby('acao')['cotacao'].last()
-        acoes_validas = set(cotacao_recente[cotacao_recente >= 1.0].index.tolist())
-        # 2) Prepara X, y, datas e tickers
-        X, y, dates, acoes = preparar_dados_regressao(df, n_dias)
 
-    # 3) Define máscaras de treino/teste com base em data_calculo
+def criar_busca_rf(n_amostras: int, splits_poucos_dados: int = 3, n_jobs: int = -1) -> RandomizedSearchCV:
+    """RandomizedSearchCV padrão dos regressores. Com poucos dados (< 500) usa menos splits."""
+    n_splits = splits_poucos_dados if n_amostras < 500 else 5
+    return RandomizedSearchCV(
+        RandomForestRegressor(random_state=42),
+        param_distributions=PARAM_DIST_RF,
+        n_iter=5,
+        cv=TimeSeriesSplit(n_splits=n_splits),
+        scoring='neg_mean_absolute_error',
+        n_jobs=n_jobs,
+        random_state=42,
+        verbose=0,
+    )
+
+
+def mascaras_treino_teste(dates, data_calculo, ultima_real_date, n_dias, sem_vazamento_temporal, avisar=True):
+    """Máscaras de treino/teste de executar_pipeline_regressor para uma data_calculo."""
     cutoff = pd.to_datetime(data_calculo)
     if data_calculo > ultima_real_date:
-        print(f"⚠️ data_calculo ({data_calculo}) > última data no banco ({ultima_real_date}); ajustando treino.")
+        if avisar:
+            print(f"⚠️ data_calculo ({data_calculo}) > última data no banco ({ultima_real_date}); ajustando treino.")
         ultima_ts = pd.to_datetime(ultima_real_date)
         if sem_vazamento_temporal:
             limite_treino = ultima_ts - pd.Timedelta(days=n_dias)
@@ -275,42 +324,24 @@ def executar_pipeline_regressor(
         else:
             mask_train = dates < cutoff
         mask_test  = dates == cutoff
+    return mask_train, mask_test
 
-    X_train, y_train = X[mask_train], y[mask_train]
+
+def montar_comparacao(model, X, y, acoes, mask_train, mask_test, acoes_validas, data_calculo, n_dias, avisar=True):
+    """
+    Gera as previsões de uma data_calculo: linhas de teste (data_calculo) ou, sem
+    elas, o último registro de treino de cada ação. Exclui penny stocks.
+    Retorna DataFrame com ['acao', 'data_previsao', 'real', 'preco_previsto', 'erro_pct'].
+    """
+    X_train = X[mask_train]
     X_test,  y_test  = X[mask_test],  y[mask_test]
     acoes_test       = acoes[mask_test]
 
-    # 4) Treina o modelo com busca de hiperparâmetros
-    n_samples = len(X_train)
-    # Com poucos dados usa 3 splits; com mais usa 5
-    n_splits = 3 if n_samples < 500 else 5
-    tscv = TimeSeriesSplit(n_splits=n_splits)
-
-    param_dist = {
-        'n_estimators': [100, 200, 300],
-        'max_depth': [5, 10, 15, None],
-        'min_samples_leaf': [2, 5, 10],
-        'max_features': ['sqrt', 'log2', 0.5],
-    }
-    search = RandomizedSearchCV(
-        RandomForestRegressor(random_state=42),
-        param_distributions=param_dist,
-        n_iter=5,
-        cv=tscv,
-        scoring='neg_mean_absolute_error',
-        n_jobs=-1,
-        random_state=42,
-        verbose=0,
-    )
-    search.fit(X_train, y_train)
-    model = search.best_estimator_
-    print(f"[regressor] Melhores parametros: {search.best_params_}")
-    print(f"[regressor] Melhor MAE (CV): {-search.best_score_:.4f}")
-
-    # 5) Gera previsões (data alvo em dias úteis, consistente com adicionar_preco_futuro)
+    # Data alvo em dias úteis, consistente com adicionar_preco_futuro
     future_date = (pd.Timestamp(data_calculo) + BDay(n_dias)).date()
     if X_test.empty:
-        print("⚠️ Sem dados futuros para teste; gerando previsão manual.")
+        if avisar:
+            print("⚠️ Sem dados futuros para teste; gerando previsão manual.")
         ultimos = X_train.groupby(acoes.loc[X_train.index]).tail(1)
         # Filtra penny stocks (cotação atual < R$1)
         mask_validas = acoes.loc[ultimos.index].isin(acoes_validas)
@@ -340,35 +371,220 @@ def executar_pipeline_regressor(
 
     comp = comp.drop_duplicates(subset=['acao', 'data']).sort_values('acao')
 
+    # Renomeia colunas para uso no dashboard
+    return comp.rename(columns={
+        'data':     'data_previsao',
+        'predito':  'preco_previsto'
+    })
+
+
+# 5c) Pipeline completo
+def executar_pipeline_regressor(
+    n_dias: int = 10,
+    data_calculo: date | None = None,
+    save_to_db: bool = True,
+    tickers: list[str] | None = None,
+    sem_vazamento_temporal: bool = False,
+    _dados_cache: tuple | None = None,
+) -> tuple[RandomForestRegressor, pd.DataFrame]:
+    """
+    Executa o pipeline de regressão para previsão de preços.
+    Args:
+        n_dias: número de dias futuros para prever.
+        data_calculo: data base para cálculo (se None, usa hoje).
+        save_to_db: se True, persiste em resultados_precos.
+        tickers: lista de ações para filtrar o resultado (ou None para todas).
+        sem_vazamento_temporal: quando True, treina apenas com linhas cujo alvo
+            (preço em n_dias à frente) já seria conhecido na data_calculo.
+        _dados_cache: tupla (X, y, dates, acoes, ultima_real_date) pré-computada
+            para evitar recarregar e reprocessar dados em chamadas repetidas (backfill).
+    Returns:
+        model: RandomForestRegressor treinado.
+        comp: DataFrame com colunas ['acao','data_previsao','real','preco_previsto','erro_pct'].
+    """
+    if data_calculo is None:
+        data_calculo = date.today()
+
+    if _dados_cache is not None:
+        X, y, dates, acoes, ultima_real_date, acoes_validas = _dados_cache
+    else:
+        # 1) Carrega histórico de indicadores (com features da feature store)
+        df = carregar_indicadores_com_features(UNIVERSO_COMPLETO)
+        ultima_real_date = df['data_coleta'].max().date()
+        cotacao_recente = df.sort_values('data_coleta').groupby('acao')['cotacao'].last()
+        acoes_validas = set(cotacao_recente[cotacao_recente >= 1.0].index.tolist())
+        # 2) Prepara X, y, datas e tickers
+        X, y, dates, acoes = preparar_dados_regressao(df, n_dias, features_prontas=True)
+
+    # 3) Define máscaras de treino/teste com base em data_calculo
+    mask_train, mask_test = mascaras_treino_teste(
+        dates, data_calculo, ultima_real_date, n_dias, sem_vazamento_temporal
+    )
+    X_train, y_train = X[mask_train], y[mask_train]
+
+    # 4) Treina o modelo com busca de hiperparâmetros
+    search = criar_busca_rf(len(X_train))
+    search.fit(X_train, y_train)
+    model = search.best_estimator_
+    print(f"[regressor] Melhores parametros: {search.best_params_}")
+    print(f"[regressor] Melhor MAE (CV): {-search.best_score_:.4f}")
+
+    # 5) Gera previsões (já com colunas renomeadas para o dashboard)
+    comp = montar_comparacao(
+        model, X, y, acoes, mask_train, mask_test, acoes_validas, data_calculo, n_dias
+    )
+
     # 6) Imprime métricas de treino
     print("📊 Métricas de treino:")
     print(f"MAE: {mean_absolute_error(y_train, model.predict(X_train)):.4f}")
     print(f"MSE: {mean_squared_error(y_train, model.predict(X_train)):.4f}")
     print(f"R² : {r2_score(y_train, model.predict(X_train)):.4f}")
 
-    # 7) Renomeia colunas para uso no dashboard
-    comp = comp.rename(columns={
-        'data':     'data_previsao',
-        'predito':  'preco_previsto'
-    })
-
-    # 8) Filtra apenas os tickers desejados, se especificados
+    # 7) Filtra apenas os tickers desejados, se especificados
     if tickers:
         tickers_upper = [t.upper() for t in tickers]
         comp = comp[comp['acao'].isin(tickers_upper)]
 
-    # 9) Persiste no banco, se solicitado
+    # 8) Persiste no banco, se solicitado
     if save_to_db:
         salvar_resultados_no_banco(comp, data_calculo)
 
     return model, comp
 
+# 6) Pipeline multi-dia (um modelo por horizonte de 1..max_dias)
+
+# Modos de treino de executar_pipeline_multidia:
+#   independente                  → uma RandomizedSearchCV por horizonte, em sequência (original)
+#   multi_saida                   → um único RandomForestRegressor com y multi-coluna (todos os horizontes)
+#   hiperparametros_compartilhados→ busca só no horizonte de referência; demais reaproveitam os parâmetros
+#   pool_processos                → horizontes independentes distribuídos em processos, com orçamento fixo de núcleos
+MODOS_TREINO_MULTIDIA = (
+    "independente",
+    "multi_saida",
+    "hiperparametros_compartilhados",
+    "pool_processos",
+)
+
+
+def _dados_horizonte(df_alvos, n, features, cutoff):
+    """X/y de treino do horizonte n e o registro mais recente (com alvo conhecido) de cada ação."""
+    coluna_alvo = coluna_preco_futuro(n)
+    df_horizonte = df_alvos.dropna(subset=[coluna_alvo])
+
+    X = preparar_X(df_horizonte, features)
+    y = df_horizonte.loc[X.index, coluna_alvo]
+    dates = df_horizonte.loc[X.index, 'data_coleta']
+    acoes = df_horizonte.loc[X.index, 'acao']
+
+    # Define o conjunto de treino com base na data de cálculo
+    mask_train = dates <= cutoff
+    X_train, y_train = X[mask_train], y[mask_train]
+
+    # Pega os dados mais recentes de cada ação para fazer a previsão
+    ultimos_registros = X_train.groupby(acoes.loc[X_train.index]).tail(1)
+    return X_train, y_train, ultimos_registros, acoes.loc[ultimos_registros.index]
+
+
+def _treinar_e_prever_horizonte(X_train, y_train, ultimos_registros, n_jobs=-1, params=None):
+    """
+    Treina um horizonte e devolve (previsões, melhores parâmetros, modelo ajustado).
+    Com `params`, pula a busca e ajusta direto um RandomForest com esses parâmetros.
+    Função de módulo para poder rodar em ProcessPoolExecutor.
+    """
+    if params is None:
+        search = criar_busca_rf(len(X_train), splits_poucos_dados=2, n_jobs=n_jobs)
+        search.fit(X_train, y_train)
+        model, params = search.best_estimator_, search.best_params_
+    else:
+        model = RandomForestRegressor(random_state=42, n_jobs=n_jobs, **params)
+        model.fit(X_train, y_train)
+    return model.predict(ultimos_registros), params, model
+
+
+def _multidia_multi_saida(df_alvos, features, cutoff, horizontes, progress_callback):
+    """
+    Um único modelo com y = [preco_futuro_1d, ..., preco_futuro_Nd].
+    Devolve ({n: (previsões, ações)}, {n: (modelo, registros de entrada, coluna da saída)}).
+    """
+    colunas_alvo = [coluna_preco_futuro(n) for n in horizontes]
+    # Treino: linhas com todos os alvos conhecidos até a data de cálculo
+    df_completo = df_alvos.dropna(subset=colunas_alvo)
+    X = preparar_X(df_completo, features)
+    mask_train = df_completo.loc[X.index, 'data_coleta'] <= cutoff
+    X_train, Y_train = X[mask_train], df_completo.loc[X.index[mask_train], colunas_alvo]
+    if X_train.empty:
+        return {}, {}
+
+    search = criar_busca_rf(len(X_train), splits_poucos_dados=2)
+    search.fit(X_train, Y_train)
+    model = search.best_estimator_
+    print(f"[multidia] Melhores parametros (multi-saída): {search.best_params_}")
+
+    # Cada horizonte prevê a partir do seu próprio registro mais recente com alvo conhecido
+    resultados, treinados = {}, {}
+    for i, n in enumerate(horizontes):
+        _, _, ultimos, acoes_ultimos = _dados_horizonte(df_alvos, n, features, cutoff)
+        if not ultimos.empty:
+            resultados[n] = (model.predict(ultimos)[:, i], acoes_ultimos)
+            treinados[n] = (model, ultimos, i)
+        if progress_callback:
+            progress_callback(n, horizontes[-1])
+    return resultados, treinados
+
+
+def _multidia_pool_processos(df_alvos, features, cutoff, horizontes, progress_callback, nucleos):
+    """Horizontes em paralelo: `workers` processos x `n_jobs` threads <= `nucleos`."""
+    nucleos = max(1, nucleos or os.cpu_count() or 1)
+    workers = min(len(horizontes), nucleos)
+    n_jobs = max(1, nucleos // workers)
+    print(f"[multidia] Pool de {workers} processo(s) x {n_jobs} núcleo(s) cada.")
+
+    resultados, treinados = {}, {}
+    concluidos = 0
+    # spawn: o dashboard chama este pipeline de dentro de uma thread
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = {}
+        for n in horizontes:
+            X_train, y_train, ultimos, acoes_ultimos = _dados_horizonte(df_alvos, n, features, cutoff)
+            if ultimos.empty:
+                print(f"⚠️ Sem dados de treino para o horizonte de {n} dias.")
+                continue
+            future = executor.submit(_treinar_e_prever_horizonte, X_train, y_train, ultimos, n_jobs)
+            futures[future] = (n, acoes_ultimos, ultimos)
+        for future in as_completed(futures):
+            n, acoes_ultimos, ultimos = futures[future]
+            preds, _, model = future.result()
+            resultados[n] = (preds, acoes_ultimos)
+            treinados[n] = (model, ultimos, None)
+            concluidos += 1
+            if progress_callback:
+                progress_callback(concluidos, horizontes[-1])
+    return resultados, treinados
+
+
+def _carregar_precos(df) -> pd.DataFrame | None:
+    """Fechamentos de precos_diarios das ações de df (None se a tabela não puder ser lida)."""
+    try:
+        precos = carregar_precos_diarios(df['acao'].unique(), inicio=df['data_coleta'].min().date())
+    except Exception as e:
+        print(f"⚠️ precos_diarios indisponível, alvos buscados nas coletas: {e}")
+        return None
+    print(f"[multidia] Alvos buscados em precos_diarios ({precos['acao'].nunique()} ação(ões)); "
+          f"demais ações usam as coletas.")
+    return precos
+
+
 def executar_pipeline_multidia(
     max_dias: int = 10,
     data_calculo: date | None = None,
     save_to_db: bool = True,
     tickers: list[str] | None = None,
-    progress_callback=None
+    progress_callback=None,
+    modo_treino: str = "independente",
+    horizonte_referencia: int | None = None,
+    nucleos: int | None = None,
+    salvar_modelos: bool = True,
+    reusar_modelos: bool = False,
 ) -> pd.DataFrame:
     """
     Executa um pipeline de regressão otimizado para prever múltiplos dias futuros.
@@ -378,85 +594,116 @@ def executar_pipeline_multidia(
         data_calculo: Data base para o cálculo (se None, usa a data de hoje).
         save_to_db: Se True, persiste os resultados no banco de dados.
         tickers: Lista de ações para filtrar o resultado (ou None para todas).
-        progress_callback: Função opcional para reportar o progresso (ex: para a UI).
+        progress_callback: Função opcional progress_callback(atual, total) para
+            reportar o progresso (ex: para a UI).
+        modo_treino: um de MODOS_TREINO_MULTIDIA (padrão: "independente").
+        horizonte_referencia: horizonte usado na busca do modo
+            "hiperparametros_compartilhados" (padrão: max_dias).
+        nucleos: orçamento total de núcleos do modo "pool_processos"
+            (padrão: os.cpu_count()).
+        salvar_modelos: Se True, grava os modelos por horizonte como artefato
+            versionado em modelo/regressor_multidia/ (ver modelos_horizonte).
+        reusar_modelos: Se True e houver artefato treinado no mesmo modo_treino
+            com os dados mais recentes do banco, só prevê com ele (sem carregar
+            dados nem treinar).
 
     Returns:
         DataFrame com as previsões para cada dia até max_dias.
     """
+    if modo_treino not in MODOS_TREINO_MULTIDIA:
+        raise ValueError(f"modo_treino inválido: {modo_treino!r} (use um de {MODOS_TREINO_MULTIDIA})")
     if data_calculo is None:
         data_calculo = date.today()
 
+    # 0) Modelos já treinados com os mesmos dados: só previsão
+    if reusar_modelos:
+        final_comp = modelos_horizonte.prever_com_modelos_salvos(
+            max_dias, data_calculo, tickers, modo_treino=modo_treino
+        )
+        if final_comp is not None:
+            print("✅ Previsão feita com os modelos por horizonte salvos (sem retreino).")
+            if progress_callback:
+                progress_callback(max_dias, max_dias)
+            if save_to_db and not final_comp.empty:
+                print("\nETAPA 3: Salvando resultados no banco...")
+                salvar_resultados_no_banco(final_comp, data_calculo)
+            return final_comp
+
     # 1) Carregamento e preparação de dados (FEITO APENAS UMA VEZ)
     print("ETAPA 1: Carregando e preparando os dados (uma única vez)...")
-    df_base = carregar_dados_do_banco()
-    df_com_features = calcular_features_graham_estrito(df_base)
-    df_com_features = adicionar_delta_features(df_com_features, janela_dias=7)
-    df_com_features = adicionar_features_relativas(df_com_features)
+    df_com_features = carregar_indicadores_com_features(UNIVERSO_COTACAO_MIN_1)
+    # Alvos de todos os horizontes em uma única passada (preco_futuro_1d..Nd)
+    horizontes = list(range(1, max_dias + 1))
+    df_alvos = adicionar_precos_futuros(df_com_features, horizontes, _carregar_precos(df_com_features))
+    features = [f for f in FEATURES_REGRESSOR if f in df_alvos.columns]
+    cutoff = pd.to_datetime(data_calculo)
     print("✅ Dados preparados.")
 
-    all_predictions = []
-
-    # 2) Loop para treinar um modelo para cada horizonte de tempo (de 1 a max_dias)
-    for n in range(1, max_dias + 1):
-        if progress_callback:
-            progress_callback(n, max_dias)
-
-        print(f"\nETAPA 2: Treinando modelo para prever {n} dia(s) úteis à frente...")
-
-        # Adiciona a coluna 'preco_futuro_N_dias' para o horizonte 'n' atual (BDay)
-        df_horizonte = adicionar_preco_futuro(df_com_features, n)
-        df_horizonte = df_horizonte.dropna(subset=['preco_futuro_N_dias']).copy()
-
-        features = [f for f in FEATURES_REGRESSOR if f in df_horizonte.columns]
-
-        X = preparar_X(df_horizonte, features)
-        y = df_horizonte.loc[X.index, 'preco_futuro_N_dias']
-        dates = df_horizonte.loc[X.index, 'data_coleta']
-        acoes = df_horizonte.loc[X.index, 'acao']
-
-        # Define o conjunto de treino com base na data de cálculo
-        cutoff = pd.to_datetime(data_calculo)
-        mask_train = dates <= cutoff
-        X_train, y_train = X[mask_train], y[mask_train]
-
-        # Pega os dados mais recentes de cada ação para fazer a previsão
-        ultimos_registros = X_train.groupby(acoes.loc[X_train.index]).tail(1)
-
-        if ultimos_registros.empty:
-            print(f"⚠️ Sem dados de treino para o horizonte de {n} dias na data {data_calculo}.")
-            continue
-
-        # Treina com RandomizedSearchCV
-        n_splits = 2 if len(X_train) < 500 else 5
-        tscv = TimeSeriesSplit(n_splits=n_splits)
-        param_dist = {
-            'n_estimators': [100, 200, 300],
-            'max_depth': [5, 10, 15, None],
-            'min_samples_leaf': [2, 5, 10],
-            'max_features': ['sqrt', 'log2', 0.5],
-        }
-        search = RandomizedSearchCV(
-            RandomForestRegressor(random_state=42),
-            param_distributions=param_dist,
-            n_iter=5, cv=tscv,
-            scoring='neg_mean_absolute_error',
-            n_jobs=-1, random_state=42, verbose=0,
+    # 2) Treina e prevê cada horizonte → {n: (previsões, ações)}
+    print(f"\nETAPA 2: Treinando horizontes 1..{max_dias} (modo: {modo_treino})...")
+    if modo_treino == "multi_saida":
+        resultados, treinados = _multidia_multi_saida(df_alvos, features, cutoff, horizontes, progress_callback)
+    elif modo_treino == "pool_processos":
+        resultados, treinados = _multidia_pool_processos(
+            df_alvos, features, cutoff, horizontes, progress_callback, nucleos
         )
-        search.fit(X_train, y_train)
-        model = search.best_estimator_
+    else:
+        params_compartilhados = None
+        if modo_treino == "hiperparametros_compartilhados":
+            ref = horizonte_referencia or max_dias
+            X_ref, y_ref, _, _ = _dados_horizonte(df_alvos, ref, features, cutoff)
+            if not X_ref.empty:
+                search = criar_busca_rf(len(X_ref), splits_poucos_dados=2)
+                search.fit(X_ref, y_ref)
+                params_compartilhados = search.best_params_
+                print(f"[multidia] Parâmetros do horizonte {ref} compartilhados: {params_compartilhados}")
+
+        resultados, treinados = {}, {}
+        for n in horizontes:
+            if progress_callback:
+                progress_callback(n, max_dias)
+
+            print(f"\nETAPA 2: Treinando modelo para prever {n} dia(s) úteis à frente...")
+            X_train, y_train, ultimos_registros, acoes_ultimos = _dados_horizonte(
+                df_alvos, n, features, cutoff
+            )
+            if ultimos_registros.empty:
+                print(f"⚠️ Sem dados de treino para o horizonte de {n} dias na data {data_calculo}.")
+                continue
 
-        # Gera previsões
-        preds = model.predict(ultimos_registros)
+            preds, _, model = _treinar_e_prever_horizonte(
+                X_train, y_train, ultimos_registros, params=params_compartilhados
+            )
+            resultados[n] = (preds, acoes_ultimos)
+            treinados[n] = (model, ultimos_registros, None)
 
-        future_date = (pd.Timestamp(data_calculo) + BDay(n)).date()
+    if salvar_modelos and treinados:
+        try:
+            modelos_horizonte.salvar(
+                modelos={n: model for n, (model, _, _) in treinados.items()},
+                entradas={
+                    n: ultimos.set_axis(df_alvos.loc[ultimos.index, 'acao'].values)
+                    for n, (_, ultimos, _) in treinados.items()
+                },
+                features=features,
+                data_treino=data_calculo,
+                ultima_data_coleta=df_alvos.loc[df_alvos['data_coleta'] <= cutoff, 'data_coleta'].max().date(),
+                modo_treino=modo_treino,
+                indices_saida={n: i for n, (_, _, i) in treinados.items() if i is not None},
+            )
+        except Exception as e:
+            print(f"⚠️ Falha ao salvar os modelos por horizonte: {e}")
 
-        comp = pd.DataFrame({
-            'acao': acoes.loc[ultimos_registros.index].values,
-            'data_previsao': [future_date] * len(ultimos_registros),
+    all_predictions = []
+    for n in sorted(resultados):
+        preds, acoes_ultimos = resultados[n]
+        future_date = (pd.Timestamp(data_calculo) + BDay(n)).date()
+        all_predictions.append(pd.DataFrame({
+            'acao': acoes_ultimos.values,
+            'data_previsao': [future_date] * len(acoes_ultimos),
             'preco_previsto': preds,
             'dias_a_frente': n  # Adiciona a informação do horizonte
-        })
-        all_predictions.append(comp)
+        }))
 
     if not all_predictions:
         print("❌ Nenhuma previsão pôde ser gerada.")
@@ -536,11 +783,8 @@ if __name__ == "__main__":
             print("Formato inválido. Use AAAA-MM-DD.")
             exit()
         print(f"\n✅ Iniciando previsões de {n_dias} dias de {data_inicio} até {data_fim} (salvando no banco)...\n")
-        atual = data_inicio
-        while atual <= data_fim:
-            print(f"\n👉 Prevendo para {atual}...")
-            executar_pipeline_regressor(n_dias=n_dias, data_calculo=atual)
-            atual += timedelta(days=1)
+        from src.models.backfill_regressor import executar_backfill_regressor
+        executar_backfill_regressor(data_inicio, data_fim, n_dias=n_dias)
 
     elif escolha == "4":
         dias = input("Quantos dias à frente? ").strip()
@@ -0,0 +1,97 @@
+"""
+Snapshot diário das respostas de /recomendacao/{ticker}.
+
+A recomendação em lote (recomendar_varias_acoes) já calcula, toda noite, as
+probabilidades de cada ticker. Junto com recomendacoes_acoes ela materializa
+em recomendacoes_snapshot o payload completo da API (resultado,
+probabilidades, indicadores_chave, justificativas) em JSONB, as features do
+modelo (para a explicação de IA), um ETag (hash do payload) e a versão do
+classificador que gerou a linha (modelo_hash, SHA-256 do .pkl).
+
+A API serve o ticker com uma consulta pela chave primária; em GET
+/recomendacao/{ticker} responde 304 a If-None-Match com o ETag gravado, antes
+de qualquer outro trabalho. Só calcula ao vivo os tickers sem snapshot ou com
+snapshot mais antigo que MAX_IDADE_HORAS — ou gerado por outro classificador:
+depois de um /modelo/upload, o snapshot da noite anterior deixa de ser servido.
+
+Configuração (.env):
+    RECOMENDACAO_SNAPSHOT_MAX_IDADE_HORAS   idade máxima servida (padrão 24; 0 desliga)
+"""
+
+import sys
+from pathlib import Path
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+import hashlib
+import json
+import os
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional
+
+from psycopg2.extras import Json
+
+from src.core.db_connection import conexao
+from src.core.gravador_lote import GravadorLote
+from src.models import registro_modelos
+
+TABELA = "recomendacoes_snapshot"
+MAX_IDADE_HORAS = float(os.getenv("RECOMENDACAO_SNAPSHOT_MAX_IDADE_HORAS", "24"))
+COLUNAS = ["acao", "data_recomendacao", "payload", "features", "etag", "modelo_hash", "gerado_em"]
+
+
+def calcular_etag(payload: Dict) -> str:
+    """ETag forte (entre aspas) do payload serializado de forma canônica."""
+    corpo = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return '"' + hashlib.sha256(corpo.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def gravador_snapshot(tamanho_lote: int = 500) -> GravadorLote:
+    return GravadorLote(TABELA, chave=("acao",), colunas=COLUNAS,
+                        tamanho_lote=tamanho_lote, intervalo_flush=float("inf"))
+
+
+def linha_snapshot(payload: Dict, features: Dict, modelo_hash: str,
+                   data_recomendacao: Optional[date] = None) -> Dict:
+    """
+    Linha de recomendacoes_snapshot (para o gravador_snapshot) de um payload da
+    API; modelo_hash é a versão do classificador (registro_modelos.hash_classificador()).
+    """
+    return {
+        "acao": payload["ticker"],
+        "data_recomendacao": data_recomendacao or date.today(),
+        "payload": Json(payload),
+        "features": Json(features),
+        "etag": calcular_etag(payload),
+        "modelo_hash": modelo_hash,
+        "gerado_em": datetime.now(),
+    }
+
+
+def carregar(ticker: str, max_idade_horas: Optional[float] = None) -> Optional[Dict]:
+    """
+    {"payload", "features", "etag", "gerado_em"} do ticker, ou None se não
+    houver snapshot recente gerado pelo classificador atual (ou o banco falhar
+    — a API calcula ao vivo).
+    """
+    max_idade_horas = MAX_IDADE_HORAS if max_idade_horas is None else max_idade_horas
+    if max_idade_horas <= 0:
+        return None
+    try:
+        modelo_hash = registro_modelos.hash_classificador()
+        with conexao() as conn, conn.cursor() as cur:
+            cur.execute(
+                f"SELECT payload, features, etag, gerado_em FROM {TABELA} "
+                f"WHERE acao = %s AND gerado_em >= %s AND modelo_hash = %s",
+                (ticker.upper().strip(), datetime.now() - timedelta(hours=max_idade_horas), modelo_hash),
+            )
+            linha = cur.fetchone()
+    except Exception as e:
+        print(f"⚠️ Snapshot de recomendações indisponível ({e}); calculando ao vivo.")
+        return None
+    if linha is None:
+        return None
+    payload, features, etag, gerado_em = linha
+    return {"payload": payload, "features": features, "etag": etag, "gerado_em": gerado_em}